@@ -35,6 +35,7 @@ except Exception as e:
     LastFM = None
 
 from lollypop.utils import is_gnome, is_unity, get_network_available
+from lollypop.utils import debug
 from lollypop.define import Type, DataPath
 from lollypop.window import Window
 from lollypop.database import Database
@@ -44,6 +45,7 @@ from lollypop.sqlcursor import SqlCursor
 from lollypop.settings import Settings, SettingsDialog
 from lollypop.database_albums import AlbumsDatabase
 from lollypop.database_artists import ArtistsDatabase
+from lollypop.database_async import DatabaseAsync
 from lollypop.database_genres import GenresDatabase
 from lollypop.database_tracks import TracksDatabase
 from lollypop.playlists import Playlists
@@ -59,6 +61,8 @@ class Application(Gtk.Application):
             - Handle command line
             - Create main window
     """
+    # Worker threads running database requests from UI
+    __DB_JOBS = 2
 
     def __init__(self, version):
         """
@@ -166,8 +170,14 @@ class Application(Gtk.Application):
         self.artists = ArtistsDatabase()
         self.genres = GenresDatabase()
         self.tracks = TracksDatabase()
+        # Requests from UI, see DatabaseAsync.run()
+        self.db_async = DatabaseAsync(self.__DB_JOBS)
         self.player = Player()
         self.scanner = CollectionScanner()
+        # Writers invalidate caches, this also covers other connections
+        self.scanner.connect("album-updated", self.__on_album_updated)
+        self.scanner.connect("artist-updated", self.__on_artist_updated)
+        self.scanner.connect("genre-updated", self.__on_genre_updated)
         self.art = Art()
         self.art.update_art_size()
         if self.settings.get_value("artist-artwork"):
@@ -244,6 +254,11 @@ class Application(Gtk.Application):
         """
         # First save state
         self.__save_state()
+        for (name, db) in [("albums", self.albums), ("artists", self.artists),
+                           ("genres", self.genres), ("tracks", self.tracks)]:
+            debug("Application::quit(): %s cache: %s hits, %s misses, "
+                  "%s ids" % ((name,) + db.cache.get_stats()))
+        self.db_async.stop()
         # Then vacuum db
         if vacuum:
             self.__vacuum()
@@ -471,6 +486,33 @@ class Application(Gtk.Application):
             self.player.play_first_external()
         self.__externals_count += 1
 
+    def __on_album_updated(self, scanner, album_id, added):
+        """
+            Invalidate album cache
+            @param scanner as CollectionScanner
+            @param album id as int
+            @param added as bool
+        """
+        self.albums.cache.invalidate(album_id)
+
+    def __on_artist_updated(self, scanner, artist_id, added):
+        """
+            Invalidate artist cache
+            @param scanner as CollectionScanner
+            @param artist id as int
+            @param added as bool
+        """
+        self.artists.cache.invalidate(artist_id)
+
+    def __on_genre_updated(self, scanner, genre_id, added):
+        """
+            Invalidate genre cache
+            @param scanner as CollectionScanner
+            @param genre id as int
+            @param added as bool
+        """
+        self.genres.cache.invalidate(genre_id)
+
     def __hide_on_delete(self, widget, event):
         """
             Hide window
@@ -15,13 +15,19 @@ from gi.repository import GLib, GObject, Gio
 from gettext import gettext as _
 from threading import Thread
 from time import time
+import os
 
 from lollypop.inotify import Inotify
 from lollypop.define import Lp
 from lollypop.sqlcursor import SqlCursor
 from lollypop.tagreader import TagReader
+from lollypop.tagreader_pool import TagReaderPool, read_tags
 from lollypop.database_history import History
-from lollypop.utils import is_audio, is_pls, debug
+from lollypop.collectionwalker import CollectionWalker
+from lollypop.collectionwriter import CollectionWriter
+from lollypop.scanstats import ScanStats
+from lollypop.scanthrottle import ScanThrottle
+from lollypop.utils import debug, get_fingerprint, get_mount, is_remote
 from lollypop.lio import Lio
 
 
@@ -35,6 +41,8 @@ class CollectionScanner(GObject.GObject, TagReader):
         "genre-updated": (GObject.SignalFlags.RUN_FIRST, None, (int, bool)),
         "album-updated": (GObject.SignalFlags.RUN_FIRST, None, (int, bool))
     }
+    # Progress bar updates by second
+    __PROGRESS_RATE = 4
 
     def __init__(self):
         """
@@ -45,28 +53,69 @@ class CollectionScanner(GObject.GObject, TagReader):
 
         self.__thread = None
         self.__history = None
+        self.__full = False
+        self.__jobs = None
+        self.__stats = None
+        self.__progress_time = 0
         if Lp().settings.get_value("auto-update"):
             self.__inotify = Inotify()
         else:
             self.__inotify = None
         Lp().albums.update_max_count()
 
-    def update(self):
+    def update(self, full=None, jobs=None):
         """
             Update database
+            @param full as bool, None to use full-scan-interval
+            @param jobs as int, None to use scan-jobs and
+                   scan-low-priority
         """
         if not self.is_locked():
             uris = Lp().settings.get_music_uris()
             if not uris:
                 return
 
-            Lp().window.progress.add(self)
-            Lp().window.progress.set_fraction(0.0, self)
+            if Lp().window is not None:
+                Lp().window.progress.add(self)
+                Lp().window.progress.set_fraction(0.0, self)
 
-            self.__thread = Thread(target=self.__scan, args=(uris,))
+            self.__jobs = jobs
+            self.__thread = Thread(target=self.__scan,
+                                   args=(uris, full))
             self.__thread.daemon = True
             self.__thread.start()
 
+    def update_uris(self, uris):
+        """
+            Update database for changed uris only
+            @param uris as [str], added, modified or removed files/directories
+        """
+        if not self.is_locked():
+            if Lp().window is not None:
+                Lp().window.progress.add(self)
+                Lp().window.progress.set_fraction(0.0, self)
+
+            self.__jobs = None
+            self.__thread = Thread(target=self.__scan_uris, args=(uris,))
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def is_interrupted(self):
+        """
+            True if last scan was interrupted while adding tracks
+            @return bool
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT uri FROM scan_journal LIMIT 1")
+            return result.fetchone() is not None
+
+    def get_stats(self):
+        """
+            Get stats for current/last scan
+            @return ScanStats/None
+        """
+        return self.__stats
+
     def clean_charts(self):
         """
             Clean charts in db
@@ -98,118 +147,187 @@ class CollectionScanner(GObject.GObject, TagReader):
         Lp().db.del_tracks(track_ids)
         self.stop()
 
-    def __get_objects_for_uris(self, uris):
+    def __set_progress(self, current, total):
         """
-            Return all tracks/dirs for uris
-            @param uris as string
-            @return (track uri as [str], track dirs as [str],
-                     ignore dirs as [str])
+            Update progress bar from main loop, at most
+            __PROGRESS_RATE times by second
+            @param scanned items as int, total items as int
         """
-        tracks = []
-        ignore_dirs = []
-        track_dirs = list(uris)
-        walk_uris = list(uris)
-        while walk_uris:
-            uri = walk_uris.pop(0)
-            empty = True
-            try:
-                d = Lio.File.new_for_uri(uri)
-                infos = d.enumerate_children(
-                    "standard::name,standard::type,standard::is-hidden",
-                    Gio.FileQueryInfoFlags.NONE,
-                    None)
-            except Exception as e:
-                print("CollectionScanner::__get_objects_for_uris():", e)
-                continue
-            for info in infos:
-                f = infos.get_child(info)
-                child_uri = f.get_uri()
-                empty = False
-                if info.get_is_hidden():
-                    continue
-                elif info.get_file_type() == Gio.FileType.DIRECTORY:
-                    track_dirs.append(child_uri)
-                    walk_uris.append(child_uri)
-                else:
-                    try:
-                        f = Lio.File.new_for_uri(child_uri)
-                        if is_pls(f):
-                            pass
-                        elif is_audio(f):
-                            tracks.append(child_uri)
-                        else:
-                            debug("%s not detected as a music file" %
-                                  child_uri)
-                    except Exception as e:
-                        print("CollectionScanner::"
-                              "__get_objects_for_uris():", e)
-            # If a root uri is empty
-            # Ensure user is not doing something bad
-            if empty and uri in uris:
-                ignore_dirs.append(uri)
-        return (tracks, track_dirs, ignore_dirs)
+        now = time()
+        if now - self.__progress_time >= 1 / self.__PROGRESS_RATE:
+            self.__progress_time = now
+            GLib.idle_add(self.__update_progress, current, total)
 
     def __update_progress(self, current, total):
         """
             Update progress bar status
             @param scanned items as int, total items as int
         """
-        Lp().window.progress.set_fraction(current / total, self)
+        if Lp().window is not None:
+            Lp().window.progress.set_fraction(current / total, self)
 
     def __finish(self):
         """
             Notify from main thread when scan finished
         """
-        Lp().window.progress.set_fraction(1.0, self)
+        if Lp().window is not None:
+            Lp().window.progress.set_fraction(1.0, self)
         self.stop()
+        if self.__full:
+            Lp().settings.set_value("last-full-scan",
+                                    GLib.Variant("x", int(time())))
         self.emit("scan-finished")
         # Update max count value
         Lp().albums.update_max_count()
-        if Lp().settings.get_value("artist-artwork"):
+        if Lp().settings.get_value("artist-artwork") and\
+                Lp().art is not None:
             Lp().art.cache_artists_info()
 
-    def __scan(self, uris):
+    def __scan(self, uris, full):
         """
             Scan music collection for music files
             @param uris as [string], uris to scan
+            @param full as bool, None to use full-scan-interval
             @thread safe
         """
-        gst_message = None
+        self.__stats = ScanStats(uris)
         if self.__history is None:
             self.__history = History()
+        # Resume interrupted scan before looking for changes
+        journal = self.__get_journal()
+        if journal:
+            mtimes = Lp().tracks.get_mtimes()
+            to_add = [(uri, mtime) for (uri, mtime, file_mtime) in journal
+                      if uri not in mtimes.keys()]
+            file_mtimes = {uri: file_mtime
+                           for (uri, mtime, file_mtime) in journal}
+            self.__load_history([uri for (uri, mtime) in to_add])
+            with SqlCursor(Lp().db) as sql:
+                if to_add and not self.__add_tracks(to_add, 0, len(to_add),
+                                                    file_mtimes):
+                    return
+                sql.commit()
         mtimes = Lp().tracks.get_mtimes()
-        (new_tracks, new_dirs, ignore_dirs) = self.__get_objects_for_uris(
-                                                                         uris)
-        orig_tracks = Lp().tracks.get_uris(ignore_dirs)
+        if full is None:
+            full = self.__is_full_scan_needed()
+        self.__full = full
+        walker = CollectionWalker(mtimes, self.__full)
+        start = time()
+        (new_tracks, new_dirs, ignore_dirs) = walker.walk(uris)
+        self.__stats.add_time("stat", walker.get_stat_time())
+        # Stat time may exceed walk time when roots are walked in parallel
+        self.__stats.add_time("walk",
+                              max(0, time() - start - walker.get_stat_time()))
+        self.__stats.add_found([uri for (uri, mtime) in new_tracks])
+        orig_tracks = set(Lp().tracks.get_uris(ignore_dirs))
         was_empty = len(orig_tracks) == 0
 
         if ignore_dirs:
             if Lp().notify is not None:
                 Lp().notify.send(_("Lollypop is detecting an empty folder."),
                                  _("Check your music settings."))
-        count = len(new_tracks) + len(orig_tracks)
+
         # Add monitors on dirs
         if self.__inotify is not None:
             for d in new_dirs:
                 if d.startswith("file://"):
                     self.__inotify.add_monitor(d)
 
+        if not self.__scan_tracks(new_tracks, orig_tracks, mtimes, was_empty):
+            return
+        # Remaining tracks can't be added
+        self.__set_journal([], True)
+        self.__stats.finish()
+        debug("CollectionScanner::__scan():\n%s" % self.__stats.get_report())
+        GLib.idle_add(self.__finish)
+        del self.__history
+        self.__history = None
+
+    def __scan_uris(self, uris):
+        """
+            Scan changed uris for music files
+            @param uris as [string], files or directories
+            @thread safe
+        """
+        if self.__history is None:
+            self.__history = History()
+        self.__full = False
+        roots = [root.rstrip("/") for root in Lp().settings.get_music_uris()]
+        self.__stats = ScanStats(roots)
+        walker = CollectionWalker({})
+        start = time()
+        # Never remove a whole root, may be unmounted
+        uris = self.__merge_uris([uri.rstrip("/") for uri in uris
+                                  if uri.rstrip("/") not in roots])
+        mtimes = self.__get_uris_mtimes(uris, roots)
+        new_tracks = {}
+        new_dirs = []
+        for uri in uris:
+            if self.__thread is None:
+                return
+            try:
+                f = Lio.File.new_for_uri(uri)
+                name = f.get_basename()
+                file_type = f.query_file_type(Gio.FileQueryInfoFlags.NONE,
+                                              None)
+                if file_type == Gio.FileType.DIRECTORY:
+                    (tracks, dirs) = walker.walk_dir(uri)
+                    new_tracks.update(tracks)
+                    new_dirs += dirs
+                elif file_type != Gio.FileType.UNKNOWN and\
+                        not name.startswith(".") and\
+                        not name.endswith("~") and\
+                        walker.is_audio(name, uri):
+                    info = f.query_info("time::modified",
+                                        Gio.FileQueryInfoFlags.NONE,
+                                        None)
+                    new_tracks[uri] = info.get_attribute_uint64(
+                                                            "time::modified")
+            except Exception as e:
+                print("CollectionScanner::__scan_uris():", e)
+        self.__stats.add_time("walk", time() - start)
+        self.__stats.add_found(new_tracks.keys())
+        # Add monitors on new dirs
+        if self.__inotify is not None:
+            for d in new_dirs:
+                if d.startswith("file://"):
+                    self.__inotify.add_monitor(d)
+
+        if not self.__scan_tracks(list(new_tracks.items()),
+                                  set(mtimes.keys()),
+                                  mtimes,
+                                  False):
+            return
+        # Remaining tracks can't be added, keep tracks journaled by an
+        # interrupted full scan
+        self.__del_journal(new_tracks.keys())
+        self.__stats.finish()
+        GLib.idle_add(self.__finish)
+        del self.__history
+        self.__history = None
+
+    def __scan_tracks(self, new_tracks, orig_tracks, mtimes, was_empty):
+        """
+            Add new/modified tracks to db, remove deleted tracks from db
+            @param new_tracks as [(uri as str, mtime as int)], found tracks
+            @param orig_tracks as set(str), tracks in db, will be emptied
+            @param mtimes as {uri as str: mtime as int}, tracks mtimes in db
+            @param was_empty as bool, True if db was empty
+            @return False if scan has been stopped
+            @thread safe
+        """
+        count = len(new_tracks) + len(orig_tracks)
         with SqlCursor(Lp().db) as sql:
             i = 0
             # Look for new files/modified files
             try:
                 to_add = []
-                for uri in new_tracks:
+                to_delete = []
+                for (uri, mtime) in new_tracks:
                     if self.__thread is None:
-                        return
+                        return False
                     try:
-                        GLib.idle_add(self.__update_progress, i, count)
-                        f = Lio.File.new_for_uri(uri)
-                        info = f.query_info("time::modified",
-                                            Gio.FileQueryInfoFlags.NONE,
-                                            None)
-                        mtime = int(info.get_attribute_as_string(
-                                                             "time::modified"))
+                        self.__set_progress(i, count)
                         # If songs exists and mtime unchanged, continue,
                         # else rescan
                         if uri in orig_tracks:
@@ -219,7 +337,7 @@ class CollectionScanner(GObject.GObject, TagReader):
                                 i += 1
                                 continue
                             else:
-                                self.__del_from_db(uri)
+                                to_delete.append(uri)
                         # On first scan, use modification time
                         # Else, use current time
                         if not was_empty:
@@ -227,60 +345,324 @@ class CollectionScanner(GObject.GObject, TagReader):
                         to_add.append((uri, mtime))
                     except Exception as e:
                         print("CollectionScanner::__scan(mtime):", e)
-                # Clean deleted files
+                # Moved files keep their db rows
+                if orig_tracks and to_add:
+                    count_add = len(to_add)
+                    to_add = self.__move_tracks(to_add, orig_tracks)
+                    i += 2 * (count_add - len(to_add))
+                # Load history for all handled tracks at once
+                self.__load_history(to_delete + list(orig_tracks) +
+                                    [uri for (uri, mtime) in to_add])
+                # Clean modified/deleted files
                 # Now because we need to populate history
+                for uri in to_delete:
+                    self.__del_from_db(uri)
                 for uri in orig_tracks:
                     i += 1
-                    GLib.idle_add(self.__update_progress, i, count)
+                    self.__set_progress(i, count)
                     self.__del_from_db(uri)
+                self.__history.commit()
                 # Add files to db
-                for (uri, mtime) in to_add:
-                    try:
-                        debug("Adding file: %s" % uri)
-                        i += 1
-                        GLib.idle_add(self.__update_progress, i, count)
-                        self.__add2db(uri, mtime)
-                    except Exception as e:
-                        print("CollectionScanner::__scan(add):", e, uri)
-                        if e.message != gst_message:
-                            gst_message = e.message
-                            if Lp().notify is not None:
-                                Lp().notify.send(gst_message, uri)
+                if not self.__add_tracks(to_add, i, count,
+                                         dict(new_tracks)):
+                    return False
                 sql.commit()
             except Exception as e:
                 print("CollectionScanner::__scan():", e)
-        GLib.idle_add(self.__finish)
-        del self.__history
-        self.__history = None
+        return True
+
+    def __add_tracks(self, to_add, i, count, file_mtimes):
+        """
+            Read tags and add tracks to db, tracks are journaled
+            until written, so an interrupted scan can be resumed
+            @param to_add as [(uri as str, mtime as int)]
+            @param i as int, current progress
+            @param count as int, progress total
+            @param file_mtimes as {uri as str: mtime as int}, found by walker
+            @return False if scan has been stopped
+            @thread safe
+        """
+        gst_message = None
+        self.__set_journal([(uri, mtime, file_mtimes.get(uri, 0))
+                            for (uri, mtime) in to_add])
+        writer = CollectionWriter(self, self.__stats)
+        for (uri, mtime, tags, error,
+             read_bytes, seconds) in self.__read_tags(to_add):
+            if self.__thread is None:
+                return False
+            try:
+                i += 1
+                self.__set_progress(i, count)
+                if error is not None:
+                    raise Exception(error)
+                debug("Adding file: %s" % uri)
+                self.__add2db(writer, uri, mtime, tags,
+                              file_mtimes.get(uri, 0))
+            except Exception as e:
+                print("CollectionScanner::__add_tracks():", e, uri)
+                if str(e) != gst_message:
+                    gst_message = str(e)
+                    if Lp().notify is not None:
+                        Lp().notify.send(gst_message, uri)
+        writer.flush()
+        return True
+
+    def __load_history(self, uris):
+        """
+            Load history for uris
+            @param uris as [str]
+        """
+        start = time()
+        self.__history.load([Lio.File.new_for_uri(uri).get_basename()
+                             for uri in uris])
+        self.__stats.add_time("history lookup", time() - start)
+
+    def __get_journal(self):
+        """
+            Get tracks not added by an interrupted scan
+            @return [(uri as str, mtime as int, file mtime as int)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT uri, mtime, file_mtime\
+                                  FROM scan_journal")
+            return list(result)
+
+    def __set_journal(self, items, clear=False):
+        """
+            Add tracks to add to journal
+            @param items as [(uri as str, mtime as int, file mtime as int)]
+            @param clear as bool, remove previous items
+        """
+        with SqlCursor(Lp().db) as sql:
+            if clear:
+                sql.execute("DELETE FROM scan_journal")
+            sql.executemany("INSERT OR REPLACE INTO scan_journal\
+                             (uri, mtime, file_mtime)\
+                             VALUES (?, ?, ?)", items)
+            sql.commit()
+
+    def __del_journal(self, uris):
+        """
+            Remove tracks from journal
+            @param uris as [str]
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("DELETE FROM scan_journal WHERE uri=?",
+                            [(uri,) for uri in uris])
+            sql.commit()
+
+    def __move_tracks(self, to_add, orig_tracks):
+        """
+            Detect tracks moved from a removed uri to a new uri,
+            their db rows are updated, no need to read tags again
+            @param to_add as [(uri as str, mtime as int)], new tracks
+            @param orig_tracks as set(str), removed tracks, moved tracks
+                   are removed from set
+            @return tracks to add as [(uri as str, mtime as int)]
+        """
+        fingerprints = Lp().tracks.get_fingerprints(orig_tracks)
+        if not fingerprints:
+            return to_add
+        # Check size and mtime before reading file
+        stats = set([fingerprint.rsplit(":", 1)[0]
+                     for fingerprint in fingerprints.keys()])
+        moved = []
+        remaining = []
+        for (uri, mtime) in to_add:
+            old_uris = []
+            try:
+                path = Lio.File.new_for_uri(uri).get_path()
+                if path is not None:
+                    stat = os.stat(path)
+                    if "%s:%s" % (stat.st_size,
+                                  int(stat.st_mtime)) in stats:
+                        fingerprint = get_fingerprint(path)
+                        old_uris = fingerprints.get(fingerprint, [])
+            except Exception as e:
+                print("CollectionScanner::__move_tracks():", e)
+            if old_uris:
+                old_uri = old_uris.pop(0)
+                orig_tracks.remove(old_uri)
+                moved.append((old_uri, uri))
+            else:
+                remaining.append((uri, mtime))
+        if moved:
+            debug("CollectionScanner::__move_tracks(): %s tracks moved" %
+                  len(moved))
+            Lp().tracks.set_uris(moved)
+            Lp().playlists.set_uris(moved)
+        return remaining
+
+    def __merge_uris(self, uris):
+        """
+            Drop uris below another uri, they are handled with it
+            @param uris as [str]
+            @return [str]
+        """
+        merged = set()
+        # Parents first
+        for uri in sorted(set(uris), key=len):
+            if not self.__is_below(uri, merged):
+                merged.add(uri)
+        return list(merged)
 
-    def __add2db(self, uri, mtime):
+    def __get_uris_mtimes(self, uris, roots):
+        """
+            Get db mtimes for tracks at or below uris
+            Db is queried once for uris sharing a parent directory
+            @param uris as [str], files or directories
+            @param roots as [str]
+            @return {uri as str: mtime as int}
+        """
+        groups = {}
+        for uri in uris:
+            parent = uri.rsplit("/", 1)[0]
+            if parent not in groups.keys():
+                groups[parent] = set()
+            groups[parent].add(uri)
+        mtimes = {}
+        for (parent, group) in groups.items():
+            # Do not load a whole root for a few files
+            if len(group) == 1 or parent in roots:
+                for uri in group:
+                    mtimes.update(Lp().tracks.get_mtimes(uri))
+            else:
+                for (uri, mtime) in Lp().tracks.get_mtimes(parent).items():
+                    if self.__is_below(uri, group, parent):
+                        mtimes[uri] = mtime
+        return mtimes
+
+    def __is_below(self, uri, uris, top=""):
+        """
+            True if uri is in uris or below one of them
+            @param uri as str
+            @param uris as set of str
+            @param top as str, stop looking for parents at this uri
+            @return bool
+        """
+        while len(uri) > len(top):
+            if uri in uris:
+                return True
+            if "/" not in uri:
+                break
+            uri = uri.rsplit("/", 1)[0]
+        return False
+
+    def __is_full_scan_needed(self):
+        """
+            True if all directories need to be listed: files modified
+            in place do not change their directory mtime
+            @return bool
+        """
+        interval = Lp().settings.get_value("full-scan-interval").get_int32()
+        last = Lp().settings.get_value("last-full-scan").get_int64()
+        return interval <= 0 or time() - last >= interval * 86400
+
+    def __read_tags(self, items):
+        """
+            Read tags for items, in worker processes if enabled
+            @param items as [(uri as str, mtime as int)]
+            @return iterator of results (see tagreader_pool.read_tags())
+        """
+        throttle = None
+        # Sent to worker processes, must be a bool, not a GLib.Variant
+        low_priority = self.__jobs is None and\
+            Lp().settings.get_value("scan-low-priority").get_boolean()
+        if low_priority:
+            rate = Lp().settings.get_value("scan-max-read-rate").get_int32()
+            throttle = ScanThrottle(max(rate, 0) * 1048576)
+        groups = []
+        for (group_items, limit) in self.__get_groups(items, low_priority):
+            if throttle is not None:
+                group_items = throttle.items(group_items)
+            groups.append((group_items, limit))
+        jobs = sum([limit for (group_items, limit) in groups])
+        pool = None
+        if jobs > 1:
+            pool = TagReaderPool(jobs, low_priority)
+            results = pool.read(groups)
+        else:
+            results = (read_tags(self, item)
+                       for (group_items, limit) in groups
+                       for item in group_items)
+        try:
+            start = time()
+            for result in results:
+                # Time spent waiting for readers
+                self.__stats.add_time("tag read", time() - start)
+                self.__stats.add_read(result[0], result[4], result[5])
+                if throttle is not None:
+                    throttle.add(result[0], result[4])
+                yield result
+                start = time()
+        finally:
+            # Also drop pending items if scan was stopped
+            if throttle is not None:
+                throttle.stop()
+            if pool is not None:
+                pool.stop()
+
+    def __get_groups(self, items, low_priority):
+        """
+            Group items by mount, each mount with its own concurrency limit:
+            scan-jobs for local disks, scan-network-jobs for network mounts
+            @param items as [(uri as str, mtime as int)]
+            @param low_priority as bool
+            @return [(items as [(uri as str, mtime as int)], limit as int)]
+        """
+        jobs = self.__jobs
+        if jobs is None:
+            jobs = Lp().settings.get_value("scan-jobs").get_int32()
+        local_jobs = TagReaderPool.get_jobs(jobs)
+        remote_jobs = min(local_jobs, max(1, Lp().settings.get_value(
+                                          "scan-network-jobs").get_int32()))
+        if low_priority:
+            low_jobs = max(1, Lp().settings.get_value(
+                                     "scan-low-priority-jobs").get_int32())
+            local_jobs = min(local_jobs, low_jobs)
+            remote_jobs = min(remote_jobs, low_jobs)
+        roots = []
+        for root in Lp().settings.get_music_uris():
+            if not root.endswith("/"):
+                root += "/"
+            roots.append(root)
+        # {root: mount}, {mount: [items, limit]}
+        mounts = {}
+        groups = {}
+        for item in items:
+            root = None
+            for uri in roots:
+                if item[0].startswith(uri):
+                    root = uri
+                    break
+            if root not in mounts.keys():
+                if root is None:
+                    mounts[root] = None
+                    limit = local_jobs
+                else:
+                    mounts[root] = get_mount(root)
+                    limit = remote_jobs if is_remote(root) else local_jobs
+                if mounts[root] not in groups.keys():
+                    groups[mounts[root]] = [[], limit]
+            groups[mounts[root]][0].append(item)
+        return [(group_items, min(limit, len(group_items)))
+                for (group_items, limit) in groups.values()]
+
+    def __add2db(self, writer, uri, mtime, tags, file_mtime):
         """
             Add new file to db with informations
+            @param writer as CollectionWriter
             @param uri as string
             @param mtime as int
-            @return track id as int
-        """
-        f = Lio.File.new_for_uri(uri)
-        debug("CollectionScanner::add2db(): Read tags")
-        info = self.get_info(uri)
-        tags = info.get_tags()
-        name = f.get_basename()
-        title = self.get_title(tags, name)
-        artists = self.get_artists(tags)
-        composers = self.get_composers(tags)
-        performers = self.get_performers(tags)
-        a_sortnames = self.get_artist_sortnames(tags)
-        aa_sortnames = self.get_album_artist_sortnames(tags)
-        album_artists = self.get_album_artist(tags)
-        album_name = self.get_album_name(tags)
-        genres = self.get_genres(tags)
-        discnumber = self.get_discnumber(tags)
-        discname = self.get_discname(tags)
-        tracknumber = self.get_tracknumber(tags, name)
-        year = self.get_original_year(tags)
-        if year is None:
-            year = self.get_year(tags)
-        duration = int(info.get_duration()/1000000000)
+            @param tags as {} (see TagReader.read_tags())
+            @param file_mtime as int, 0 if unknown
+        """
+        name = tags["name"]
+        artists = tags["artists"]
+        composers = tags["composers"]
+        performers = tags["performers"]
+        album_artists = tags["album_artists"]
+        duration = tags["duration"]
 
         # If no artists tag, use album artist
         if artists == "":
@@ -297,48 +679,19 @@ class CollectionScanner(GObject.GObject, TagReader):
 
         debug("CollectionScanner::add2db(): Restore stats")
         # Restore stats
+        start = time()
         (track_pop, track_rate, track_ltime, album_mtime,
          loved, album_pop, album_rate) = self.__history.get(name, duration)
+        self.__stats.add_time("history lookup", time() - start)
         # If nothing in stats, use track mtime
         if album_mtime == 0:
             album_mtime = mtime
 
-        debug("CollectionScanner::add2db(): Add artists %s" % artists)
-        artist_ids = self.add_artists(artists, album_artists, a_sortnames)
-
-        debug("CollectionScanner::add2db(): "
-              "Add album artists %s" % album_artists)
-        album_artist_ids = self.add_album_artists(album_artists, aa_sortnames)
-
-        new_artist_ids = list(set(album_artist_ids) | set(artist_ids))
-
-        debug("CollectionScanner::add2db(): Add album: "
-              "%s, %s" % (album_name, album_artist_ids))
-        (album_id, new_album) = self.add_album(album_name, album_artist_ids,
-                                               uri, loved, album_pop,
-                                               album_rate, False)
-
-        genre_ids = self.add_genres(genres)
-
-        # Add track to db
-        debug("CollectionScanner::add2db(): Add track")
-        track_id = Lp().tracks.add(title, uri, duration,
-                                   tracknumber, discnumber, discname,
-                                   album_id, year, track_pop, track_rate,
-                                   track_ltime)
-
-        debug("CollectionScanner::add2db(): Update tracks")
-        self.update_track(track_id, artist_ids, genre_ids, mtime)
-        self.update_album(album_id, album_artist_ids,
-                          genre_ids, album_mtime, year)
-        if new_album:
-            with SqlCursor(Lp().db) as sql:
-                sql.commit()
-        for genre_id in genre_ids:
-            GLib.idle_add(self.emit, "genre-updated", genre_id, True)
-        for artist_id in new_artist_ids:
-            GLib.idle_add(self.emit, "artist-updated", artist_id, True)
-        return track_id
+        tags["artists"] = artists
+        tags["album_artists"] = album_artists
+        writer.add(uri, mtime, file_mtime, tags,
+                   (track_pop, track_rate, track_ltime, album_mtime,
+                    loved, album_pop, album_rate))
 
     def __del_from_db(self, uri):
         """
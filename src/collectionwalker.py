@@ -0,0 +1,385 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib, Gio
+
+import os
+from threading import Thread, Lock
+from time import time
+
+from lollypop.define import Lp
+from lollypop.sqlcursor import SqlCursor
+from lollypop.utils import is_audio, is_pls, debug, get_mount
+from lollypop.lio import Lio
+
+
+class CollectionWalker:
+    """
+        Walk collection uris looking for music files
+        Files are classified by extension, content is only sniffed
+        for unknown extensions
+        Unless doing a full walk, directories not modified since last walk
+        are not listed, their tracks are taken from db
+        Roots on different mounts are walked concurrently
+    """
+    __AUDIO = ["mp3", "ogg", "oga", "opus", "flac", "m4a", "mp4", "aac",
+               "wma", "wav", "mpc", "spx", "ac3", "mka", "ra"]
+    __NOT_AUDIO = ["jpg", "jpeg", "png", "gif", "bmp", "webp", "tif",
+                   "tiff", "txt", "nfo", "log", "cue", "pdf", "m3u",
+                   "m3u8", "pls", "xspf", "db", "ini", "sfv", "md5",
+                   "accurip", "lrc", "htm", "html", "url"]
+    # Directories modified this close to walk start may be modified again
+    # without their mtime changing, also handles small clock skews
+    __RACY_DELAY = 2
+
+    def __init__(self, mtimes, full=True):
+        """
+            Init walker
+            @param mtimes as {uri as str: mtime as int}, tracks in db
+            @param full as bool, list all directories
+        """
+        self.__mtimes = mtimes
+        self.__full = full
+        # Directories state for next walk: {uri: (mtime, count)}
+        self.__dirs = {}
+        # Directories state from last walk
+        self.__known_dirs = {}
+        self.__known_subdirs = {}
+        self.__known_tracks = {}
+        # Time spent getting files/directories mtime
+        self.__stat_time = 0
+        self.__stat_lock = Lock()
+
+    def walk(self, uris):
+        """
+            Return all tracks/dirs for uris
+            @param uris as [str]
+            @return (tracks as [(uri as str, mtime as int)],
+                     track dirs as [str], ignore dirs as [str])
+        """
+        tracks = []
+        ignore_dirs = []
+        track_dirs = list(uris)
+        start = int(time())
+        if not self.__full:
+            self.__load_dirs()
+        mounts = {}
+        for uri in uris:
+            mount = get_mount(uri)
+            if mount in mounts.keys():
+                mounts[mount].append(uri)
+            else:
+                mounts[mount] = [uri]
+        # {root: (tracks, track dirs, empty)}
+        results = {}
+        threads = []
+        for mount_uris in list(mounts.values())[1:]:
+            thread = Thread(target=self.__walk_roots,
+                            args=(mount_uris, results))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        if mounts:
+            self.__walk_roots(list(mounts.values())[0], results)
+        for thread in threads:
+            thread.join()
+        for uri in uris:
+            (root_tracks, root_dirs, empty) = results[uri]
+            tracks += root_tracks
+            track_dirs += root_dirs
+            # If a root uri is empty
+            # Ensure user is not doing something bad
+            if empty:
+                ignore_dirs.append(uri)
+        self.__save_dirs(start)
+        return (tracks, track_dirs, ignore_dirs)
+
+    def walk_dir(self, uri):
+        """
+            Return all tracks/dirs for a directory, directories state
+            is not used nor saved
+            @param uri as str
+            @return (tracks as [(uri as str, mtime as int)],
+                     track dirs as [str])
+        """
+        tracks = []
+        track_dirs = [uri]
+        if uri.startswith("file://"):
+            self.__walk_local(uri, tracks, track_dirs)
+        else:
+            self.__walk_gio(uri, tracks, track_dirs)
+        return (tracks, track_dirs)
+
+    def get_stat_time(self):
+        """
+            Get time spent getting files/directories mtime
+            @return seconds as float
+        """
+        return self.__stat_time
+
+    def is_audio(self, name, uri):
+        """
+            True if file is an audio file
+            @param name as str
+            @param uri as str
+            @return bool
+        """
+        extension = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+        if extension in self.__AUDIO:
+            return True
+        elif extension in self.__NOT_AUDIO:
+            return False
+        # Unknown extension, sniff content
+        f = Lio.File.new_for_uri(uri)
+        if is_pls(f):
+            return False
+        elif is_audio(f):
+            return True
+        debug("%s not detected as a music file" % uri)
+        return False
+
+#######################
+# PRIVATE             #
+#######################
+    def __load_dirs(self):
+        """
+            Load directories state from db
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT uri, mtime, count FROM dirs")
+            for (uri, mtime, count) in result:
+                self.__known_dirs[uri] = (mtime, count)
+                parent = uri.rsplit("/", 1)[0]
+                if parent in self.__known_subdirs.keys():
+                    self.__known_subdirs[parent].append(uri)
+                else:
+                    self.__known_subdirs[parent] = [uri]
+        for uri in self.__mtimes.keys():
+            parent = uri.rsplit("/", 1)[0]
+            if parent in self.__known_tracks.keys():
+                self.__known_tracks[parent].append(uri)
+            else:
+                self.__known_tracks[parent] = [uri]
+
+    def __save_dirs(self, start):
+        """
+            Save directories state to db
+            @param start as int, walk start time
+        """
+        items = []
+        for (uri, (mtime, count)) in self.__dirs.items():
+            # Force listing on next walk
+            if mtime >= start - self.__RACY_DELAY:
+                mtime = 0
+            items.append((uri, mtime, count))
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("DELETE FROM dirs")
+            sql.executemany("INSERT INTO dirs (uri, mtime, count)\
+                             VALUES (?, ?, ?)", items)
+            sql.commit()
+
+    def __get_unchanged(self, uri, mtime):
+        """
+            Get directory content from db if unchanged since last walk
+            A directory mtime does not change when a subdirectory content
+            changes, so subdirectories still need to be walked
+            @param uri as str
+            @param mtime as int
+            @return (track uris as [str], subdir uris as [str]) or None
+        """
+        if self.__full or uri not in self.__known_dirs.keys():
+            return None
+        (known_mtime, count) = self.__known_dirs[uri]
+        track_uris = self.__known_tracks.get(uri, [])
+        # Count mismatch if last scan failed to add some tracks
+        if known_mtime != mtime or len(track_uris) != count:
+            return None
+        self.__dirs[uri] = (mtime, count)
+        return (track_uris, self.__known_subdirs.get(uri, []))
+
+    def __walk_roots(self, uris, results):
+        """
+            Walk roots one after the other
+            @param uris as [str]
+            @param results as {}, filled with
+                   {uri: (tracks, track dirs, empty)}
+        """
+        for uri in uris:
+            tracks = []
+            track_dirs = []
+            if uri.startswith("file://"):
+                empty = self.__walk_local(uri, tracks, track_dirs)
+            else:
+                empty = self.__walk_gio(uri, tracks, track_dirs)
+            results[uri] = (tracks, track_dirs, empty)
+
+    def __add_stat_time(self, seconds):
+        """
+            Add time spent getting mtimes, roots may be walked in parallel
+            @param seconds as float
+        """
+        with self.__stat_lock:
+            self.__stat_time += seconds
+
+    def __stat(self, entry):
+        """
+            Get mtime for entry
+            @param entry as os.DirEntry or path as str
+            @return int
+        """
+        start = time()
+        if isinstance(entry, str):
+            mtime = int(os.stat(entry).st_mtime)
+        else:
+            mtime = int(entry.stat().st_mtime)
+        self.__add_stat_time(time() - start)
+        return mtime
+
+    def __get_hidden(self, path):
+        """
+            Get names hidden by a .hidden file, like Gio does
+            @param path as str
+            @return [str]
+        """
+        try:
+            with open(os.path.join(path, ".hidden"), "r") as f:
+                return f.read().splitlines()
+        except:
+            return []
+
+    def __walk_local(self, uri, tracks, track_dirs):
+        """
+            Walk a local root with os.scandir()
+            @param uri as str
+            @param tracks as [(str, int)]
+            @param track_dirs as [str]
+            @return True if root is empty
+        """
+        empty = False
+        root = GLib.filename_from_uri(uri)[0]
+        # Directories to walk with their mtime if already known
+        walk_paths = [(root, None)]
+        while walk_paths:
+            (path, mtime) = walk_paths.pop(0)
+            try:
+                # Get mtime before listing, so changes while
+                # listing are seen by next walk
+                if mtime is None:
+                    mtime = self.__stat(path)
+                dir_uri = GLib.filename_to_uri(path)
+                unchanged = None
+                if path != root:
+                    unchanged = self.__get_unchanged(dir_uri, mtime)
+                if unchanged is not None:
+                    (track_uris, subdir_uris) = unchanged
+                    for track_uri in track_uris:
+                        tracks.append((track_uri, self.__mtimes[track_uri]))
+                    for subdir_uri in subdir_uris:
+                        track_dirs.append(subdir_uri)
+                        walk_paths.append(
+                                (GLib.filename_from_uri(subdir_uri)[0], None))
+                    continue
+                entries = list(os.scandir(path))
+            except Exception as e:
+                print("CollectionWalker::__walk_local():", e)
+                continue
+            if path == root and not entries:
+                empty = True
+            hidden = self.__get_hidden(path)
+            count = 0
+            for entry in entries:
+                if entry.name.startswith(".") or\
+                        entry.name.endswith("~") or\
+                        entry.name in hidden:
+                    continue
+                try:
+                    child_uri = GLib.filename_to_uri(entry.path)
+                    if entry.is_dir():
+                        track_dirs.append(child_uri)
+                        walk_paths.append((entry.path, self.__stat(entry)))
+                    elif self.is_audio(entry.name, child_uri):
+                        tracks.append((child_uri, self.__stat(entry)))
+                        count += 1
+                except Exception as e:
+                    print("CollectionWalker::__walk_local():", e)
+            self.__dirs[dir_uri] = (mtime, count)
+        return empty
+
+    def __walk_gio(self, uri, tracks, track_dirs):
+        """
+            Walk a root with Gio
+            @param uri as str
+            @param tracks as [(str, int)]
+            @param track_dirs as [str]
+            @return True if root is empty
+        """
+        empty = False
+        root = uri
+        # Directories to walk with their mtime if already known
+        walk_uris = [(root, None)]
+        while walk_uris:
+            (uri, dir_mtime) = walk_uris.pop(0)
+            try:
+                d = Lio.File.new_for_uri(uri)
+                # Get mtime before listing, so changes while
+                # listing are seen by next walk
+                if dir_mtime is None:
+                    start = time()
+                    info = d.query_info("time::modified",
+                                        Gio.FileQueryInfoFlags.NONE,
+                                        None)
+                    dir_mtime = info.get_attribute_uint64("time::modified")
+                    self.__add_stat_time(time() - start)
+                unchanged = None
+                if uri != root:
+                    unchanged = self.__get_unchanged(uri, dir_mtime)
+                if unchanged is not None:
+                    (track_uris, subdir_uris) = unchanged
+                    for track_uri in track_uris:
+                        tracks.append((track_uri, self.__mtimes[track_uri]))
+                    for subdir_uri in subdir_uris:
+                        track_dirs.append(subdir_uri)
+                        walk_uris.append((subdir_uri, None))
+                    continue
+                infos = d.enumerate_children(
+                    "standard::name,standard::type,standard::is-hidden,"
+                    "time::modified",
+                    Gio.FileQueryInfoFlags.NONE,
+                    None)
+            except Exception as e:
+                print("CollectionWalker::__walk_gio():", e)
+                continue
+            if uri == root:
+                empty = True
+            count = 0
+            for info in infos:
+                f = infos.get_child(info)
+                child_uri = f.get_uri()
+                empty = False
+                if info.get_is_hidden():
+                    continue
+                elif info.get_file_type() == Gio.FileType.DIRECTORY:
+                    track_dirs.append(child_uri)
+                    walk_uris.append((child_uri,
+                                      info.get_attribute_uint64(
+                                                          "time::modified")))
+                else:
+                    try:
+                        if self.is_audio(info.get_name(), child_uri):
+                            mtime = info.get_attribute_uint64(
+                                                            "time::modified")
+                            tracks.append((child_uri, mtime))
+                            count += 1
+                    except Exception as e:
+                        print("CollectionWalker::__walk_gio():", e)
+            self.__dirs[uri] = (dir_mtime, count)
+        return empty
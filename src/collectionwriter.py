@@ -0,0 +1,292 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+from time import time
+
+from lollypop.define import Lp, Type, DbPersistent
+from lollypop.sqlcursor import SqlCursor
+from lollypop.utils import format_artist_name
+from lollypop.lio import Lio
+
+
+class CollectionWriter:
+    """
+        Write scanned tracks to db by batches
+        Artists, genres and albums ids are resolved in memory
+        Must be used in a single thread holding a db cursor
+    """
+    # Tracks written in one transaction
+    __BATCH_SIZE = 1000
+    # Same as SQLite NOCASE collation: only ASCII chars are folded
+    __NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+                             "abcdefghijklmnopqrstuvwxyz")
+
+    def __init__(self, scanner, stats):
+        """
+            Init writer, load ids from db
+            @param scanner as CollectionScanner, used to emit signals
+            @param stats as ScanStats
+        """
+        self.__scanner = scanner
+        self.__stats = stats
+        self.__tracks = []
+        # Artist ids by lower name and artist sortnames by id
+        self.__artists = {}
+        self.__sortnames = {}
+        # Genre ids by name
+        self.__genres = {}
+        # Album ids by (lower name, artist id) and by name if no artist
+        self.__albums = {}
+        self.__no_artist_albums = {}
+        self.__album_uris = {}
+        self.__load()
+
+    def add(self, uri, mtime, file_mtime, tags, stats):
+        """
+            Add a track, written on next flush
+            @param uri as str
+            @param mtime as int
+            @param file_mtime as int
+            @param tags as {} (see TagReader.read_tags())
+            @param stats as (track popularity, track rate, track ltime,
+                             album mtime, album loved, album popularity,
+                             album rate) (see History.get())
+        """
+        start = time()
+        (track_pop, track_rate, track_ltime, album_mtime,
+         loved, album_pop, album_rate) = stats
+        artist_ids = self.__add_artists(tags["artists"],
+                                        tags["a_sortnames"])
+        album_artist_ids = self.__add_artists(tags["album_artists"],
+                                              tags["aa_sortnames"])
+        album_id = self.__add_album(tags["album_name"], album_artist_ids,
+                                    uri, loved, album_pop, album_rate)
+        genre_ids = self.__add_genres(tags["genres"])
+        self.__tracks.append(((tags["title"], uri, tags["duration"],
+                               tags["tracknumber"], tags["discnumber"],
+                               tags["discname"], album_id, tags["year"],
+                               track_pop, track_rate, track_ltime,
+                               DbPersistent.INTERNAL, tags["fingerprint"]),
+                              artist_ids, album_artist_ids,
+                              genre_ids, mtime, album_mtime,
+                              (file_mtime, tags["lyrics"],
+                               tags["comments"])))
+        self.__stats.add_time("db write", time() - start)
+        if len(self.__tracks) >= self.__BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """
+            Write pending tracks to db and commit
+        """
+        if not self.__tracks:
+            return
+        start = time()
+        artist_ids = set()
+        genre_ids = set()
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT MAX(rowid) FROM tracks")
+            max_id = result.fetchone()[0] or 0
+            sql.executemany("INSERT INTO tracks (name, uri, duration,\
+                             tracknumber, discnumber, discname, album_id,\
+                             year, popularity, rate, ltime, persistent,\
+                             fingerprint)\
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [track[0] for track in self.__tracks])
+            # Get new rowids, another thread may have added tracks
+            result = sql.execute("SELECT uri, rowid FROM tracks\
+                                  WHERE rowid>? AND persistent=?",
+                                 (max_id, DbPersistent.INTERNAL))
+            track_ids = dict(result)
+            track_artists = []
+            track_genres = []
+            track_tags = []
+            # Albums aggregates are updated once per album
+            album_genres = {}
+            no_artist_album_ids = set()
+            for (track, track_artist_ids, album_artist_ids,
+                 track_genre_ids, mtime, album_mtime,
+                 (file_mtime, lyrics, comments)) in self.__tracks:
+                track_id = track_ids[track[1]]
+                track_tags.append((track_id, file_mtime, lyrics, comments))
+                for artist_id in dict.fromkeys(track_artist_ids):
+                    track_artists.append((track_id, artist_id))
+                for genre_id in dict.fromkeys(track_genre_ids):
+                    track_genres.append((track_id, genre_id, mtime))
+                album_id = track[6]
+                if album_id not in album_genres.keys():
+                    album_genres[album_id] = {}
+                for genre_id in track_genre_ids:
+                    album_genres[album_id][genre_id] = album_mtime
+                if not album_artist_ids:
+                    no_artist_album_ids.add(album_id)
+                artist_ids |= set(track_artist_ids) | set(album_artist_ids)
+                genre_ids |= set(track_genre_ids)
+            # Written tracks are not pending anymore
+            sql.executemany("DELETE FROM scan_journal WHERE uri=?",
+                            [(uri,) for uri in track_ids.keys()])
+            sql.executemany("INSERT INTO track_artists (track_id, artist_id)\
+                             VALUES (?, ?)", track_artists)
+            sql.executemany("INSERT INTO track_genres\
+                             (track_id, genre_id, mtime)\
+                             VALUES (?, ?, ?)", track_genres)
+            sql.executemany("INSERT OR REPLACE INTO track_tags\
+                             (track_id, mtime, lyrics, comments)\
+                             VALUES (?, ?, ?, ?)", track_tags)
+            self.__stats.add_time("db write", time() - start)
+            start = time()
+            # Set artist ids based on content
+            Lp().albums.update_artist_ids(no_artist_album_ids)
+            Lp().albums.add_genres(album_genres)
+            Lp().albums.update_years(album_genres.keys())
+            self.__stats.add_time("album aggregation", time() - start)
+            start = time()
+            sql.commit()
+            self.__stats.add_time("commit", time() - start)
+        self.__tracks = []
+        # Tracks and albums may come with popularity from history
+        Lp().tracks.popularity.reset()
+        Lp().albums.popularity.reset()
+        Lp().albums.update_max_count()
+        for genre_id in genre_ids:
+            GLib.idle_add(self.__scanner.emit, "genre-updated", genre_id, True)
+        for artist_id in artist_ids:
+            GLib.idle_add(self.__scanner.emit, "artist-updated",
+                          artist_id, True)
+
+#######################
+# PRIVATE             #
+#######################
+    def __load(self):
+        """
+            Load artists, genres and local albums ids
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT rowid, name, sortname FROM artists")
+            for (artist_id, name, sortname) in result:
+                self.__artists.setdefault(name.translate(self.__NOCASE),
+                                          artist_id)
+                self.__sortnames[artist_id] = sortname
+            result = sql.execute("SELECT rowid, name FROM genres")
+            for (genre_id, name) in result:
+                self.__genres.setdefault(name, genre_id)
+            result = sql.execute("SELECT rowid, name, no_album_artist, uri\
+                                  FROM albums WHERE synced!=?\
+                                  ORDER BY rowid", (Type.NONE,))
+            for (album_id, name, no_album_artist, uri) in result:
+                self.__album_uris[album_id] = uri
+                if no_album_artist:
+                    self.__no_artist_albums.setdefault(name, album_id)
+            result = sql.execute("SELECT albums.rowid, name, artist_id\
+                                  FROM albums, album_artists\
+                                  WHERE album_artists.album_id=albums.rowid\
+                                  AND no_album_artist=0 AND synced!=?\
+                                  ORDER BY albums.rowid", (Type.NONE,))
+            for (album_id, name, artist_id) in result:
+                self.__albums.setdefault(
+                                 (name.translate(self.__NOCASE), artist_id),
+                                 album_id)
+
+    def __add_artists(self, artists, sortnames):
+        """
+            Get artist ids, add missing artists to db
+            @param artists as str
+            @param sortnames as str
+            @return artist ids as [int]
+        """
+        artist_ids = []
+        sortsplit = sortnames.split(";")
+        sortlen = len(sortsplit)
+        i = 0
+        for artist in artists.split(";"):
+            artist = artist.strip()
+            if artist != "":
+                key = artist.translate(self.__NOCASE)
+                artist_id = self.__artists.get(key, None)
+                if i >= sortlen or sortsplit[i] == "":
+                    sortname = None
+                else:
+                    sortname = sortsplit[i].strip()
+                if artist_id is None:
+                    if sortname is None:
+                        sortname = format_artist_name(artist)
+                    artist_id = Lp().artists.add(artist, sortname)
+                    self.__artists[key] = artist_id
+                    self.__sortnames[artist_id] = sortname
+                elif sortname is not None and\
+                        self.__sortnames[artist_id] != sortname:
+                    Lp().artists.set_sortname(artist_id, sortname)
+                    self.__sortnames[artist_id] = sortname
+                i += 1
+                artist_ids.append(artist_id)
+        return artist_ids
+
+    def __add_genres(self, genres):
+        """
+            Get genre ids, add missing genres to db
+            @param genres as str
+            @return genre ids as [int]
+        """
+        genre_ids = []
+        for genre in genres.split(";"):
+            genre = genre.strip()
+            if genre != "":
+                genre_id = self.__genres.get(genre, None)
+                if genre_id is None:
+                    genre_id = Lp().genres.add(genre)
+                    self.__genres[genre] = genre_id
+                genre_ids.append(genre_id)
+        return genre_ids
+
+    def __add_album(self, album_name, artist_ids,
+                    uri, loved, popularity, rate):
+        """
+            Get album id, add album to db if missing
+            @param album name as str
+            @param album artist ids as [int]
+            @param uri to an album track as str
+            @param loved as bool
+            @param popularity as int
+            @param rate as int
+            @return album id as int
+        """
+        f = Lio.File.new_for_uri(uri)
+        d = f.get_parent()
+        if d is not None:
+            parent_uri = d.get_uri()
+        else:
+            parent_uri = ""
+        album_id = None
+        key = album_name.translate(self.__NOCASE)
+        if artist_ids:
+            for artist_id in artist_ids:
+                album_id = self.__albums.get((key, artist_id), None)
+                if album_id is not None:
+                    break
+        else:
+            album_id = self.__no_artist_albums.get(album_name, None)
+        if album_id is None:
+            album_id = Lp().albums.add(album_name, artist_ids, parent_uri,
+                                       loved, popularity, rate)
+            self.__album_uris[album_id] = parent_uri
+            if artist_ids:
+                for artist_id in artist_ids:
+                    self.__albums[(key, artist_id)] = album_id
+            else:
+                self.__no_artist_albums[album_name] = album_id
+        # Now we have our album id, check if path doesn't change
+        elif self.__album_uris[album_id] != parent_uri:
+            Lp().albums.set_uri(album_id, parent_uri)
+            self.__album_uris[album_id] = parent_uri
+        return album_id
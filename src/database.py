@@ -13,12 +13,14 @@
 from gi.repository import GLib, Gio
 
 import sqlite3
+import itertools
 
-from lollypop.define import Lp
+from lollypop.define import Lp, Type
 from lollypop.objects import Album
 from lollypop.database_upgrade import DatabaseUpgrade
 from lollypop.sqlcursor import SqlCursor
-from lollypop.localized import LocalizedCollation
+from lollypop.localized import LocalizedCollation, get_sort_key, \
+    get_sort_locale
 from lollypop.utils import noaccents
 from lollypop.lio import Lio
 
@@ -46,12 +48,16 @@ class Database:
                                               popularity INT NOT NULL,
                                               rate INT NOT NULL,
                                               loved INT NOT NULL,
-                                              synced INT NOT NULL)"""
+                                              synced INT NOT NULL,
+                                              sortkey BLOB,
+                                              chart INT NOT NULL DEFAULT 0)"""
     __create_artists = """CREATE TABLE artists (id INTEGER PRIMARY KEY,
                                                name TEXT NOT NULL,
-                                               sortname TEXT NOT NULL)"""
+                                               sortname TEXT NOT NULL,
+                                               sortkey BLOB)"""
     __create_genres = """CREATE TABLE genres (id INTEGER PRIMARY KEY,
-                                            name TEXT NOT NULL)"""
+                                            name TEXT NOT NULL,
+                                            sortkey BLOB)"""
     __create_album_artists = """CREATE TABLE album_artists (
                                                 album_id INT NOT NULL,
                                                 artist_id INT NOT NULL)"""
@@ -71,8 +77,9 @@ class Database:
                                               popularity INT NOT NULL,
                                               rate INT NOT NULL,
                                               ltime INT NOT NULL,
-                                              persistent INT NOT NULL DEFAULT 1
-                                              )"""
+                                              persistent INT NOT NULL
+                                              DEFAULT 1,
+                                              fingerprint TEXT)"""
     __create_track_artists = """CREATE TABLE track_artists (
                                                 track_id INT NOT NULL,
                                                 artist_id INT NOT NULL)"""
@@ -80,6 +87,24 @@ class Database:
                                                 track_id INT NOT NULL,
                                                 mtime INT NOT NULL,
                                                 genre_id INT NOT NULL)"""
+    # Directories seen by last collection scan, count is audio files count
+    __create_dirs = """CREATE TABLE dirs (uri TEXT NOT NULL,
+                                          mtime INT NOT NULL,
+                                          count INT NOT NULL)"""
+    # Tracks still to add by an interrupted scan
+    __create_scan_journal = """CREATE TABLE scan_journal (
+                                                uri TEXT PRIMARY KEY,
+                                                mtime INT NOT NULL,
+                                                file_mtime INT NOT NULL
+                                                DEFAULT 0)"""
+    # Tags only needed when showing a track, mtime is file mtime
+    __create_track_tags = """CREATE TABLE track_tags (
+                                                track_id INT PRIMARY KEY,
+                                                mtime INT NOT NULL,
+                                                lyrics TEXT NOT NULL,
+                                                comments TEXT NOT NULL)"""
+    __create_tracks_album_idx = """CREATE index idx_tal ON tracks(
+                                                album_id)"""
     __create_album_artists_idx = """CREATE index idx_aa ON album_artists(
                                                 album_id)"""
     __create_track_artists_idx = """CREATE index idx_ta ON track_artists(
@@ -88,6 +113,25 @@ class Database:
                                                 album_id)"""
     __create_track_genres_idx = """CREATE index idx_tg ON track_genres(
                                                 track_id)"""
+    # Sort keys are locale dependent, see localized.get_sort_key()
+    __create_artists_sortkey_idx = """CREATE index idx_arsk ON artists(
+                                                sortkey)"""
+    __create_albums_sortkey_idx = """CREATE index idx_alsk ON albums(
+                                                sortkey)"""
+    __create_genres_sortkey_idx = """CREATE index idx_gsk ON genres(
+                                                sortkey)"""
+    # Albums listings filter out charts, see AlbumsDatabase.get_ids()
+    __create_albums_chart_idx = """CREATE index idx_alch ON albums(
+                                                chart, sortkey)"""
+    __create_album_genres_genre_idx = """CREATE index idx_agg ON album_genres(
+                                                genre_id, album_id)"""
+    # Most popular items, see PopularityStats
+    __create_tracks_popularity_idx = """CREATE index idx_tpop ON tracks(
+                                                popularity)"""
+    __create_albums_popularity_idx = """CREATE index idx_alpop ON albums(
+                                                popularity)"""
+    # Tracks lookup by file or directory, see TracksDatabase.get_mtimes()
+    __create_tracks_uri_idx = """CREATE index idx_turi ON tracks(uri)"""
 
     def __init__(self):
         """
@@ -111,13 +155,26 @@ class Database:
                     sql.execute(self.__create_tracks)
                     sql.execute(self.__create_track_artists)
                     sql.execute(self.__create_track_genres)
+                    sql.execute(self.__create_dirs)
+                    sql.execute(self.__create_scan_journal)
+                    sql.execute(self.__create_track_tags)
                     sql.execute(self.__create_album_artists_idx)
                     sql.execute(self.__create_track_artists_idx)
                     sql.execute(self.__create_album_genres_idx)
                     sql.execute(self.__create_track_genres_idx)
+                    sql.execute(self.__create_tracks_album_idx)
+                    sql.execute(self.__create_artists_sortkey_idx)
+                    sql.execute(self.__create_albums_sortkey_idx)
+                    sql.execute(self.__create_genres_sortkey_idx)
+                    sql.execute(self.__create_albums_chart_idx)
+                    sql.execute(self.__create_album_genres_genre_idx)
+                    sql.execute(self.__create_tracks_popularity_idx)
+                    sql.execute(self.__create_albums_popularity_idx)
+                    sql.execute(self.__create_tracks_uri_idx)
                     sql.commit()
                     Lp().settings.set_value("db-version",
                                             GLib.Variant("i", upgrade.count()))
+                self.create_search_index()
             except Exception as e:
                 print("Database::__init__(): %s" % e)
 
@@ -132,13 +189,78 @@ class Database:
             upgrade.do_db_upgrade()
             Lp().settings.set_value("db-version",
                                     GLib.Variant("i", upgrade.count()))
+            self.update_sort_keys()
+
+    def update_sort_keys(self):
+        """
+            Recompute artists, albums and genres sort keys
+            if locale changed since last computation
+        """
+        sort_locale = get_sort_locale()
+        if Lp().settings.get_value("sort-locale").get_string() == sort_locale:
+            return
+        try:
+            with SqlCursor(self) as sql:
+                for (table, column) in [("artists", "sortname"),
+                                        ("albums", "name"),
+                                        ("genres", "name")]:
+                    result = sql.execute("SELECT rowid, %s FROM %s" % (
+                                                               column, table))
+                    keys = [(get_sort_key(value or ""), rowid)
+                            for (rowid, value) in result.fetchall()]
+                    sql.executemany("UPDATE %s SET sortkey=?\
+                                     WHERE rowid=?" % table, keys)
+                sql.commit()
+            Lp().settings.set_value("sort-locale",
+                                    GLib.Variant("s", sort_locale))
+        except Exception as e:
+            print("Database::update_sort_keys():", e)
+
+    def create_search_index(self):
+        """
+            Create full text search tables on tracks, albums and artists
+            names, kept in sync by triggers
+            Search falls back to LIKE if SQLite has no FTS5 support
+        """
+        if sqlite3.sqlite_version_info >= (3, 27, 0):
+            tokenizer = "unicode61 remove_diacritics 2"
+        else:
+            tokenizer = "unicode61 remove_diacritics 1"
+        try:
+            with SqlCursor(self) as sql:
+                for table in ["tracks", "albums", "artists"]:
+                    sql.execute("CREATE VIRTUAL TABLE %s_fts USING fts5(\
+                                 name, content='%s', content_rowid='id',\
+                                 tokenize='%s')" % (table, table, tokenizer))
+                    sql.execute("CREATE TRIGGER %s_fts_add AFTER INSERT\
+                                 ON %s BEGIN\
+                                 INSERT INTO %s_fts (rowid, name)\
+                                 VALUES (new.rowid, new.name);\
+                                 END" % (table, table, table))
+                    sql.execute("CREATE TRIGGER %s_fts_del AFTER DELETE\
+                                 ON %s BEGIN\
+                                 INSERT INTO %s_fts (%s_fts, rowid, name)\
+                                 VALUES ('delete', old.rowid, old.name);\
+                                 END" % (table, table, table, table))
+                    sql.execute("CREATE TRIGGER %s_fts_upd AFTER UPDATE\
+                                 OF name ON %s BEGIN\
+                                 INSERT INTO %s_fts (%s_fts, rowid, name)\
+                                 VALUES ('delete', old.rowid, old.name);\
+                                 INSERT INTO %s_fts (rowid, name)\
+                                 VALUES (new.rowid, new.name);\
+                                 END" % (table, table, table, table, table))
+                    sql.execute("INSERT INTO %s_fts (%s_fts)\
+                                 VALUES ('rebuild')" % (table, table))
+                sql.commit()
+        except Exception as e:
+            print("Database::create_search_index():", e)
 
     def get_cursor(self):
         """
             Return a new sqlite cursor
         """
         try:
-            c = sqlite3.connect(self.DB_PATH, 600.0)
+            c = SqlCursor.connect(self.DB_PATH)
             c.create_collation("LOCALIZED", LocalizedCollation())
             c.create_function("noaccents", 1, noaccents)
             return c
@@ -149,44 +271,153 @@ class Database:
         """
             Drop database
         """
+        SqlCursor.clear(self)
+        try:
+            # Leave WAL mode, a WAL file must not be kept for a new db
+            sql = sqlite3.connect(self.DB_PATH, 600.0)
+            sql.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            sql.execute("PRAGMA journal_mode=DELETE")
+            sql.close()
+        except Exception as e:
+            print("Database::drop_db():", e)
         try:
             f = Gio.File.new_for_path(self.DB_PATH)
             f.trash()
+            for suffix in ["-wal", "-shm"]:
+                f = Gio.File.new_for_path(self.DB_PATH + suffix)
+                if f.query_exists():
+                    f.delete()
         except Exception as e:
             print("Database::drop_db():", e)
 
     def del_tracks(self, track_ids):
         """
-            Delete tracks from db
+            Delete tracks from db, with orphaned albums, artists and genres
+            Done with a few set based requests in one transaction
             @param track_ids as [int]
+            @return art cache names of deleted albums as [str]
         """
-        SqlCursor.add(Lp().playlists)
+        track_ids = list(dict.fromkeys(track_ids))
+        if not track_ids:
+            return []
         with SqlCursor(self) as sql:
-            all_album_ids = []
-            all_artist_ids = []
-            all_genre_ids = []
-            for track_id in track_ids:
-                album_id = Lp().tracks.get_album_id(track_id)
-                art_file = Lp().art.get_album_cache_name(Album(album_id))
-                genre_ids = Lp().tracks.get_genre_ids(track_id)
-                album_artist_ids = Lp().albums.get_artist_ids(album_id)
-                artist_ids = Lp().tracks.get_artist_ids(track_id)
-                uri = Lp().tracks.get_uri(track_id)
-                Lp().playlists.remove(uri)
-                Lp().tracks.remove(track_id)
-                Lp().tracks.clean(track_id)
-                all_album_ids.append(album_id)
-                all_artist_ids += album_artist_ids + artist_ids
-                all_genre_ids += genre_ids
-            for album_id in list(set(all_album_ids)):
-                if Lp().albums.clean(album_id):
-                    Lp().art.clean_store(art_file)
-            for artist_id in list(set(all_artist_ids)):
-                Lp().artists.clean(artist_id)
-            for genre_id in list(set(all_genre_ids)):
-                Lp().genres.clean(genre_id)
+            for table in ["tmp_del_track_ids", "tmp_del_album_ids",
+                          "tmp_del_artist_ids", "tmp_del_genre_ids"]:
+                sql.execute("CREATE TEMP TABLE IF NOT EXISTS %s (\
+                                        id INTEGER PRIMARY KEY)" % table)
+                sql.execute("DELETE FROM %s" % table)
+            sql.executemany("INSERT INTO tmp_del_track_ids (id) VALUES (?)",
+                            [(track_id,) for track_id in track_ids])
+            sql.execute("INSERT OR IGNORE INTO tmp_del_album_ids (id)\
+                         SELECT album_id FROM tracks\
+                         WHERE rowid IN (SELECT id FROM tmp_del_track_ids)")
+            sql.execute("INSERT OR IGNORE INTO tmp_del_artist_ids (id)\
+                         SELECT artist_id FROM track_artists\
+                         WHERE track_id IN\
+                         (SELECT id FROM tmp_del_track_ids)\
+                         UNION SELECT artist_id FROM album_artists\
+                         WHERE album_id IN\
+                         (SELECT id FROM tmp_del_album_ids)")
+            sql.execute("INSERT OR IGNORE INTO tmp_del_genre_ids (id)\
+                         SELECT genre_id FROM track_genres\
+                         WHERE track_id IN\
+                         (SELECT id FROM tmp_del_track_ids)")
+            result = sql.execute("SELECT uri FROM tracks\
+                                  WHERE rowid IN\
+                                  (SELECT id FROM tmp_del_track_ids)")
+            uris = list(itertools.chain(*result))
+            result = sql.execute("SELECT id FROM tmp_del_album_ids")
+            album_ids = list(itertools.chain(*result))
+            # Cache names need album artists, get them before deletion
+            art_files = {}
+            if Lp().art is not None:
+                for album in Album.load_many(album_ids):
+                    art_files[album.id] = Lp().art.get_album_cache_name(album)
+
+            for table in ["track_genres", "track_artists", "track_tags"]:
+                sql.execute("DELETE FROM %s\
+                             WHERE track_id IN\
+                             (SELECT id FROM tmp_del_track_ids)" % table)
+            sql.execute("DELETE FROM tracks\
+                         WHERE rowid IN (SELECT id FROM tmp_del_track_ids)")
+            # Remove album genres without tracks
+            sql.execute("DELETE FROM album_genres\
+                         WHERE album_id IN (SELECT id FROM tmp_del_album_ids)\
+                         AND NOT EXISTS (\
+                            SELECT 1 FROM tracks, track_genres\
+                            WHERE tracks.album_id=album_genres.album_id\
+                            AND track_genres.track_id=tracks.rowid\
+                            AND track_genres.genre_id=album_genres.genre_id)")
+            sql.execute("UPDATE albums SET chart=0\
+                         WHERE rowid IN (SELECT id FROM tmp_del_album_ids)\
+                         AND chart=1\
+                         AND NOT EXISTS (\
+                            SELECT 1 FROM album_genres\
+                            WHERE album_genres.album_id=albums.rowid\
+                            AND album_genres.genre_id=?)", (Type.CHARTS,))
+            # Remove orphaned albums, artists and genres
+            result = sql.execute("SELECT id FROM tmp_del_album_ids\
+                                  WHERE NOT EXISTS (\
+                                    SELECT 1 FROM tracks\
+                                    WHERE tracks.album_id=\
+                                    tmp_del_album_ids.id)")
+            deleted_album_ids = list(itertools.chain(*result))
+            sql.execute("DELETE FROM tmp_del_album_ids\
+                         WHERE EXISTS (\
+                            SELECT 1 FROM tracks\
+                            WHERE tracks.album_id=tmp_del_album_ids.id)")
+            sql.execute("DELETE FROM album_artists\
+                         WHERE album_id IN (SELECT id FROM tmp_del_album_ids)")
+            sql.execute("DELETE FROM albums\
+                         WHERE rowid IN (SELECT id FROM tmp_del_album_ids)")
+            result = sql.execute("SELECT id FROM tmp_del_artist_ids\
+                                  WHERE NOT EXISTS (\
+                                    SELECT 1 FROM album_artists\
+                                    WHERE album_artists.artist_id=\
+                                    tmp_del_artist_ids.id)\
+                                  AND NOT EXISTS (\
+                                    SELECT 1 FROM track_artists\
+                                    WHERE track_artists.artist_id=\
+                                    tmp_del_artist_ids.id)")
+            deleted_artist_ids = list(itertools.chain(*result))
+            sql.execute("DELETE FROM artists\
+                         WHERE rowid IN (SELECT id FROM tmp_del_artist_ids)\
+                         AND NOT EXISTS (\
+                            SELECT 1 FROM album_artists\
+                            WHERE album_artists.artist_id=artists.rowid)\
+                         AND NOT EXISTS (\
+                            SELECT 1 FROM track_artists\
+                            WHERE track_artists.artist_id=artists.rowid)")
+            result = sql.execute("SELECT id FROM tmp_del_genre_ids\
+                                  WHERE NOT EXISTS (\
+                                    SELECT 1 FROM track_genres\
+                                    WHERE track_genres.genre_id=\
+                                    tmp_del_genre_ids.id)")
+            deleted_genre_ids = list(itertools.chain(*result))
+            sql.execute("DELETE FROM genres\
+                         WHERE rowid IN (SELECT id FROM tmp_del_genre_ids)\
+                         AND NOT EXISTS (\
+                            SELECT 1 FROM track_genres\
+                            WHERE track_genres.genre_id=genres.rowid)")
             sql.commit()
-        SqlCursor.remove(Lp().playlists)
+
+        for track_id in track_ids:
+            Lp().tracks.cache.invalidate(track_id)
+            Lp().tracks.popularity.remove(track_id)
+        for album_id in album_ids:
+            Lp().albums.cache.invalidate(album_id)
+        for album_id in deleted_album_ids:
+            Lp().albums.popularity.remove(album_id)
+        for artist_id in deleted_artist_ids:
+            Lp().artists.cache.invalidate(artist_id)
+        for genre_id in deleted_genre_ids:
+            Lp().genres.cache.invalidate(genre_id)
+        Lp().playlists.remove_uris(uris)
+        art_files = [art_files[album_id] for album_id in deleted_album_ids
+                     if album_id in art_files.keys()]
+        for art_file in art_files:
+            Lp().art.clean_store(art_file)
+        return art_files
 
 #######################
 # PRIVATE             #
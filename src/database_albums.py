@@ -12,24 +12,34 @@
 
 from gettext import gettext as _
 import itertools
+import sqlite3
 
 from lollypop.sqlcursor import SqlCursor
 from lollypop.define import Lp, Type, OrderBy
 from lollypop.utils import remove_static_genres, noaccents
-from lollypop.utils import get_network_available
+from lollypop.utils import get_network_available, get_search_query
+from lollypop.localized import get_sort_key
+from lollypop.database_cache import DatabaseCache
+from lollypop.database_popularity import PopularityStats
 
 
 class AlbumsDatabase:
     """
         Albums database helper
     """
+    # Albums loaded by one get_many() request
+    __CHUNK_SIZE = 500
 
     def __init__(self):
         """
             Init albums database object
         """
-        self.__max_count = 1
+        # None if must be computed
+        self.__max_count = None
         self._cached_randoms = []
+        self.cache = DatabaseCache(
+                    Lp().settings.get_value("db-cache-size").get_int32())
+        self.popularity = PopularityStats("albums")
 
     def add(self, name, artist_ids, uri, loved, popularity, rate):
         """
@@ -46,14 +56,18 @@ class AlbumsDatabase:
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("INSERT INTO albums\
                                   (name, no_album_artist,\
-                                  uri, loved, popularity, rate, synced)\
-                                  VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  uri, loved, popularity, rate, synced,\
+                                  sortkey)\
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
                                  (name, artist_ids == [],
-                                  uri, loved, popularity, rate, 0))
+                                  uri, loved, popularity, rate, 0,
+                                  get_sort_key(name)))
             for artist_id in artist_ids:
                 sql.execute("INSERT INTO album_artists\
                              (album_id, artist_id)\
                              VALUES (?, ?)", (result.lastrowid, artist_id))
+            self.cache.invalidate(result.lastrowid)
+            self.popularity.update(result.lastrowid, popularity)
             return result.lastrowid
 
     def add_artist(self, album_id, artist_id):
@@ -64,11 +78,12 @@ class AlbumsDatabase:
             @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
-            artist_ids = self.get_artist_ids(album_id)
+            artist_ids = self.__get_artist_ids(album_id)
             if artist_id not in artist_ids:
                 sql.execute("INSERT INTO "
                             "album_artists (album_id, artist_id)"
                             "VALUES (?, ?)", (album_id, artist_id))
+                self.cache.invalidate(album_id)
 
     def add_genre(self, album_id, genre_id, mtime):
         """
@@ -96,6 +111,8 @@ class AlbumsDatabase:
                                  album_genres (album_id, genre_id, mtime)\
                                  VALUES (?, ?, ?)",
                                 (album_id, genre_id, mtime))
+                    if genre_id == Type.CHARTS:
+                        self.__set_chart(sql, album_id, True)
 
     def del_genres(self, album_id):
         """
@@ -106,6 +123,7 @@ class AlbumsDatabase:
         with SqlCursor(Lp().db) as sql:
             sql.execute("DELETE FROM album_genres "
                         "WHERE album_id=?", (album_id,))
+            self.__set_chart(sql, album_id, False)
 
     def set_artist_ids(self, album_id, artist_ids):
         """
@@ -115,7 +133,7 @@ class AlbumsDatabase:
             @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
-            currents = self.get_artist_ids(album_id)
+            currents = self.__get_artist_ids(album_id)
             if not currents or set(currents) - set(artist_ids):
                 sql.execute("DELETE FROM album_artists\
                             WHERE album_id=?", (album_id,))
@@ -123,6 +141,7 @@ class AlbumsDatabase:
                     sql.execute("INSERT INTO album_artists\
                                 (album_id, artist_id)\
                                 VALUES (?, ?)", (album_id, artist_id))
+                self.cache.invalidate(album_id)
 
     def set_synced(self, album_id, synced):
         """
@@ -191,6 +210,7 @@ class AlbumsDatabase:
                             (popularity, album_id))
                 if commit:
                     sql.commit()
+                self.popularity.update(album_id, popularity)
             except:  # Database is locked
                 pass
 
@@ -205,11 +225,9 @@ class AlbumsDatabase:
                        AND (album_artists.artist_id = artists.rowid\
                             OR album_artists.artist_id=?)\
                        AND synced=1"
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order = " ORDER BY artists.sortkey,\
                      albums.year,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
             filters = (Type.COMPILATIONS,)
             result = sql.execute(request + order, filters)
             return list(itertools.chain(*result))
@@ -250,15 +268,11 @@ class AlbumsDatabase:
             @param year as str
         """
         with SqlCursor(Lp().db) as sql:
-            filters = (Type.CHARTS, year)
-            request = "SELECT DISTINCT albums.rowid\
-                       FROM albums, album_genres AS AG\
-                       WHERE ? NOT IN (\
-                            SELECT album_genres.genre_id\
-                            FROM album_genres\
-                            WHERE AG.album_id=album_genres.album_id)\
-                       AND year=?\
-                       AND AG.album_id=albums.rowid"
+            filters = (year,)
+            request = "SELECT albums.rowid\
+                       FROM albums\
+                       WHERE albums.chart=0\
+                       AND year=?"
             if not get_network_available():
                 request += " AND albums.synced!=%s" % Type.NONE
             result = sql.execute(request, filters)
@@ -341,21 +355,14 @@ class AlbumsDatabase:
             sql.execute("UPDATE albums set popularity=? WHERE rowid=?",
                         (current, album_id))
             sql.commit()
+            self.popularity.update(album_id, current)
 
     def get_avg_popularity(self):
         """
             Return avarage popularity
             @return avarage popularity as int
         """
-        with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT AVG(popularity)\
-                                  FROM (SELECT popularity\
-                                        FROM albums\
-                                        ORDER BY POPULARITY DESC LIMIT 100)")
-            v = result.fetchone()
-            if v and v[0] > 5:
-                return v[0]
-            return 5
+        return self.popularity.get_average()
 
     def get_id(self, album_name, artist_ids, remote):
         """
@@ -368,14 +375,16 @@ class AlbumsDatabase:
         with SqlCursor(Lp().db) as sql:
             filters = (album_name,)
             if artist_ids:
-                filters += tuple(artist_ids)
+                (artist_filter, artist_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "album_artists.artist_id",
+                                                    artist_ids)
+                filters += artist_filters
                 request = "SELECT albums.rowid FROM albums, album_artists\
                            WHERE name=? COLLATE NOCASE AND\
                            no_album_artist=0 AND\
-                           album_artists.album_id=albums.rowid AND (1=0 "
-                for artist_id in artist_ids:
-                    request += "OR artist_id=? "
-                request += ")"
+                           album_artists.album_id=albums.rowid AND "
+                request += artist_filter
                 if remote:
                     request += " AND synced=%s" % Type.NONE
                 else:
@@ -429,14 +438,7 @@ class AlbumsDatabase:
             @param Album id as int
             @return Album name as string
         """
-        with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT name FROM albums where rowid=?",
-                                 (album_id,))
-            v = result.fetchone()
-            if v is not None:
-                return v[0]
-
-            return _("Unknown")
+        return self.cache.get(album_id, self.__get_name, _("Unknown"))
 
     def get_artists(self, album_id):
         """
@@ -444,13 +446,7 @@ class AlbumsDatabase:
             @param Album id as int
             @return artists as [str]
         """
-        with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT artists.name\
-                                 FROM artists, album_artists\
-                                 WHERE album_artists.album_id=?\
-                                 AND album_artists.artist_id=artists.rowid",
-                                 (album_id,))
-            return list(itertools.chain(*result))
+        return self.cache.get(album_id, self.__get_artists)
 
     def get_artist_ids(self, album_id):
         """
@@ -458,12 +454,59 @@ class AlbumsDatabase:
             @param album_id
             @return artist ids as [int]
         """
+        return self.cache.get(album_id, self.__get_artist_ids)
+
+    def get_many(self, album_ids):
+        """
+            Get fields for albums, see objects.Album.FIELDS
+            Duration is not loaded, it depends on genres
+            @param album ids as [int]
+            @return {album id as int: {field as str: value}}
+        """
+        albums = {}
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT artist_id\
-                                  FROM album_artists\
-                                  WHERE album_id=?",
-                                 (album_id,))
-            return list(itertools.chain(*result))
+            for i in range(0, len(album_ids), self.__CHUNK_SIZE):
+                chunk = tuple(album_ids[i:i + self.__CHUNK_SIZE])
+                marks = ",".join("?" * len(chunk))
+                result = sql.execute("SELECT rowid, name, year, uri,\
+                                      synced, loved\
+                                      FROM albums\
+                                      WHERE rowid IN (%s)" % marks, chunk)
+                for (album_id, name, year, uri, synced, loved) in result:
+                    albums[album_id] = {"name": name,
+                                        "year": str(year) if year else "",
+                                        "uri": uri,
+                                        "synced": synced,
+                                        "loved": loved,
+                                        "artist_ids": [],
+                                        "artists": [],
+                                        "mtime": 0}
+                result = sql.execute("SELECT album_artists.album_id,\
+                                      album_artists.artist_id, artists.name\
+                                      FROM album_artists\
+                                      LEFT JOIN artists\
+                                      ON album_artists.artist_id=artists.rowid\
+                                      WHERE album_artists.album_id IN (%s)\
+                                      ORDER BY album_artists.rowid" % marks,
+                                     chunk)
+                for (album_id, artist_id, name) in result:
+                    if album_id in albums.keys():
+                        albums[album_id]["artist_ids"].append(artist_id)
+                        if name is not None:
+                            albums[album_id]["artists"].append(name)
+                # Same as get_mtime() without genres
+                result = sql.execute("SELECT AG.album_id, AG.mtime\
+                                      FROM album_genres AS AG\
+                                      WHERE AG.album_id IN (%s)\
+                                      AND NOT EXISTS (\
+                                        SELECT mtime FROM album_genres\
+                                        WHERE album_id=AG.album_id\
+                                        AND genre_id < 0)\
+                                      ORDER BY AG.rowid DESC" % marks, chunk)
+                for (album_id, mtime) in result:
+                    if album_id in albums.keys():
+                        albums[album_id]["mtime"] = mtime
+        return albums
 
     def get_year(self, album_id):
         """
@@ -530,19 +573,14 @@ class AlbumsDatabase:
             @return array of album ids as int
         """
         with SqlCursor(Lp().db) as sql:
-            filters = (Type.CHARTS, )
-            request = "SELECT DISTINCT albums.rowid\
-                       FROM albums, album_genres as AG\
-                       WHERE ? NOT IN (\
-                            SELECT album_genres.genre_id\
-                            FROM album_genres\
-                            WHERE AG.album_id=album_genres.album_id)\
-                       AND rate>=4\
-                       AND AG.album_id=albums.rowid"
+            request = "SELECT albums.rowid\
+                       FROM albums\
+                       WHERE albums.chart=0\
+                       AND rate>=4"
             if not get_network_available():
                 request += " AND albums.synced!=%s" % Type.NONE
             request += " ORDER BY popularity DESC LIMIT %s" % limit
-            result = sql.execute(request, filters)
+            result = sql.execute(request)
             return list(itertools.chain(*result))
 
     def get_populars(self, limit=100):
@@ -552,19 +590,14 @@ class AlbumsDatabase:
             @return array of album ids as int
         """
         with SqlCursor(Lp().db) as sql:
-            filters = (Type.CHARTS, )
-            request = "SELECT DISTINCT albums.rowid\
-                       FROM albums, album_genres as AG\
-                       WHERE ? NOT IN (\
-                            SELECT album_genres.genre_id\
-                            FROM album_genres\
-                            WHERE AG.album_id=album_genres.album_id)\
-                       AND popularity!=0\
-                       AND AG.album_id=albums.rowid"
+            request = "SELECT albums.rowid\
+                       FROM albums\
+                       WHERE albums.chart=0\
+                       AND popularity!=0"
             if not get_network_available():
                 request += " AND albums.synced!=%s" % Type.NONE
             request += " ORDER BY popularity DESC LIMIT %s" % limit
-            result = sql.execute(request, filters)
+            result = sql.execute(request)
             return list(itertools.chain(*result))
 
     def get_loves(self):
@@ -573,19 +606,14 @@ class AlbumsDatabase:
             @return array of album ids as int
         """
         with SqlCursor(Lp().db) as sql:
-            filters = (Type.CHARTS, )
-            request = "SELECT DISTINCT albums.rowid\
-                       FROM albums, album_genres as AG\
-                       WHERE ? NOT IN (\
-                            SELECT album_genres.genre_id\
-                            FROM album_genres\
-                            WHERE AG.album_id=album_genres.album_id)\
-                       AND loved=1\
-                       AND AG.album_id=albums.rowid"
+            request = "SELECT albums.rowid\
+                       FROM albums\
+                       WHERE albums.chart=0\
+                       AND loved=1"
             if not get_network_available():
                 request += " AND albums.synced!=%s" % Type.NONE
             request += " ORDER BY popularity DESC"
-            result = sql.execute(request, filters)
+            result = sql.execute(request)
             return list(itertools.chain(*result))
 
     def get_recents(self):
@@ -594,18 +622,15 @@ class AlbumsDatabase:
             @return array of albums ids as int
         """
         with SqlCursor(Lp().db) as sql:
-            filters = (Type.CHARTS, )
-            request = "SELECT DISTINCT albums.rowid\
-                       FROM albums, album_genres as AG\
-                       WHERE ? NOT IN (\
-                            SELECT album_genres.genre_id\
-                            FROM album_genres\
-                            WHERE AG.album_id=album_genres.album_id)\
+            request = "SELECT albums.rowid\
+                       FROM albums, album_genres AS AG\
+                       WHERE albums.chart=0\
                        AND AG.album_id=albums.rowid"
             if not get_network_available():
                 request += " AND albums.synced!=%s" % Type.NONE
-            request += " ORDER BY mtime DESC LIMIT 100"
-            result = sql.execute(request, filters)
+            request += " GROUP BY albums.rowid\
+                        ORDER BY MAX(AG.mtime) DESC LIMIT 100"
+            result = sql.execute(request)
             return list(itertools.chain(*result))
 
     def get_randoms(self):
@@ -615,18 +640,13 @@ class AlbumsDatabase:
         """
         with SqlCursor(Lp().db) as sql:
             albums = []
-            filters = (Type.CHARTS, )
-            request = "SELECT DISTINCT albums.rowid\
-                       FROM albums, album_genres as AG\
-                       WHERE ? NOT IN (\
-                            SELECT album_genres.genre_id\
-                            FROM album_genres\
-                            WHERE AG.album_id=album_genres.album_id)\
-                       AND AG.album_id=albums.rowid"
+            request = "SELECT albums.rowid\
+                       FROM albums\
+                       WHERE albums.chart=0"
             if not get_network_available():
                 request += " AND albums.synced!=%s" % Type.NONE
             request += " ORDER BY random() LIMIT 100"
-            result = sql.execute(request, filters)
+            result = sql.execute(request)
             albums = list(itertools.chain(*result))
             self._cached_randoms = list(albums)
             return albums
@@ -686,16 +706,17 @@ class AlbumsDatabase:
         genre_ids = remove_static_genres(genre_ids)
         with SqlCursor(Lp().db) as sql:
             filters = (album_id,)
-            filters += tuple(genre_ids)
             request = "SELECT DISTINCT discnumber\
                        FROM tracks, track_genres\
                        WHERE tracks.album_id=?\
                        AND track_genres.track_id = tracks.rowid"
             if genre_ids:
-                request += " AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_genres.genre_id",
+                                                    genre_ids)
+                request += " AND " + genre_filter
+                filters += genre_filters
             request += " ORDER BY discnumber"
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -720,21 +741,25 @@ class AlbumsDatabase:
                        FROM tracks"
             if genre_ids:
                 request += ", track_genres"
-                filters += tuple(genre_ids)
             if artist_ids:
                 request += ", track_artists"
-                filters += tuple(artist_ids)
             request += " WHERE album_id=? "
             if genre_ids:
-                request += "AND track_genres.track_id=tracks.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_genres.genre_id",
+                                                    genre_ids)
+                request += "AND track_genres.track_id=tracks.rowid AND "
+                request += genre_filter
+                filters += genre_filters
             if artist_ids:
-                request += "AND track_artists.track_id=tracks.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "track_artists.artist_id=? OR "
-                request += "1=0)"
+                (artist_filter, artist_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_artists.artist_id",
+                                                    artist_ids)
+                request += "AND track_artists.track_id=tracks.rowid AND "
+                request += artist_filter
+                filters += artist_filters
             request += " ORDER BY discnumber, tracknumber"
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -761,21 +786,25 @@ class AlbumsDatabase:
                        FROM tracks"
             if genre_ids:
                 request += ", track_genres"
-                filters += tuple(genre_ids)
             if artist_ids:
                 request += ", track_artists"
-                filters += tuple(artist_ids)
             request += " WHERE album_id=? "
             if genre_ids:
-                request += "AND track_genres.track_id = tracks.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_genres.genre_id",
+                                                    genre_ids)
+                request += "AND track_genres.track_id=tracks.rowid AND "
+                request += genre_filter
+                filters += genre_filters
             if artist_ids:
-                request += "AND track_artists.track_id=tracks.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "track_artists.artist_id=? OR "
-                request += "1=0)"
+                (artist_filter, artist_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_artists.artist_id",
+                                                    artist_ids)
+                request += "AND track_artists.track_id=tracks.rowid AND "
+                request += artist_filter
+                filters += artist_filters
             request += " ORDER BY discnumber, tracknumber, tracks.name"
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -802,22 +831,26 @@ class AlbumsDatabase:
                        FROM tracks"
             if genre_ids:
                 request += ", track_genres"
-                filters += tuple(genre_ids)
             if artist_ids:
                 request += ", track_artists"
-                filters += tuple(artist_ids)
             request += " WHERE album_id=?\
                        AND discnumber=?"
             if genre_ids:
-                request += " AND track_genres.track_id = tracks.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_genres.genre_id",
+                                                    genre_ids)
+                request += " AND track_genres.track_id=tracks.rowid AND "
+                request += genre_filter
+                filters += genre_filters
             if artist_ids:
-                request += " AND track_artists.track_id=tracks.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "track_artists.artist_id=? OR "
-                request += "1=0)"
+                (artist_filter, artist_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_artists.artist_id",
+                                                    artist_ids)
+                request += " AND track_artists.track_id=tracks.rowid AND "
+                request += artist_filter
+                filters += artist_filters
             request += " ORDER BY discnumber, tracknumber, tracks.name"
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
@@ -849,26 +882,21 @@ class AlbumsDatabase:
             order = " ORDER BY mtime DESC,"
         else:
             order = " ORDER BY"
-        order += " artists.sortname\
-                   COLLATE NOCASE COLLATE LOCALIZED,\
+        order += " artists.sortkey,\
                    albums.year,\
-                   albums.name\
-                   COLLATE NOCASE COLLATE LOCALIZED"
+                   albums.sortkey"
         with SqlCursor(Lp().db) as sql:
-            filters = tuple([Type.CHARTS] + genre_ids)
+            (genre_filter, filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "album_genres.genre_id",
+                                                    genre_ids)
             request = "SELECT DISTINCT albums.rowid FROM albums,\
                        album_genres, artists, album_artists\
-                       WHERE EXISTS (\
-                            SELECT album_genres.album_id\
-                            FROM album_genres\
-                            WHERE albums.rowid = album_genres.album_id\
-                            AND album_genres.genre_id=?)\
+                       WHERE albums.chart=1\
                        AND artists.rowid=album_artists.artist_id\
                        AND albums.rowid=album_artists.album_id\
-                       AND album_genres.album_id=albums.rowid AND ("
-            for genre_id in genre_ids:
-                request += "album_genres.genre_id=? OR "
-            request += "1=0)"
+                       AND album_genres.album_id=albums.rowid AND "
+            request += genre_filter
             if not get_network_available():
                 request += " AND albums.synced!=%s" % Type.NONE
             request += order
@@ -885,108 +913,85 @@ class AlbumsDatabase:
         genre_ids = remove_static_genres(genre_ids)
         orderby = Lp().settings.get_enum("orderby")
         if orderby == OrderBy.ARTIST:
-            order = " ORDER BY artists.sortname\
-                     COLLATE NOCASE COLLATE LOCALIZED,\
+            order = " ORDER BY artists.sortkey,\
                      albums.year,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         elif orderby == OrderBy.NAME:
-            order = " ORDER BY albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+            order = " ORDER BY albums.sortkey"
         elif orderby == OrderBy.YEAR:
             order = " ORDER BY albums.year,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
         else:
             order = " ORDER BY albums.popularity DESC,\
-                     albums.name\
-                     COLLATE NOCASE COLLATE LOCALIZED"
+                     albums.sortkey"
 
         with SqlCursor(Lp().db) as sql:
             result = []
             # Get albums for all artists
             if not artist_ids and not genre_ids:
-                filters = (Type.CHARTS,)
                 request = "SELECT DISTINCT albums.rowid\
-                           FROM albums, artists,\
-                           album_artists, album_genres as AG\
-                           WHERE artists.rowid=album_artists.artist_id\
-                           AND ? NOT IN (\
-                                SELECT album_genres.genre_id\
-                                FROM album_genres\
-                                WHERE AG.album_id=album_genres.album_id)\
-                           AND AG.album_id=albums.rowid\
+                           FROM albums, artists, album_artists\
+                           WHERE albums.chart=0\
+                           AND artists.rowid=album_artists.artist_id\
                            AND albums.rowid=album_artists.album_id"
                 if not get_network_available():
                     request += " AND albums.synced!=%s" % Type.NONE
                 request += order
-                result = sql.execute(request, filters)
+                result = sql.execute(request)
             # Get albums for genre
             elif not artist_ids:
-                # Only show charts if wanted
-                if Type.CHARTS in genre_ids:
-                    filters = tuple(genre_ids)
-                else:
-                    filters = (Type.CHARTS,) + tuple(genre_ids)
+                (genre_filter, filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "AG.genre_id",
+                                                    genre_ids)
                 request = "SELECT DISTINCT albums.rowid FROM albums,\
                            album_genres as AG, artists, album_artists\
                            WHERE artists.rowid=album_artists.artist_id\
                            AND albums.rowid=album_artists.album_id "
+                # Only show charts if wanted
                 if Type.CHARTS not in genre_ids:
-                    request += "AND ? NOT IN (\
-                                  SELECT album_genres.genre_id\
-                                  FROM album_genres\
-                                  WHERE AG.album_id=album_genres.album_id)"
-                request += " AND AG.album_id=albums.rowid AND ( "
-                for genre_id in genre_ids:
-                    request += "AG.genre_id=? OR "
-                request += "1=0)"
+                    request += "AND albums.chart=0"
+                request += " AND AG.album_id=albums.rowid AND "
+                request += genre_filter
                 if not get_network_available():
                     request += " AND albums.synced!=%s" % Type.NONE
                 request += order
                 result = sql.execute(request, filters)
             # Get albums for artist
             elif not genre_ids:
-                filters = (Type.CHARTS,)
-                filters += tuple(artist_ids)
+                (artist_filter, filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "album_artists.artist_id",
+                                                    artist_ids)
                 request = "SELECT DISTINCT albums.rowid\
-                           FROM albums, artists,\
-                           album_artists, album_genres as AG\
-                           WHERE artists.rowid=album_artists.artist_id\
-                           AND ? NOT IN (\
-                                SELECT album_genres.genre_id\
-                                FROM album_genres\
-                                WHERE AG.album_id=album_genres.album_id)\
-                           AND AG.album_id=albums.rowid\
-                           AND album_artists.album_id=albums.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "album_artists.artist_id=? OR "
-                request += "1=0)"
+                           FROM albums, artists, album_artists\
+                           WHERE albums.chart=0\
+                           AND artists.rowid=album_artists.artist_id\
+                           AND album_artists.album_id=albums.rowid AND "
+                request += artist_filter
                 if not get_network_available():
                     request += " AND albums.synced!=%s" % Type.NONE
                 request += order
                 result = sql.execute(request, filters)
             # Get albums for artist id and genre id
             else:
-                filters = (Type.CHARTS,)
-                filters += tuple(artist_ids)
-                filters += tuple(genre_ids)
+                (artist_filter, filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "album_artists.artist_id",
+                                                    artist_ids)
+                (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "AG.genre_id",
+                                                    genre_ids)
+                filters += genre_filters
                 request = "SELECT DISTINCT albums.rowid\
                            FROM albums, album_genres as AG,\
                            artists, album_artists\
                            WHERE AG.album_id=albums.rowid\
                            AND artists.rowid=album_artists.artist_id\
-                           AND ? NOT IN (\
-                                SELECT album_genres.genre_id\
-                                FROM album_genres\
-                                WHERE AG.album_id=album_genres.album_id)\
-                           AND album_artists.album_id=albums.rowid AND ("
-                for artist_id in artist_ids:
-                    request += "album_artists.artist_id=? OR "
-                request += "1=0) AND ("
-                for genre_id in genre_ids:
-                    request += "AG.genre_id=? OR "
-                request += "1=0)"
+                           AND albums.chart=0\
+                           AND album_artists.album_id=albums.rowid AND "
+                request += artist_filter + " AND " + genre_filter
                 if not get_network_available():
                     request += " AND albums.synced!=%s" % Type.NONE
                 request += order
@@ -1011,16 +1016,18 @@ class AlbumsDatabase:
                                      (Type.COMPILATIONS,))
             # Get compilation for genre id
             else:
-                filters = (Type.COMPILATIONS,)
-                filters += tuple(genre_ids)
+                (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "album_genres.genre_id",
+                                                    genre_ids)
+                filters = (Type.COMPILATIONS,) + genre_filters
                 request = "SELECT DISTINCT albums.rowid\
                            FROM albums, album_genres, album_artists\
                            WHERE album_genres.album_id=albums.rowid\
                            AND album_artists.album_id=albums.rowid\
-                           AND album_artists.artist_id=? AND ( "
-                for genre_id in genre_ids:
-                    request += "album_genres.genre_id=? OR "
-                request += "1==0) ORDER BY albums.name,albums.year"
+                           AND album_artists.artist_id=? AND "
+                request += genre_filter
+                request += " ORDER BY albums.name,albums.year"
                 result = sql.execute(request, filters)
             return list(itertools.chain(*result))
 
@@ -1033,15 +1040,16 @@ class AlbumsDatabase:
         """
         with SqlCursor(Lp().db) as sql:
             if genre_ids and genre_ids[0] > 0:
-                filters = (album_id,)
-                filters += tuple(genre_ids)
+                (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_genres.genre_id",
+                                                    genre_ids)
+                filters = (album_id,) + genre_filters
                 request = "SELECT SUM(duration)\
                            FROM tracks, track_genres\
                            WHERE tracks.album_id=?\
-                           AND track_genres.track_id = tracks.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "track_genres.genre_id=? OR "
-                request += "1=0)"
+                           AND track_genres.track_id = tracks.rowid AND "
+                request += genre_filter
                 result = sql.execute(request, filters)
             else:
                 result = sql.execute("SELECT SUM(duration) FROM tracks\
@@ -1088,22 +1096,28 @@ class AlbumsDatabase:
             @param limit as int/None
             @return album ids as [int]
         """
+        query = get_search_query(string)
+        if query is None:
+            return []
         with SqlCursor(Lp().db) as sql:
-            if limit is None:
-                filters = ("%" + noaccents(string) + "%", Type.CHARTS)
-            else:
-                filters = ("%" + noaccents(string) + "%", Type.CHARTS, limit)
-            request = ("SELECT albums.rowid\
-                       FROM albums, album_genres AS AG\
-                       WHERE noaccents(name) LIKE ?\
-                       AND ? NOT IN (\
-                                SELECT album_genres.genre_id\
-                                FROM album_genres\
-                                WHERE AG.album_id=album_genres.album_id)\
-                       AND AG.album_id=albums.rowid")
+            request = " AND albums.chart=0"
+            filters = ()
             if limit is not None:
+                filters += (limit,)
                 request += " LIMIT ?"
-            result = sql.execute(request, filters)
+            try:
+                result = sql.execute("SELECT albums.rowid\
+                                      FROM albums_fts, albums\
+                                      WHERE albums_fts MATCH ?\
+                                      AND albums.rowid=albums_fts.rowid" +
+                                     request, (query,) + filters)
+            except sqlite3.OperationalError:  # No FTS5 support
+                result = sql.execute("SELECT albums.rowid\
+                                      FROM albums\
+                                      WHERE noaccents(name) LIKE ?" +
+                                     request,
+                                     ("%" + noaccents(string) + "%",) +
+                                     filters)
             return list(itertools.chain(*result))
 
     def calculate_artist_ids(self, album_id):
@@ -1134,10 +1148,8 @@ class AlbumsDatabase:
         """
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("SELECT COUNT(1)\
-                                  FROM albums, album_genres\
-                                  WHERE album_genres.genre_id!=?\
-                                  AND album_genres.album_id=albums.rowid",
-                                 (Type.CHARTS,))
+                                  FROM albums\
+                                  WHERE chart=0")
             v = result.fetchone()
             if v is not None:
                 return v[0]
@@ -1167,6 +1179,8 @@ class AlbumsDatabase:
                     sql.execute("DELETE from album_genres\
                                  WHERE album_id=?\
                                  AND genre_id=?", (album_id, genre_id))
+                    if genre_id == Type.CHARTS:
+                        self.__set_chart(sql, album_id, False)
 
             # Remove album if orphaned
             result = sql.execute("SELECT rowid from tracks\
@@ -1180,33 +1194,168 @@ class AlbumsDatabase:
                             WHERE album_id=?",
                             (album_id,))
                 sql.execute("DELETE FROM albums WHERE rowid=?", (album_id,))
+                self.cache.invalidate(album_id)
+                self.popularity.remove(album_id)
             return ret
 
+    def add_genres(self, album_genres):
+        """
+            Add genres to albums, update mtime if genre already exists
+            @param album_genres as {album id as int:
+                                    {genre id as int: mtime as int}}
+            @warning commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            self.__set_tmp_album_ids(sql, album_genres.keys())
+            result = sql.execute("SELECT album_id, genre_id\
+                                  FROM album_genres\
+                                  WHERE album_id IN\
+                                  (SELECT album_id FROM tmp_album_ids)")
+            currents = set(result)
+            updates = []
+            inserts = []
+            for (album_id, genres) in album_genres.items():
+                for (genre_id, mtime) in genres.items():
+                    if (album_id, genre_id) in currents:
+                        updates.append((mtime, album_id, genre_id))
+                    else:
+                        inserts.append((album_id, genre_id, mtime))
+            sql.executemany("UPDATE album_genres\
+                             SET mtime=?\
+                             WHERE album_id=? AND genre_id=?", updates)
+            sql.executemany("INSERT INTO\
+                             album_genres (album_id, genre_id, mtime)\
+                             VALUES (?, ?, ?)", inserts)
+            for (album_id, genre_id, mtime) in inserts:
+                if genre_id == Type.CHARTS:
+                    self.__set_chart(sql, album_id, True)
+
+    def update_years(self, album_ids):
+        """
+            Set albums year based on tracks
+            Use most used year by tracks
+            @param album ids as [int]
+            @warning commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            self.__set_tmp_album_ids(sql, album_ids)
+            result = sql.execute("SELECT album_id, year, COUNT(year)\
+                                  FROM tracks\
+                                  WHERE album_id IN\
+                                  (SELECT album_id FROM tmp_album_ids)\
+                                  GROUP BY album_id, year")
+            years = {}
+            for (album_id, year, occurrence) in result:
+                if album_id not in years.keys() or\
+                        occurrence > years[album_id][1]:
+                    years[album_id] = (year, occurrence)
+            sql.executemany("UPDATE albums SET year=? WHERE rowid=?",
+                            [(year, album_id) for (album_id, (year, count))
+                             in years.items()])
+
+    def update_artist_ids(self, album_ids):
+        """
+            Set albums artist ids based on tracks
+            (see calculate_artist_ids())
+            @param album ids as [int]
+            @warning commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            self.__set_tmp_album_ids(sql, album_ids)
+            result = sql.execute("SELECT tracks.album_id, tracks.rowid,\
+                                  track_artists.artist_id\
+                                  FROM tracks, track_artists\
+                                  WHERE track_artists.track_id=tracks.rowid\
+                                  AND tracks.album_id IN\
+                                  (SELECT album_id FROM tmp_album_ids)\
+                                  ORDER BY tracks.album_id, discnumber,\
+                                  tracknumber, tracks.rowid")
+            # Artist ids of each track, in album order
+            tracks = {}
+            for (album_id, track_id, artist_id) in result:
+                if album_id not in tracks.keys():
+                    tracks[album_id] = {}
+                if track_id not in tracks[album_id].keys():
+                    tracks[album_id][track_id] = set()
+                tracks[album_id][track_id].add(artist_id)
+            result = sql.execute("SELECT album_id, artist_id\
+                                  FROM album_artists\
+                                  WHERE album_id IN\
+                                  (SELECT album_id FROM tmp_album_ids)")
+            currents = {}
+            for (album_id, artist_id) in result:
+                if album_id in currents.keys():
+                    currents[album_id].add(artist_id)
+                else:
+                    currents[album_id] = {artist_id}
+            deletes = []
+            inserts = []
+            for (album_id, track_artist_ids) in tracks.items():
+                artist_ids = set()
+                for ids in track_artist_ids.values():
+                    # Previous track and track do not have same artists
+                    if artist_ids and not artist_ids & ids:
+                        artist_ids = {Type.COMPILATIONS}
+                        break
+                    artist_ids = ids
+                current_ids = currents.get(album_id, set())
+                if not current_ids or current_ids - artist_ids:
+                    deletes.append((album_id,))
+                    for artist_id in artist_ids:
+                        inserts.append((album_id, artist_id))
+            sql.executemany("DELETE FROM album_artists\
+                             WHERE album_id=?", deletes)
+            sql.executemany("INSERT INTO album_artists\
+                             (album_id, artist_id)\
+                             VALUES (?, ?)", inserts)
+            for (album_id,) in deletes:
+                self.cache.invalidate(album_id)
+
     @property
     def max_count(self):
         """
             Get MAX(COUNT(tracks)) for albums
         """
+        if self.__max_count is None:
+            with SqlCursor(Lp().db) as sql:
+                result = sql.execute("SELECT MAX(num_tracks)\
+                                      FROM (SELECT COUNT(1) AS num_tracks\
+                                      FROM tracks GROUP BY album_id)")
+                v = result.fetchone()
+                if v and v[0]:
+                    self.__max_count = v[0]
+                else:
+                    self.__max_count = 1
         return self.__max_count
 
     def update_max_count(self):
         """
-            Update MAX(COUNT(tracks)) for albums
+            Update MAX(COUNT(tracks)) for albums on next use
         """
-        with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT MAX(num_tracks)\
-                                  FROM (SELECT COUNT(t.rowid)\
-                                  AS num_tracks FROM albums\
-                                  INNER JOIN tracks t\
-                                  ON albums.rowid=t.album_id\
-                                  GROUP BY albums.rowid)")
-            v = result.fetchone()
-            if v:
-                self.__max_count = v[0]
+        self.__max_count = None
 
 #######################
 # PRIVATE             #
 #######################
+    def __set_tmp_album_ids(self, sql, album_ids):
+        """
+            Fill tmp_album_ids temporary table with album ids
+            @param sql as sqlite cursor
+            @param album ids as [int]
+        """
+        SqlCursor.set_temp_table(sql, "tmp_album_ids",
+                                 "album_id INTEGER PRIMARY KEY", album_ids)
+
+    def __set_chart(self, sql, album_id, chart):
+        """
+            Set album chart flag, must follow Type.CHARTS genre
+            @param sql as sqlite cursor
+            @param album id as int
+            @param chart as bool
+        """
+        sql.execute("UPDATE albums SET chart=? WHERE rowid=?",
+                    (chart, album_id))
+
     def __has_genres(self, album_id):
         """
             Return True if album has more than one genre
@@ -1238,3 +1387,44 @@ class AlbumsDatabase:
             if v is not None:
                 return v[0] > 1
         return False
+
+    def __get_name(self, album_id):
+        """
+            Get album name for album id from db
+            @param Album id as int
+            @return Album name as string/None
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT name FROM albums where rowid=?",
+                                 (album_id,))
+            v = result.fetchone()
+            if v is not None:
+                return v[0]
+            return None
+
+    def __get_artists(self, album_id):
+        """
+            Get artist names from db
+            @param Album id as int
+            @return artists as [str]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT artists.name\
+                                 FROM artists, album_artists\
+                                 WHERE album_artists.album_id=?\
+                                 AND album_artists.artist_id=artists.rowid",
+                                 (album_id,))
+            return list(itertools.chain(*result))
+
+    def __get_artist_ids(self, album_id):
+        """
+            Get album artist ids from db
+            @param album_id
+            @return artist ids as [int]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT artist_id\
+                                  FROM album_artists\
+                                  WHERE album_id=?",
+                                 (album_id,))
+            return list(itertools.chain(*result))
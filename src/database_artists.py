@@ -12,10 +12,14 @@
 
 from gettext import gettext as _
 import itertools
+import sqlite3
 
 from lollypop.sqlcursor import SqlCursor
 from lollypop.define import Lp, Type
 from lollypop.utils import format_artist_name, noaccents
+from lollypop.utils import get_search_query
+from lollypop.localized import get_sort_key
+from lollypop.database_cache import DatabaseCache
 
 
 class ArtistsDatabase:
@@ -27,7 +31,8 @@ class ArtistsDatabase:
         """
             Init artists database object
         """
-        pass
+        self.cache = DatabaseCache(
+                    Lp().settings.get_value("db-cache-size").get_int32())
 
     def add(self, name, sortname):
         """
@@ -40,9 +45,11 @@ class ArtistsDatabase:
         if sortname == "":
             sortname = format_artist_name(name)
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("INSERT INTO artists (name, sortname)\
-                                  VALUES (?, ?)",
-                                 (name, sortname))
+            result = sql.execute("INSERT INTO artists\
+                                  (name, sortname, sortkey)\
+                                  VALUES (?, ?, ?)",
+                                 (name, sortname, get_sort_key(sortname)))
+            self.cache.invalidate(result.lastrowid)
             return result.lastrowid
 
     def set_sortname(self, artist_id, sortname):
@@ -54,9 +61,9 @@ class ArtistsDatabase:
         """
         with SqlCursor(Lp().db) as sql:
             sql.execute("UPDATE artists\
-                         SET sortname=?\
+                         SET sortname=?, sortkey=?\
                          WHERE rowid=?",
-                        (sortname, artist_id))
+                        (sortname, get_sort_key(sortname), artist_id))
 
     def get_sortname(self, artist_id):
         """
@@ -92,16 +99,9 @@ class ArtistsDatabase:
             @param Artist id as int
             @return Artist name as string
         """
-        with SqlCursor(Lp().db) as sql:
-            if artist_id == Type.COMPILATIONS:
-                return _("Many artists")
-
-            result = sql.execute("SELECT name from artists WHERE rowid=?",
-                                 (artist_id,))
-            v = result.fetchone()
-            if v is not None:
-                return v[0]
-            return _("Unknown")
+        if artist_id == Type.COMPILATIONS:
+            return _("Many artists")
+        return self.cache.get(artist_id, self.__get_name, _("Unknown"))
 
     def get_albums(self, artist_ids):
         """
@@ -109,16 +109,17 @@ class ArtistsDatabase:
             @return Array of id as int
         """
         with SqlCursor(Lp().db) as sql:
+            (artist_filter, filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "album_artists.artist_id",
+                                                    artist_ids)
             request = "SELECT DISTINCT albums.rowid\
                        FROM album_artists, albums, album_genres\
                        WHERE albums.rowid=album_artists.album_id AND\
                        album_genres.genre_id!=%s AND\
-                       albums.rowid=album_genres.album_id AND\
-                       (1=0 " % Type.CHARTS
-            for artist_id in artist_ids:
-                request += "OR album_artists.artist_id=%s " % artist_id
-            request += ") ORDER BY year"
-            result = sql.execute(request)
+                       albums.rowid=album_genres.album_id AND " % Type.CHARTS
+            request += artist_filter + " ORDER BY year"
+            result = sql.execute(request, filters)
             return list(itertools.chain(*result))
 
     def get_compilations(self, artist_ids):
@@ -127,17 +128,19 @@ class ArtistsDatabase:
             @return Array of id as int
         """
         with SqlCursor(Lp().db) as sql:
+            (artist_filter, filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_artists.artist_id",
+                                                    artist_ids)
             request = "SELECT DISTINCT albums.rowid FROM albums,\
                        tracks, track_artists, album_artists\
                        WHERE track_artists.track_id=tracks.rowid\
                        AND album_artists.artists_id=%s\
                        AND album_artists.album_id=albums.rowid\
-                       AND albums.rowid=tracks.album_id AND (1=0 " %\
-                       Type.COMPILATIONS
-            for artist_id in artist_ids:
-                request += "OR track_artists.artist_id=%s " % artist_id
-            request += ") ORDER BY albums.year"
-            result = sql.execute(request)
+                       AND albums.rowid=tracks.album_id\
+                       AND " % Type.COMPILATIONS
+            request += artist_filter + " ORDER BY albums.year"
+            result = sql.execute(request, filters)
             return list(itertools.chain(*result))
 
     def get(self, genre_ids=[]):
@@ -162,11 +165,14 @@ class ArtistsDatabase:
                                     SELECT album_genres.genre_id\
                                     FROM album_genres\
                                     WHERE AG.album_id=album_genres.album_id)\
-                                  ORDER BY artists.sortname\
-                                  COLLATE NOCASE COLLATE LOCALIZED",
+                                  ORDER BY artists.sortkey",
                                  (Type.CHARTS,))
             else:
-                genres = (Type.CHARTS,) + tuple(genre_ids)
+                (genre_filter, genres) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "AG.genre_id",
+                                                    genre_ids)
+                genres = (Type.CHARTS,) + genres
                 request = "SELECT DISTINCT artists.rowid,\
                            artists.name, artists.sortname\
                            FROM artists, albums, album_genres AS AG,\
@@ -177,11 +183,8 @@ class ArtistsDatabase:
                                     FROM album_genres\
                                     WHERE AG.album_id=album_genres.album_id)\
                            AND albums.rowid=album_artists.album_id\
-                           AND AG.album_id=albums.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "AG.genre_id=? OR "
-                request += "1=0) ORDER BY artists.sortname\
-                            COLLATE NOCASE COLLATE LOCALIZED"
+                           AND AG.album_id=albums.rowid AND "
+                request += genre_filter + " ORDER BY artists.sortkey"
                 result = sql.execute(request, genres)
             return [(row[0], row[1], row[2]) for row in result]
 
@@ -199,8 +202,7 @@ class ArtistsDatabase:
                               WHERE album_artists.artist_id=artists.rowid\
                               AND album_artists.album_id=albums.rowid\
                               AND albums.synced!=?\
-                              ORDER BY artists.sortname\
-                              COLLATE NOCASE COLLATE LOCALIZED",
+                              ORDER BY artists.sortkey",
                              (Type.NONE,))
             return [(row[0], row[1], row[2]) for row in result]
 
@@ -222,20 +224,19 @@ class ArtistsDatabase:
                                   AND album_artists.album_id=albums.rowid\
                                   AND album_genres.album_id=albums.rowid\
                                   AND album_genres.genre_id!=?\
-                                  ORDER BY artists.sortname\
-                                  COLLATE NOCASE COLLATE LOCALIZED",
+                                  ORDER BY artists.sortkey",
                                  (Type.CHARTS,))
             else:
-                genres = tuple(genre_ids)
+                (genre_filter, genres) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "album_genres.genre_id",
+                                                    genre_ids)
                 request = "SELECT DISTINCT artists.rowid\
                            FROM artists, albums, album_genres, album_artists\
                            WHERE artists.rowid=album_artists.artist_id\
                            AND albums.rowid=album_artists.album_id\
-                           AND album_genres.album_id=albums.rowid AND ("
-                for genre_id in genre_ids:
-                    request += "album_genres.genre_id=? OR "
-                request += "1=0) ORDER BY artists.sortname\
-                            COLLATE NOCASE COLLATE LOCALIZED"
+                           AND album_genres.album_id=albums.rowid AND "
+                request += genre_filter + " ORDER BY artists.sortkey"
                 result = sql.execute(request, genres)
             return list(itertools.chain(*result))
 
@@ -258,19 +259,33 @@ class ArtistsDatabase:
             @param string
             @return Array of id as int
         """
+        query = get_search_query(string)
+        if query is None:
+            return []
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT artists.rowid FROM artists, albums,\
-                                  album_genres AS AG, album_artists\
-                                  WHERE noaccents(artists.name) LIKE ?\
-                                  AND album_artists.artist_id=artists.rowid\
-                                  AND album_artists.album_id=albums.rowid\
-                                  AND AG.album_id=albums.rowid\
-                                  AND ? NOT IN (\
-                                    SELECT album_genres.genre_id\
-                                    FROM album_genres\
-                                    WHERE AG.album_id=album_genres.album_id)\
-                                  LIMIT 25", ("%" + noaccents(string) + "%",
-                                              Type.CHARTS))
+            request = (" AND album_artists.artist_id=artists.rowid\
+                       AND album_artists.album_id=albums.rowid\
+                       AND AG.album_id=albums.rowid\
+                       AND ? NOT IN (\
+                            SELECT album_genres.genre_id\
+                            FROM album_genres\
+                            WHERE AG.album_id=album_genres.album_id)\
+                       LIMIT 25")
+            try:
+                result = sql.execute("SELECT artists.rowid\
+                                      FROM artists_fts, artists, albums,\
+                                      album_genres AS AG, album_artists\
+                                      WHERE artists_fts MATCH ?\
+                                      AND artists.rowid=artists_fts.rowid" +
+                                     request, (query, Type.CHARTS))
+            except sqlite3.OperationalError:  # No FTS5 support
+                result = sql.execute("SELECT artists.rowid\
+                                      FROM artists, albums,\
+                                      album_genres AS AG, album_artists\
+                                      WHERE noaccents(artists.name) LIKE ?" +
+                                     request,
+                                     ("%" + noaccents(string) + "%",
+                                      Type.CHARTS))
             return list(itertools.chain(*result))
 
     def count(self):
@@ -313,3 +328,21 @@ class ArtistsDatabase:
                 if not v:
                     sql.execute("DELETE FROM artists WHERE rowid=?",
                                 (artist_id,))
+                    self.cache.invalidate(artist_id)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_name(self, artist_id):
+        """
+            Get artist name from db
+            @param Artist id as int
+            @return Artist name as string/None
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT name from artists WHERE rowid=?",
+                                 (artist_id,))
+            v = result.fetchone()
+            if v is not None:
+                return v[0]
+            return None
@@ -0,0 +1,104 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib, Gio
+
+from queue import Queue
+from threading import Thread
+
+
+class DatabaseAsync:
+    """
+        Run database requests on a pool of worker threads
+        Results are given to callbacks on main loop, so UI never waits
+        for a database lock
+    """
+
+    def __init__(self, jobs):
+        """
+            Init pool
+            @param jobs as int, worker threads count
+        """
+        self.__queue = Queue()
+        for i in range(max(jobs, 1)):
+            t = Thread(target=self.__worker,
+                       name="DatabaseAsync%s" % i)
+            t.daemon = True
+            t.start()
+
+    def run(self, request, args, callback, widget=None):
+        """
+            Run request(*args) on a worker, then callback(result) on
+            main loop
+            Nothing is called if request is cancelled
+            @param request as function
+            @param args as tuple
+            @param callback as function(result)
+            @param widget as Gtk.Widget, cancel request on destroy
+            @return Gio.Cancellable
+        """
+        cancellable = Gio.Cancellable.new()
+        handler_id = None
+        if widget is not None:
+            handler_id = widget.connect("destroy",
+                                        lambda x: cancellable.cancel())
+        self.__queue.put((request, args, callback,
+                          cancellable, widget, handler_id))
+        return cancellable
+
+    def stop(self):
+        """
+            Stop workers, pending requests are dropped
+        """
+        while not self.__queue.empty():
+            (request, args, callback,
+             cancellable, widget, handler_id) = self.__queue.get()
+            cancellable.cancel()
+        self.__queue.put(None)
+
+#######################
+# PRIVATE             #
+#######################
+    def __worker(self):
+        """
+            Run queued requests
+        """
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                # Let other workers stop
+                self.__queue.put(None)
+                return
+            (request, args, callback, cancellable, widget, handler_id) = item
+            result = None
+            if not cancellable.is_cancelled():
+                try:
+                    result = request(*args)
+                except Exception as e:
+                    print("DatabaseAsync::__worker():", e)
+                    cancellable.cancel()
+            GLib.idle_add(self.__on_result, result, callback,
+                          cancellable, widget, handler_id)
+
+    def __on_result(self, result, callback, cancellable, widget, handler_id):
+        """
+            Give result to callback if not cancelled
+            @param result as object
+            @param callback as function(result)
+            @param cancellable as Gio.Cancellable
+            @param widget as Gtk.Widget/None
+            @param handler_id as int/None
+        """
+        if widget is not None and widget.handler_is_connected(handler_id):
+            widget.disconnect(handler_id)
+        if not cancellable.is_cancelled():
+            callback(result)
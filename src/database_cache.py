@@ -0,0 +1,103 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class DatabaseCache:
+    """
+        Bounded LRU cache for database getters
+        Values are stored by object id, least recently used ids are dropped
+    """
+
+    def __init__(self, max_size):
+        """
+            Init cache
+            @param max_size as int, max object ids in cache, 0 to disable
+        """
+        self.__max_size = max_size
+        self.__values = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+        # Changed by invalidation, values read before are not cached
+        self.__generation = 0
+
+    def get(self, object_id, getter, default=None):
+        """
+            Get value for object id, call getter on cache miss
+            None values are not cached, lists are returned as copies
+            @param object_id as int
+            @param getter as function(object_id)
+            @param default as object, returned if value is None
+            @return value
+        """
+        name = getter.__name__
+        with self.__lock:
+            values = self.__values.get(object_id, None)
+            if values is not None and name in values.keys():
+                self.__hits += 1
+                self.__values.move_to_end(object_id)
+                return self.__copy(values[name])
+            self.__misses += 1
+            generation = self.__generation
+        value = getter(object_id)
+        if value is not None and self.__max_size > 0:
+            with self.__lock:
+                if generation == self.__generation:
+                    if object_id not in self.__values.keys():
+                        self.__values[object_id] = {}
+                        if len(self.__values) > self.__max_size:
+                            self.__values.popitem(False)
+                    self.__values[object_id][name] = self.__copy(value)
+        if value is None:
+            return default
+        return value
+
+    def invalidate(self, object_id):
+        """
+            Remove values for object id
+            @param object_id as int
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__values.pop(object_id, None)
+
+    def clear(self):
+        """
+            Remove all values
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__values.clear()
+
+    def get_stats(self):
+        """
+            Get cache statistics
+            @return (hits as int, misses as int, cached ids as int)
+        """
+        with self.__lock:
+            return (self.__hits, self.__misses, len(self.__values))
+
+#######################
+# PRIVATE             #
+#######################
+    def __copy(self, value):
+        """
+            Copy value if mutable
+            @param value as object
+            @return object
+        """
+        if isinstance(value, list):
+            return list(value)
+        return value
@@ -16,6 +16,8 @@ import itertools
 from lollypop.sqlcursor import SqlCursor
 from lollypop.define import Lp, Type
 from lollypop.utils import get_network_available
+from lollypop.localized import get_sort_key
+from lollypop.database_cache import DatabaseCache
 
 
 class GenresDatabase:
@@ -27,7 +29,8 @@ class GenresDatabase:
         """
             Init genres database object
         """
-        pass
+        self.cache = DatabaseCache(
+                    Lp().settings.get_value("db-cache-size").get_int32())
 
     def add(self, name):
         """
@@ -37,8 +40,10 @@ class GenresDatabase:
             @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("INSERT INTO genres (name) VALUES (?)",
-                                 (name,))
+            result = sql.execute("INSERT INTO genres (name, sortkey)\
+                                  VALUES (?, ?)",
+                                 (name, get_sort_key(name)))
+            self.cache.invalidate(result.lastrowid)
             return result.lastrowid
 
     def get_id(self, name):
@@ -61,13 +66,7 @@ class GenresDatabase:
             @param string
             @return int
         """
-        with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT name FROM genres\
-                                  WHERE rowid=?", (genre_id,))
-            v = result.fetchone()
-            if v is not None:
-                return v[0]
-            return _("Unknown")
+        return self.cache.get(genre_id, self.__get_name, _("Unknown"))
 
     def get_names(self):
         """
@@ -77,8 +76,7 @@ class GenresDatabase:
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("SELECT name\
                                  FROM genres\
-                                 ORDER BY name\
-                                 COLLATE NOCASE COLLATE LOCALIZED")
+                                 ORDER BY genres.sortkey")
             return list(itertools.chain(*result))
 
     def get_albums(self, genre_id):
@@ -110,8 +108,7 @@ class GenresDatabase:
                                     SELECT album_genres.genre_id\
                                     FROM album_genres\
                                     WHERE AG.album_id=album_genres.album_id)\
-                                  ORDER BY genres.name\
-                                  COLLATE NOCASE COLLATE LOCALIZED",
+                                  ORDER BY genres.sortkey",
                                  (Type.CHARTS,))
             return list(result)
 
@@ -128,8 +125,7 @@ class GenresDatabase:
                                     SELECT album_genres.genre_id\
                                     FROM album_genres\
                                     WHERE AG.album_id=album_genres.album_id)\
-                                  ORDER BY genres.name\
-                                  COLLATE NOCASE COLLATE LOCALIZED",
+                                  ORDER BY genres.sortkey",
                                  (Type.CHARTS,))
             return list(itertools.chain(*result))
 
@@ -147,8 +143,7 @@ class GenresDatabase:
                                     SELECT album_genres.genre_id\
                                     FROM album_genres\
                                     WHERE AG.album_id=album_genres.album_id)\
-                                  ORDER BY genres.name\
-                                  COLLATE NOCASE COLLATE LOCALIZED",
+                                  ORDER BY genres.sortkey",
                                  (filter,))
             return list(result)
 
@@ -166,3 +161,21 @@ class GenresDatabase:
             if not v:
                 sql.execute("DELETE FROM genres\
                             WHERE rowid=?", (genre_id,))
+                self.cache.invalidate(genre_id)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_name(self, genre_id):
+        """
+            Get genre name from db
+            @param genre id as int
+            @return str/None
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT name FROM genres\
+                                  WHERE rowid=?", (genre_id,))
+            v = result.fetchone()
+            if v is not None:
+                return v[0]
+            return None
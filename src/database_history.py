@@ -12,8 +12,6 @@
 
 from gi.repository import GLib
 
-import sqlite3
-
 from lollypop.sqlcursor import SqlCursor
 
 
@@ -39,11 +37,18 @@ class History:
                             album_rate INT NOT NULL,
                             loved_album INT NOT NULL,
                             album_popularity INT NOT NULL)"""
+    __create_history_idx = """CREATE INDEX IF NOT EXISTS idx_history
+                               ON history(name, duration)"""
 
     def __init__(self):
         """
             Init playlists manager
         """
+        # Entries loaded in memory: {(name, duration): stats}
+        self.__items = {}
+        self.__names = set()
+        # Delayed writes: {(name, duration): (stats, exists in db)}
+        self.__writes = {}
         # Create db schema
         try:
             with SqlCursor(self) as sql:
@@ -52,6 +57,7 @@ class History:
         except:
             pass
         with SqlCursor(self) as sql:
+            sql.execute(self.__create_history_idx)
             result = sql.execute("SELECT COUNT(*)\
                                   FROM history")
             v = result.fetchone()
@@ -78,6 +84,17 @@ class History:
             @param album_rate as int
             @thread safe
         """
+        if name in self.__names:
+            key = (name, duration)
+            stats = (popularity, rate, ltime, mtime, loved_album,
+                     album_popularity, album_rate)
+            if key in self.__writes.keys():
+                exists = self.__writes[key][1]
+            else:
+                exists = key in self.__items.keys()
+            self.__writes[key] = (stats, exists)
+            self.__items[key] = stats
+            return
         with SqlCursor(self) as sql:
             if self.exists(name, duration):
                 sql.execute("UPDATE history\
@@ -104,6 +121,9 @@ class History:
                      loved album, album_popularity)
              as (int, int, int, int, int, int)
         """
+        if name in self.__names:
+            return self.__items.get((name, duration),
+                                    (0, 0, 0, 0, 0, 0, 0))
         with SqlCursor(self) as sql:
             result = sql.execute("SELECT popularity, rate, ltime, mtime,\
                                   loved_album, album_popularity, album_rate\
@@ -123,6 +143,8 @@ class History:
             @parma duration as int
             @return bool
         """
+        if name in self.__names:
+            return (name, duration) in self.__items.keys()
         with SqlCursor(self) as sql:
             result = sql.execute("SELECT rowid\
                                   FROM history\
@@ -135,12 +157,61 @@ class History:
             else:
                 return False
 
+    def load(self, names):
+        """
+            Load entries for names in memory, add() is then delayed
+            until commit() for these names
+            @param names as [str]
+        """
+        with SqlCursor(self) as sql:
+            SqlCursor.set_temp_table(sql, "tmp_names",
+                                     "name TEXT PRIMARY KEY", names)
+            result = sql.execute("SELECT name, duration, popularity, rate,\
+                                  ltime, mtime, loved_album,\
+                                  album_popularity, album_rate\
+                                  FROM history\
+                                  WHERE name IN (SELECT name FROM tmp_names)")
+            for row in result:
+                self.__items[(row[0], row[1])] = row[2:]
+            self.__names |= set(names)
+
+    def commit(self):
+        """
+            Write delayed entries to db in one transaction
+            @thread safe
+        """
+        if not self.__writes:
+            return
+        updates = []
+        inserts = []
+        for ((name, duration), (stats, exists)) in self.__writes.items():
+            (popularity, rate, ltime, mtime, loved_album,
+             album_popularity, album_rate) = stats
+            if exists:
+                updates.append((popularity, rate, ltime, mtime, loved_album,
+                                album_popularity, album_rate, name, duration))
+            else:
+                inserts.append((name, duration, popularity, rate, ltime,
+                                mtime, loved_album, album_popularity,
+                                album_rate))
+        with SqlCursor(self) as sql:
+            sql.executemany("UPDATE history\
+                             SET popularity=?,rate=?,ltime=?,mtime=?,\
+                             loved_album=?,album_popularity=?,album_rate=?\
+                             WHERE name=? AND duration=?", updates)
+            sql.executemany("INSERT INTO history\
+                             (name, duration, popularity, rate, ltime, mtime,\
+                             loved_album, album_popularity, album_rate)\
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", inserts)
+            sql.commit()
+        self.__writes = {}
+
     def get_cursor(self):
         """
             Return a new sqlite cursor
         """
         try:
-            return sqlite3.connect(self.__DB_PATH, 600.0)
+            return SqlCursor.connect(self.__DB_PATH)
         except:
             exit(-1)
 
@@ -0,0 +1,136 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from threading import Lock
+
+from lollypop.sqlcursor import SqlCursor
+from lollypop.define import Lp
+
+
+class PopularityStats:
+    """
+        Average popularity of most popular items in a table
+        Kept in memory and updated on popularity changes, loaded from db
+        only when a change can not be applied
+    """
+    # Items used to compute average
+    __COUNT = 100
+    # Minimal average
+    __MIN_AVERAGE = 5
+
+    def __init__(self, table):
+        """
+            Init stats
+            @param table as str
+        """
+        self.__table = table
+        self.__lock = Lock()
+        # Popularity by rowid for most popular items, None if not loaded
+        self.__top = None
+        self.__average = self.__MIN_AVERAGE
+        # Changed on each update, values loaded before are dropped
+        self.__version = 0
+
+    def get_average(self):
+        """
+            Get average popularity of most popular items
+            @return average popularity as float, at least 5
+        """
+        with self.__lock:
+            if self.__top is not None:
+                return self.__average
+            version = self.__version
+        top = self.__load()
+        with self.__lock:
+            if version == self.__version:
+                self.__top = top
+                self.__set_average()
+                return self.__average
+        return self.__get_average(top)
+
+    def update(self, rowid, popularity):
+        """
+            Update stats for item popularity
+            @param rowid as int
+            @param popularity as int
+        """
+        with self.__lock:
+            self.__version += 1
+            if self.__top is None:
+                return
+            if rowid in self.__top.keys():
+                # Another item may now be more popular
+                if popularity < self.__top[rowid]:
+                    self.__top = None
+                    return
+                self.__top[rowid] = popularity
+            elif len(self.__top) < self.__COUNT:
+                self.__top[rowid] = popularity
+            else:
+                less_popular = min(self.__top.keys(),
+                                   key=lambda x: self.__top[x])
+                if popularity <= self.__top[less_popular]:
+                    return
+                del self.__top[less_popular]
+                self.__top[rowid] = popularity
+            self.__set_average()
+
+    def remove(self, rowid):
+        """
+            Update stats for removed item
+            @param rowid as int
+        """
+        with self.__lock:
+            self.__version += 1
+            # Another item may now be in most popular items
+            if self.__top is not None and rowid in self.__top.keys():
+                self.__top = None
+
+    def reset(self):
+        """
+            Load stats from db on next use
+        """
+        with self.__lock:
+            self.__version += 1
+            self.__top = None
+
+#######################
+# PRIVATE             #
+#######################
+    def __load(self):
+        """
+            Load most popular items from db
+            @return {rowid as int: popularity as int}
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT rowid, popularity FROM %s\
+                                  ORDER BY popularity DESC\
+                                  LIMIT ?" % self.__table, (self.__COUNT,))
+            return dict(result)
+
+    def __set_average(self):
+        """
+            Set average from most popular items
+        """
+        self.__average = self.__get_average(self.__top)
+
+    def __get_average(self, top):
+        """
+            Get average for items
+            @param top as {rowid as int: popularity as int}
+            @return float
+        """
+        if top:
+            average = sum(top.values()) / len(top)
+            if average > self.__MIN_AVERAGE:
+                return average
+        return self.__MIN_AVERAGE
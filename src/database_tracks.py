@@ -13,10 +13,14 @@
 
 from gettext import gettext as _
 import itertools
+import sqlite3
 
 from lollypop.sqlcursor import SqlCursor
 from lollypop.define import Lp, Type, DbPersistent
 from lollypop.utils import noaccents, get_network_available
+from lollypop.utils import get_search_query
+from lollypop.database_cache import DatabaseCache
+from lollypop.database_popularity import PopularityStats
 
 
 class TracksDatabase:
@@ -24,12 +28,16 @@ class TracksDatabase:
         All functions take a sqlite cursor as last parameter,
         set another one if you"re in a thread
     """
+    # Tracks loaded by one get_many() request
+    __CHUNK_SIZE = 500
 
     def __init__(self):
         """
             Init tracks database object
         """
-        pass
+        self.cache = DatabaseCache(
+                    Lp().settings.get_value("db-cache-size").get_int32())
+        self.popularity = PopularityStats("tracks")
 
     def add(self, name, uri, duration, tracknumber, discnumber,
             discname, album_id, year, popularity, rate, ltime,
@@ -70,6 +78,8 @@ class TracksDatabase:
                                                         rate,
                                                         ltime,
                                                         persistent))
+            self.cache.invalidate(result.lastrowid)
+            self.popularity.update(result.lastrowid, popularity)
             return result.lastrowid
 
     def add_artist(self, track_id, artist_id):
@@ -155,13 +165,16 @@ class TracksDatabase:
         """
         result = []
         order = " ORDER BY mtime DESC,\
-                 artists.sortname\
-                 COLLATE NOCASE COLLATE LOCALIZED,\
+                 artists.sortkey,\
                  tracks.year,\
                  tracks.name\
                  COLLATE NOCASE COLLATE LOCALIZED"
         with SqlCursor(Lp().db) as sql:
-            filters = tuple([Type.CHARTS] + genre_ids)
+            (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_genres.genre_id",
+                                                    genre_ids)
+            filters = (Type.CHARTS,) + genre_filters
             request = "SELECT DISTINCT tracks.rowid FROM tracks,\
                        track_genres, artists, track_artists\
                        WHERE EXISTS (\
@@ -171,16 +184,69 @@ class TracksDatabase:
                             AND track_genres.genre_id=?)\
                        AND artists.rowid=track_artists.artist_id\
                        AND tracks.rowid=track_artists.track_id\
-                       AND track_genres.track_id=tracks.rowid AND ("
-            for genre_id in genre_ids:
-                request += "track_genres.genre_id=? OR "
-            request += "1=0)"
+                       AND track_genres.track_id=tracks.rowid AND "
+            request += genre_filter
             if not get_network_available():
                 request += " AND tracks.persistent=%s" % DbPersistent.NONE
             request += order
             result = sql.execute(request, filters)
             return list(itertools.chain(*result))
 
+    def get_fingerprints(self, uris):
+        """
+            Get fingerprints for tracks
+            @param uris as set(str)
+            @return {fingerprint as str: uris as [str]}
+        """
+        with SqlCursor(Lp().db) as sql:
+            fingerprints = {}
+            result = sql.execute("SELECT uri, fingerprint FROM tracks\
+                                  WHERE fingerprint IS NOT NULL\
+                                  AND persistent=?",
+                                 (DbPersistent.INTERNAL,))
+            for (uri, fingerprint) in result:
+                if uri not in uris:
+                    continue
+                if fingerprint in fingerprints.keys():
+                    fingerprints[fingerprint].append(uri)
+                else:
+                    fingerprints[fingerprint] = [uri]
+            return fingerprints
+
+    def set_uris(self, uris):
+        """
+            Set new uris for moved tracks, also update their albums uri
+            @param uris as [(old uri as str, new uri as str)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("CREATE TEMP TABLE IF NOT EXISTS tmp_moved (\
+                                        old TEXT PRIMARY KEY,\
+                                        new TEXT NOT NULL)")
+            sql.execute("DELETE FROM tmp_moved")
+            sql.executemany("INSERT OR REPLACE INTO tmp_moved (old, new)\
+                             VALUES (?, ?)", uris)
+            sql.execute("UPDATE tracks\
+                         SET uri=(SELECT new FROM tmp_moved\
+                                  WHERE old=tracks.uri)\
+                         WHERE uri IN (SELECT old FROM tmp_moved)")
+            result = sql.execute("SELECT tracks.rowid, tracks.album_id,\
+                                  tracks.uri\
+                                  FROM tmp_moved, tracks\
+                                  WHERE tracks.uri=tmp_moved.new")
+            track_ids = []
+            album_uris = {}
+            for (track_id, album_id, uri) in result:
+                track_ids.append(track_id)
+                album_uris[album_id] = uri.rsplit("/", 1)[0]
+            sql.executemany("UPDATE albums SET uri=? WHERE rowid=?",
+                            [(uri, album_id)
+                             for (album_id, uri) in album_uris.items()])
+            for track_id in track_ids:
+                self.cache.invalidate(track_id)
+            for album_id in album_uris.keys():
+                Lp().albums.cache.invalidate(album_id)
+
     def get_id_by_uri(self, uri):
         """
             Return track id for uri
@@ -203,7 +269,11 @@ class TracksDatabase:
             @return track id as int
         """
         with SqlCursor(Lp().db) as sql:
-            filters = (name, album_id) + tuple(artist_ids)
+            (artist_filter, artist_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "track_artists.artist_id",
+                                                    artist_ids)
+            filters = (name, album_id) + artist_filters
             request = "SELECT tracks.rowid FROM tracks\
                        WHERE name = ? COLLATE NOCASE\
                        AND album_id = ?\
@@ -211,10 +281,8 @@ class TracksDatabase:
                             SELECT rowid\
                             FROM track_artists\
                             WHERE track_artists.track_id=tracks.rowid\
-                            AND ("
-            for artist_id in artist_ids:
-                request += " track_artists.artist_id=? OR"
-            request += " 1=0))"
+                            AND "
+            request += artist_filter + ")"
             result = sql.execute(request, filters)
             v = result.fetchone()
             if v is not None:
@@ -235,6 +303,82 @@ class TracksDatabase:
                 return v[0]
             return ""
 
+    def get_many(self, track_ids):
+        """
+            Get fields and uri for tracks, see objects.Track.FIELDS
+            Album artist ids are not loaded, see objects.Album.FIELDS
+            @param track ids as [int]
+            @return {track id as int: {field as str: value}}
+        """
+        tracks = {}
+        with SqlCursor(Lp().db) as sql:
+            for i in range(0, len(track_ids), self.__CHUNK_SIZE):
+                chunk = tuple(track_ids[i:i + self.__CHUNK_SIZE])
+                marks = ",".join("?" * len(chunk))
+                result = sql.execute("SELECT tracks.rowid, tracks.name,\
+                                      tracks.uri, tracks.album_id,\
+                                      albums.name, tracks.duration,\
+                                      tracks.tracknumber, tracks.year,\
+                                      tracks.persistent\
+                                      FROM tracks LEFT JOIN albums\
+                                      ON tracks.album_id=albums.rowid\
+                                      WHERE tracks.rowid IN (%s)" % marks,
+                                     chunk)
+                for (track_id, name, uri, album_id, album_name, duration,
+                     number, year, persistent) in result:
+                    if album_name is None:
+                        album_name = _("Unknown")
+                    tracks[track_id] = {"name": name,
+                                        "uri": uri,
+                                        "album_id": album_id,
+                                        "album_name": album_name,
+                                        "duration": duration,
+                                        "number": number,
+                                        "year": str(year) if year else "",
+                                        "persistent": persistent,
+                                        "artist_ids": [],
+                                        "artists": [],
+                                        "genre_ids": [],
+                                        "genres": [],
+                                        "mtime": 0}
+                result = sql.execute("SELECT track_artists.track_id,\
+                                      track_artists.artist_id, artists.name\
+                                      FROM track_artists\
+                                      LEFT JOIN artists\
+                                      ON track_artists.artist_id=artists.rowid\
+                                      WHERE track_artists.track_id IN (%s)\
+                                      ORDER BY track_artists.rowid" % marks,
+                                     chunk)
+                for (track_id, artist_id, name) in result:
+                    if track_id in tracks.keys():
+                        tracks[track_id]["artist_ids"].append(artist_id)
+                        if name is not None:
+                            tracks[track_id]["artists"].append(name)
+                result = sql.execute("SELECT track_genres.track_id,\
+                                      track_genres.genre_id, genres.name,\
+                                      track_genres.mtime\
+                                      FROM track_genres\
+                                      LEFT JOIN genres\
+                                      ON track_genres.genre_id=genres.rowid\
+                                      WHERE track_genres.track_id IN (%s)\
+                                      ORDER BY track_genres.rowid" % marks,
+                                     chunk)
+                for (track_id, genre_id, name, mtime) in result:
+                    if track_id in tracks.keys():
+                        track = tracks[track_id]
+                        # Same as get_mtime() without genres
+                        if genre_id < 0:
+                            track["mtime"] = None
+                        elif not track["genre_ids"]:
+                            track["mtime"] = mtime
+                        track["genre_ids"].append(genre_id)
+                        if name is not None:
+                            track["genres"].append(name)
+            for track in tracks.values():
+                if track["mtime"] is None:
+                    track["mtime"] = 0
+        return tracks
+
     def get_year(self, track_id):
         """
             Get track year
@@ -269,13 +413,7 @@ class TracksDatabase:
             @param Track id as int
             @return uri as string
         """
-        with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT uri FROM tracks WHERE rowid=?",
-                                 (track_id,))
-            v = result.fetchone()
-            if v is not None:
-                return v[0]
-            return ""
+        return self.cache.get(track_id, self.__get_uri, "")
 
     def set_uri(self, track_id, uri):
         """
@@ -288,9 +426,38 @@ class TracksDatabase:
                          WHERE rowid=?",
                         (uri, track_id))
             sql.commit()
+            self.cache.invalidate(track_id)
             if uri.startswith("http") or uri.startswith("https"):
                 self.set_duration(track_id, 0)
 
+    def get_tags(self, track_id):
+        """
+            Get tags read by scanner and not needed in views
+            @param track id as int
+            @return (lyrics as str, comments as str, file mtime as int)
+                    or None
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT lyrics, comments, mtime\
+                                  FROM track_tags WHERE track_id=?",
+                                 (track_id,))
+            return result.fetchone()
+
+    def set_tags(self, track_id, lyrics, comments, mtime):
+        """
+            Set tags not needed in views
+            @param track id as int
+            @param lyrics as str
+            @param comments as str
+            @param mtime as int, file mtime
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("INSERT OR REPLACE INTO track_tags\
+                         (track_id, mtime, lyrics, comments)\
+                         VALUES (?, ?, ?, ?)",
+                        (track_id, mtime, lyrics, comments))
+            sql.commit()
+
     def set_rate(self, track_id, rate):
         """
             Set track rate
@@ -309,13 +476,7 @@ class TracksDatabase:
             @param track id as int
             @return album id as int
         """
-        with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT album_id FROM tracks WHERE rowid=?",
-                                 (track_id,))
-            v = result.fetchone()
-            if v is not None:
-                return v[0]
-            return -1
+        return self.cache.get(track_id, self.__get_album_id, -1)
 
     def get_album_name(self, track_id):
         """
@@ -380,20 +541,27 @@ class TracksDatabase:
                                  (track_id,))
             return list(itertools.chain(*result))
 
-    def get_mtimes(self):
+    def get_mtimes(self, uri=None):
         """
             Get mtime for tracks
             WARNING: Should be called before anything is shown on screen
-            @param None
+            @param uri as str, only tracks for this file or directory uri
             @return dict of {uri as string: mtime as int}
         """
         with SqlCursor(Lp().db) as sql:
             mtimes = {}
-            result = sql.execute("SELECT DISTINCT tracks.uri, TG.mtime\
-                                  FROM tracks, track_genres AS TG\
-                                  WHERE tracks.rowid=TG.track_id\
-                                  AND tracks.persistent=?",
-                                 (DbPersistent.INTERNAL,))
+            request = "SELECT DISTINCT tracks.uri, TG.mtime\
+                       FROM tracks, track_genres AS TG\
+                       WHERE tracks.rowid=TG.track_id\
+                       AND tracks.persistent=?"
+            filters = (DbPersistent.INTERNAL,)
+            if uri is not None:
+                # Uris below directory are in [uri/, uri0[, "0" follows "/"
+                uri = uri.rstrip("/")
+                request += " AND (tracks.uri=?\
+                             OR (tracks.uri>=? AND tracks.uri<?))"
+                filters += (uri, uri + "/", uri + "0")
+            result = sql.execute(request, filters)
             for row in result:
                 mtimes.update((row,))
             return mtimes
@@ -520,15 +688,7 @@ class TracksDatabase:
             Return avarage popularity
             @return avarage popularity as int
         """
-        with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT AVG(popularity)\
-                                  FROM (SELECT popularity\
-                                        FROM tracks\
-                                        ORDER BY POPULARITY DESC LIMIT 100)")
-            v = result.fetchone()
-            if v and v[0] > 5:
-                return v[0]
-            return 5
+        return self.popularity.get_average()
 
     def set_more_popular(self, track_id):
         """
@@ -548,6 +708,7 @@ class TracksDatabase:
             sql.execute("UPDATE tracks set popularity=? WHERE rowid=?",
                         (current, track_id))
             sql.commit()
+            self.popularity.update(track_id, current)
 
     def set_listened_at(self, track_id, time):
         """
@@ -597,8 +758,8 @@ class TracksDatabase:
             @return int
         """
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT rowid FROM tracks\
-                                  WHERE persistent=?", (track_id,))
+            result = sql.execute("SELECT persistent FROM tracks\
+                                  WHERE rowid=?", (track_id,))
             v = result.fetchone()
             if v is not None:
                 return v[0]
@@ -653,6 +814,7 @@ class TracksDatabase:
                             (popularity, track_id))
                 if commit:
                     sql.commit()
+                self.popularity.update(track_id, popularity)
             except:  # Database is locked
                 pass
 
@@ -735,14 +897,15 @@ class TracksDatabase:
             @param mtime as int
         """
         with SqlCursor(Lp().db) as sql:
-            filters = (mtime, track_id,) + tuple(genre_ids)
+            (genre_filter, genre_filters) = SqlCursor.get_filter(
+                                                    sql,
+                                                    "genre_id",
+                                                    genre_ids)
+            filters = (mtime, track_id) + genre_filters
             request = "UPDATE track_genres\
                        SET mtime=?\
-                       WHERE track_id=?\
-                       AND ("
-            for genre_id in genre_ids:
-                request += "genre_id=? OR "
-            request += "1=0)"
+                       WHERE track_id=? AND "
+            request += genre_filter
             sql.execute(request, filters)
             sql.commit()
 
@@ -780,18 +943,37 @@ class TracksDatabase:
             @param searched as string
             return: list of [id as int, name as string]
         """
+        query = get_search_query(searched)
+        if query is None:
+            return []
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT tracks.rowid, tracks.name\
-                                  FROM tracks, track_genres AS TG\
-                                  WHERE noaccents(name) LIKE ?\
-                                  AND tracks.rowid=TG.track_id\
-                                  AND ? NOT IN (\
-                                    SELECT track_genres.genre_id\
-                                    FROM track_genres\
-                                    WHERE TG.track_id=track_genres.track_id)\
-                                  LIMIT 25",
-                                 ("%" + noaccents(searched) + "%",
-                                  Type.CHARTS))
+            try:
+                result = sql.execute("SELECT tracks.rowid, tracks.name\
+                                      FROM tracks_fts, tracks,\
+                                      track_genres AS TG\
+                                      WHERE tracks_fts MATCH ?\
+                                      AND tracks.rowid=tracks_fts.rowid\
+                                      AND tracks.rowid=TG.track_id\
+                                      AND ? NOT IN (\
+                                        SELECT track_genres.genre_id\
+                                        FROM track_genres\
+                                        WHERE TG.track_id=\
+                                        track_genres.track_id)\
+                                      LIMIT 25",
+                                     (query, Type.CHARTS))
+            except sqlite3.OperationalError:  # No FTS5 support
+                result = sql.execute("SELECT tracks.rowid, tracks.name\
+                                      FROM tracks, track_genres AS TG\
+                                      WHERE noaccents(name) LIKE ?\
+                                      AND tracks.rowid=TG.track_id\
+                                      AND ? NOT IN (\
+                                        SELECT track_genres.genre_id\
+                                        FROM track_genres\
+                                        WHERE TG.track_id=\
+                                        track_genres.track_id)\
+                                      LIMIT 25",
+                                     ("%" + noaccents(searched) + "%",
+                                      Type.CHARTS))
             return list(result)
 
     def search_track(self, artist, title):
@@ -825,5 +1007,40 @@ class TracksDatabase:
                          WHERE track_id=?", (track_id,))
             sql.execute("DELETE FROM track_artists\
                          WHERE track_id=?", (track_id,))
+            sql.execute("DELETE FROM track_tags\
+                         WHERE track_id=?", (track_id,))
             sql.execute("DELETE FROM tracks\
                          WHERE rowid=?", (track_id,))
+            self.cache.invalidate(track_id)
+            self.popularity.remove(track_id)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_uri(self, track_id):
+        """
+            Get track uri from db
+            @param Track id as int
+            @return uri as string/None
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT uri FROM tracks WHERE rowid=?",
+                                 (track_id,))
+            v = result.fetchone()
+            if v is not None:
+                return v[0]
+            return None
+
+    def __get_album_id(self, track_id):
+        """
+            Get album id from db
+            @param track id as int
+            @return album id as int/None
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT album_id FROM tracks WHERE rowid=?",
+                                 (track_id,))
+            v = result.fetchone()
+            if v is not None:
+                return v[0]
+            return None
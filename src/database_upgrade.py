@@ -19,7 +19,7 @@ from lollypop.sqlcursor import SqlCursor
 from lollypop.utils import translate_artist_name
 from lollypop.database_history import History
 from lollypop.radios import Radios
-from lollypop.define import Lp
+from lollypop.define import Lp, Type
 
 
 class DatabaseUpgrade:
@@ -57,6 +57,25 @@ class DatabaseUpgrade:
             19: self.__upgrade_19,
             20: self.__upgrade_20,
             21: self.__upgrade_21,
+            22: "CREATE TABLE dirs (uri TEXT NOT NULL,\
+                                    mtime INT NOT NULL,\
+                                    count INT NOT NULL)",
+            23: "CREATE index idx_tal ON tracks(album_id)",
+            24: "ALTER TABLE tracks ADD fingerprint TEXT",
+            25: "CREATE TABLE scan_journal (uri TEXT PRIMARY KEY,\
+                                            mtime INT NOT NULL)",
+            26: "CREATE TABLE track_tags (track_id INT PRIMARY KEY,\
+                                          mtime INT NOT NULL,\
+                                          lyrics TEXT NOT NULL,\
+                                          comments TEXT NOT NULL)",
+            27: self.__upgrade_27,
+            28: self.__upgrade_28,
+            29: self.__upgrade_29,
+            30: "CREATE index idx_tpop ON tracks(popularity)",
+            31: "CREATE index idx_alpop ON albums(popularity)",
+            32: "CREATE index idx_turi ON tracks(uri)",
+            33: "ALTER TABLE scan_journal ADD file_mtime INT NOT NULL\
+                 DEFAULT 0",
                          }
 
     """
@@ -416,3 +435,38 @@ class DatabaseUpgrade:
             sql.execute("ALTER TABLE radios ADD rate\
                          INT NOT NULL DEFAULT -1")
             sql.commit()
+
+    def __upgrade_27(self):
+        """
+            Add full text search index
+        """
+        Lp().db.create_search_index()
+
+    def __upgrade_28(self):
+        """
+            Add locale sort keys to artists, albums and genres
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("ALTER TABLE artists ADD sortkey BLOB")
+            sql.execute("ALTER TABLE albums ADD sortkey BLOB")
+            sql.execute("ALTER TABLE genres ADD sortkey BLOB")
+            sql.execute("CREATE index idx_arsk ON artists(sortkey)")
+            sql.execute("CREATE index idx_alsk ON albums(sortkey)")
+            sql.execute("CREATE index idx_gsk ON genres(sortkey)")
+            sql.commit()
+        # Force keys computation, see Database.update_sort_keys()
+        Lp().settings.set_value("sort-locale", GLib.Variant("s", ""))
+
+    def __upgrade_29(self):
+        """
+            Flag charts albums, remove correlated subqueries from listings
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("ALTER TABLE albums ADD chart INT NOT NULL DEFAULT 0")
+            sql.execute("UPDATE albums SET chart=1 WHERE rowid IN (\
+                            SELECT album_id FROM album_genres\
+                            WHERE genre_id=?)", (Type.CHARTS,))
+            sql.execute("CREATE index idx_alch ON albums(chart, sortkey)")
+            sql.execute("CREATE index idx_agg ON album_genres(\
+                                                genre_id, album_id)")
+            sql.commit()
@@ -29,6 +29,8 @@ class Inotify:
             Init inode notification
         """
         self.__monitors = []
+        # Changed uris since last update
+        self.__uris = set()
         self.__timeout = None
 
     def add_monitor(self, uri):
@@ -54,43 +56,38 @@ class Inotify:
 #######################
     def __on_dir_changed(self, monitor, changed_file, other_file, event):
         """
-            Prepare thread to handle changes
+            Collect changed uri and prepare collection update
         """
         update = False
-        # Stop collection scanner and wait
-        if Lp().scanner.is_locked():
-            Lp().scanner.stop()
-            GLib.timeout_add(self.__TIMEOUT,
-                             self.__on_dir_changed,
-                             monitor,
-                             changed_file,
-                             other_file,
-                             event)
-        # Run update delayed
-        else:
-            uri = changed_file.get_uri()
-            d = Lio.File.new_for_uri(uri)
-            if d.query_exists():
-                # If a directory, monitor it
-                if changed_file.query_file_type(
-                                            Gio.FileQueryInfoFlags.NONE,
-                                            None) == Gio.FileType.DIRECTORY:
-                    self.add_monitor(uri)
-                # If not an audio file, exit
-                elif is_audio(changed_file):
-                    update = True
-            else:
+        uri = changed_file.get_uri()
+        if changed_file.query_exists():
+            # If a directory, monitor it
+            if changed_file.query_file_type(
+                                        Gio.FileQueryInfoFlags.NONE,
+                                        None) == Gio.FileType.DIRECTORY:
+                self.add_monitor(uri)
+                update = True
+            # If not an audio file, exit
+            elif is_audio(changed_file):
                 update = True
-            if update:
-                if self.__timeout is not None:
-                    GLib.source_remove(self.__timeout)
-                    self.__timeout = None
-                self.__timeout = GLib.timeout_add(self.__TIMEOUT,
-                                                  self.__run_collection_update)
+        else:
+            update = True
+        if update:
+            self.__uris.add(uri)
+            if self.__timeout is not None:
+                GLib.source_remove(self.__timeout)
+                self.__timeout = None
+            self.__timeout = GLib.timeout_add(self.__TIMEOUT,
+                                              self.__run_collection_update)
 
     def __run_collection_update(self):
         """
-            Run a collection update
+            Run a collection update for changed uris
         """
+        # Wait for running scan
+        if Lp().scanner.is_locked():
+            return True
         self.__timeout = None
-        Lp().window.update_db()
+        uris = list(self.__uris)
+        self.__uris = set()
+        Lp().scanner.update_uris(uris)
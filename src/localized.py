@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from locale import strcoll
+from locale import strcoll, strxfrm, setlocale, LC_COLLATE
 
 
 class LocalizedCollation(object):
@@ -24,3 +24,22 @@ class LocalizedCollation(object):
 
     def __call__(self, v1, v2):
         return strcoll(v1, v2)
+
+
+def get_sort_key(string):
+    """
+        Get a key sorting as string with current locale
+        Keys compare byte by byte, so BINARY collation can use an index
+        @param string as str
+        @return bytes
+    """
+    # strxfrm() may return lone surrogates, not valid UTF-8
+    return strxfrm(string).encode("utf-32-be", "surrogatepass")
+
+
+def get_sort_locale():
+    """
+        Get locale used by get_sort_key()
+        @return str
+    """
+    return setlocale(LC_COLLATE)
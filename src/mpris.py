@@ -162,6 +162,7 @@ class MPRIS(Server):
     def __init__(self, app):
         self.__app = app
         self.__metadata = {}
+        self.__cancellable = None
         self.__bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
         Gio.bus_own_name_on_connection(self.__bus,
                                        self.__MPRIS_LOLLYPOP,
@@ -318,66 +319,60 @@ class MPRIS(Server):
         else:
             return "Stopped"
 
-    def __update_metadata(self):
-        if self.__get_status() == "Stopped":
-            self.__metadata = {}
+    def __get_metadata(self, track, status):
+        """
+            Get metadata for track
+            @param track as Track
+            @param status as str
+            @return {str: GLib.Variant}
+            @thread safe
+        """
+        metadata = {}
+        if status == "Stopped":
+            return metadata
+        if track.id >= 0:
+            track_id = track.id
         else:
-            if Lp().player.current_track.id >= 0:
-                track_id = Lp().player.current_track.id
-            else:
-                track_id = randint(10000000, 90000000)
-            self.__metadata["mpris:trackid"] = self.__get_media_id(track_id)
-            track_number = Lp().player.current_track.number
-            if track_number is None:
-                track_number = 1
-            self.__metadata["xesam:trackNumber"] = GLib.Variant("i",
-                                                                track_number)
-            self.__metadata["xesam:title"] = GLib.Variant(
-                                                "s",
-                                                Lp().player.current_track.name)
-            self.__metadata["xesam:album"] = GLib.Variant(
-                                          "s",
-                                          Lp().player.current_track.album.name)
-            self.__metadata["xesam:artist"] = GLib.Variant(
-                                             "as",
-                                             Lp().player.current_track.artists)
-            self.__metadata["xesam:albumArtist"] = GLib.Variant(
-                                       "as",
-                                       Lp().player.current_track.album_artists)
-            self.__metadata["mpris:length"] = GLib.Variant(
-                               "x",
-                               Lp().player.current_track.duration * Gst.SECOND)
-            self.__metadata["xesam:genre"] = GLib.Variant(
-                                              "as",
-                                              Lp().player.current_track.genres)
-            self.__metadata["xesam:url"] = GLib.Variant(
-                                                 "s",
-                                                 Lp().player.current_track.uri)
-            rate = Lp().player.current_track.get_rate()
-            if rate == Type.NONE:
-                rate = Lp().player.current_track.get_popularity()
-            self.__metadata["xesam:userRating"] = GLib.Variant("d", rate / 5)
-            if Lp().player.current_track.id == Type.RADIOS:
-                cover_path = Lp().art.get_radio_cache_path(
-                     ", ".join(Lp().player.current_track.artists),
-                     ArtSize.MONSTER)
-            elif Lp().player.current_track.id == Type.EXTERNALS:
-                cover_path = "/tmp/lollypop_mpris.jpg"
-                pixbuf = Lp().art.pixbuf_from_tags(
-                    GLib.filename_from_uri(Lp().player.current_track.uri)[0],
-                    ArtSize.MONSTER)
-                if pixbuf is not None:
-                    pixbuf.savev(cover_path, "jpeg",
-                                 ["quality"], ["90"])
-            else:
-                cover_path = Lp().art.get_album_cache_path(
-                    Lp().player.current_track.album, ArtSize.MONSTER)
-            if cover_path is not None:
-                self.__metadata["mpris:artUrl"] = GLib.Variant(
-                                                        "s",
-                                                        "file://" + cover_path)
-            elif "mpris:artUrl" in self.__metadata:
-                self.__metadata["mpris:artUrl"] = GLib.Variant("s", "")
+            track_id = randint(10000000, 90000000)
+        metadata["mpris:trackid"] = self.__get_media_id(track_id)
+        track_number = track.number
+        if track_number is None:
+            track_number = 1
+        metadata["xesam:trackNumber"] = GLib.Variant("i", track_number)
+        metadata["xesam:title"] = GLib.Variant("s", track.name)
+        metadata["xesam:album"] = GLib.Variant("s", track.album.name)
+        metadata["xesam:artist"] = GLib.Variant("as", track.artists)
+        metadata["xesam:albumArtist"] = GLib.Variant("as",
+                                                     track.album_artists)
+        metadata["mpris:length"] = GLib.Variant("x",
+                                                track.duration * Gst.SECOND)
+        metadata["xesam:genre"] = GLib.Variant("as", track.genres)
+        metadata["xesam:url"] = GLib.Variant("s", track.uri)
+        rate = track.get_rate()
+        if rate == Type.NONE:
+            rate = track.get_popularity()
+        metadata["xesam:userRating"] = GLib.Variant("d", rate / 5)
+        if track.id == Type.RADIOS:
+            cover_path = Lp().art.get_radio_cache_path(
+                 ", ".join(track.artists),
+                 ArtSize.MONSTER)
+        elif track.id == Type.EXTERNALS:
+            cover_path = "/tmp/lollypop_mpris.jpg"
+            pixbuf = Lp().art.pixbuf_from_tags(
+                GLib.filename_from_uri(track.uri)[0],
+                ArtSize.MONSTER)
+            if pixbuf is not None:
+                pixbuf.savev(cover_path, "jpeg",
+                             ["quality"], ["90"])
+        else:
+            cover_path = Lp().art.get_album_cache_path(track.album,
+                                                       ArtSize.MONSTER)
+        if cover_path is not None:
+            metadata["mpris:artUrl"] = GLib.Variant("s",
+                                                    "file://" + cover_path)
+        elif "mpris:artUrl" in self.__metadata:
+            metadata["mpris:artUrl"] = GLib.Variant("s", "")
+        return metadata
 
     def __on_seeked(self, player, position):
         self.Seeked(position * Gst.SECOND)
@@ -389,7 +384,21 @@ class MPRIS(Server):
                                [])
 
     def __on_current_changed(self, player):
-        self.__update_metadata()
+        # Metadata from previous track is useless now
+        if self.__cancellable is not None:
+            self.__cancellable.cancel()
+        self.__cancellable = Lp().db_async.run(self.__get_metadata,
+                                               (Lp().player.current_track,
+                                                self.__get_status()),
+                                               self.__on_metadata)
+
+    def __on_metadata(self, metadata):
+        """
+            Notify metadata
+            @param metadata as {str: GLib.Variant}
+        """
+        self.__cancellable = None
+        self.__metadata = metadata
         properties = {"Metadata": GLib.Variant("a{sv}", self.__metadata),
                       "CanPlay": GLib.Variant("b", True),
                       "CanPause": GLib.Variant("b", True),
@@ -398,7 +407,7 @@ class MPRIS(Server):
         try:
             self.PropertiesChanged(self.__MPRIS_PLAYER_IFACE, properties, [])
         except Exception as e:
-            print("MPRIS::__on_current_changed(): %s" % e)
+            print("MPRIS::__on_metadata(): %s" % e)
 
     def __on_status_changed(self, data=None):
         properties = {"PlaybackStatus": GLib.Variant("s", self.__get_status())}
@@ -49,6 +49,14 @@ class Base:
             else:
                 return attr_value
 
+    def set_fields(self, fields):
+        """
+            Set fields values, no lazy DB call will be done for them
+            @param fields as {field as str: value}
+        """
+        for (attr, value) in fields.items():
+            setattr(self, "_" + attr, value)
+
     def get_popularity(self):
         """
             Get popularity
@@ -163,7 +171,7 @@ class Disc:
 
             @return list of Track
         """
-        return [Track(id) for id in self.track_ids]
+        return Track.load_many(self.track_ids)
 
 
 class Album(Base):
@@ -188,6 +196,23 @@ class Album(Base):
         if artist_ids:
             self.artist_ids = artist_ids
 
+    @staticmethod
+    def load_many(album_ids, genre_ids=[]):
+        """
+            Get albums with fields loaded in a few DB requests
+            @param album ids as [int]
+            @param genre ids as [int]
+            @return [Album]
+        """
+        fields = Lp().albums.get_many(album_ids)
+        albums = []
+        for album_id in album_ids:
+            album = Album(album_id, genre_ids)
+            if album_id in fields.keys():
+                album.set_fields(fields[album_id])
+            albums.append(album)
+        return albums
+
     def set_genres(self, genre_ids):
         """
             Set album genres
@@ -239,7 +264,7 @@ class Album(Base):
             @return list of Track
         """
         if not self._tracks and self.track_ids:
-            self._tracks = [Track(track_id) for track_id in self.track_ids]
+            self._tracks = Track.load_many(self.track_ids)
         return self._tracks
 
     @property
@@ -325,8 +350,34 @@ class Track(Base):
         Base.__init__(self, Lp().tracks)
         self.id = track_id
         self._uri = None
+        self._album = None
         self._non_album_artists = []
 
+    @staticmethod
+    def load_many(track_ids):
+        """
+            Get tracks with fields and albums loaded in a few DB requests
+            @param track ids as [int]
+            @return [Track]
+        """
+        fields = Lp().tracks.get_many(track_ids)
+        album_ids = list(dict.fromkeys([value["album_id"]
+                                        for value in fields.values()]))
+        albums = {}
+        for album in Album.load_many(album_ids):
+            albums[album.id] = album
+        tracks = []
+        for track_id in track_ids:
+            track = Track(track_id)
+            if track_id in fields.keys():
+                track.set_fields(fields[track_id])
+                album = albums.get(track.album_id, None)
+                if album is not None:
+                    track.set_fields({"album": album,
+                                      "album_artist_ids": album.artist_ids})
+            tracks.append(track)
+        return tracks
+
     @property
     def is_web(self):
         """
@@ -403,6 +454,8 @@ class Track(Base):
             Get track"s album
             @return Album
         """
+        if self._album is not None:
+            return self._album
         return Album(self.album_id)
 
     @property
@@ -41,6 +41,10 @@ class BinPlayer(BasePlayer):
                                                            "playbin", "player")
         self.__playbin2 = Gst.ElementFactory.make("playbin", "player")
         self.__preview = None
+        # Only used to parse stream tags
+        self.__reader = TagReader()
+        # True if duration has been checked for current track
+        self.__duration_checked = False
         self._plugins = self._plugins1 = PluginsPlayer(self.__playbin1)
         self._plugins2 = PluginsPlayer(self.__playbin2)
         self._playbin.connect("notify::volume", self.__on_volume_changed)
@@ -59,6 +63,8 @@ class BinPlayer(BasePlayer):
             bus.connect("message::element", self.__on_bus_element)
             bus.connect("message::stream-start", self._on_stream_start)
             bus.connect("message::tag", self.__on_bus_message_tag)
+            bus.connect("message::async-done", self.__on_bus_duration)
+            bus.connect("message::duration-changed", self.__on_bus_duration)
         self._start_time = 0
 
     @property
@@ -252,6 +258,7 @@ class BinPlayer(BasePlayer):
         debug("BinPlayer::_load_track(): %s" % track.uri)
         try:
             self._current_track = track
+            self.__duration_checked = False
             if track.is_web:
                 loaded = self._load_web(track)
                 # If track not loaded, go next
@@ -339,24 +346,34 @@ class BinPlayer(BasePlayer):
                                             int(time()))
         except:  # Locked database
             pass
+        self.__update_current_duration()
 
 #######################
 # PRIVATE             #
 #######################
-    def __update_current_duration(self, reader, track):
+    def __update_current_duration(self):
         """
-            Update current track duration
-            @param reader as TagReader
-            @param track id as int
+            Update current track duration from playbin, for non internal
+            tracks, db is updated at most once by track load
         """
+        track = self._current_track
+        if self.__duration_checked or track.id is None or\
+                track.persistent == DbPersistent.INTERNAL:
+            return
         try:
-            duration = reader.get_info(track.uri).get_duration() / 1000000000
-            if duration != track.duration and duration > 0:
-                Lp().tracks.set_duration(track.id, duration)
-                self._current_track.set_duration(duration)
-                GLib.idle_add(self.emit, "duration-changed", track.id)
-        except:
-            pass
+            (b, duration) = self._playbin.query_duration(Gst.Format.TIME)
+            # Not prerolled yet
+            if not b or duration <= 0:
+                return
+            self.__duration_checked = True
+            duration = duration / Gst.SECOND
+            if duration != track.duration:
+                if track.id >= 0:
+                    Lp().tracks.set_duration(track.id, duration)
+                track.set_duration(duration)
+                self.emit("duration-changed", track.id)
+        except Exception as e:
+            print("BinPlayer::__update_current_duration():", e)
 
     def __load(self, track, init_volume=True):
         """
@@ -521,14 +538,10 @@ class BinPlayer(BasePlayer):
              self._current_track.duration > 0.0):
             return
         debug("Player::__on_bus_message_tag(): %s" % self._current_track.uri)
-        reader = TagReader()
+        reader = self.__reader
 
-        # Update duration of non internals
+        # Duration of non internals is updated on preroll
         if self._current_track.persistent != DbPersistent.INTERNAL:
-            t = Thread(target=self.__update_current_duration,
-                       args=(reader, self._current_track))
-            t.daemon = True
-            t.start()
             return
 
         tags = message.parse_tag()
@@ -561,6 +574,15 @@ class BinPlayer(BasePlayer):
         if changed:
             self.emit("current-changed")
 
+    def __on_bus_duration(self, bus, message):
+        """
+            Update current track duration once known
+            @param bus as Gst.Bus
+            @param message as Gst.Message
+        """
+        if self._playbin.get_bus() == bus:
+            self.__update_current_duration()
+
     def __on_bus_element(self, bus, message):
         """
             Set elements for missings plugins
@@ -320,6 +320,6 @@ class ShufflePlayer(BasePlayer):
             Add party mode blacklist to already played tracks
         """
         if self.__is_party:
-            for track_id in Lp().playlists.get_track_ids(Type.NOPARTY):
-                track = Track(track_id)
+            track_ids = Lp().playlists.get_track_ids(Type.NOPARTY)
+            for track in Track.load_many(track_ids):
                 self.__add_to_shuffle_history(track)
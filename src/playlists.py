@@ -14,7 +14,6 @@ from gi.repository import GObject, GLib, Gio
 
 from gettext import gettext as _
 import itertools
-import sqlite3
 from datetime import datetime
 
 from lollypop.database import Database
@@ -49,6 +48,9 @@ class Playlists(GObject.GObject):
     __create_tracks = """CREATE TABLE tracks (
                         playlist_id INT NOT NULL,
                         uri TEXT NOT NULL)"""
+    # Created on each start, older dbs do not have it
+    __create_tracks_uri_idx = """CREATE INDEX IF NOT EXISTS idx_turi
+                                 ON tracks(uri)"""
 
     def __init__(self):
         """
@@ -64,6 +66,12 @@ class Playlists(GObject.GObject):
                 sql.commit()
         except:
             pass
+        try:
+            with SqlCursor(self) as sql:
+                sql.execute(self.__create_tracks_uri_idx)
+                sql.commit()
+        except Exception as e:
+            print("Playlists::__init__():", e)
 
     def add(self, name):
         """
@@ -137,6 +145,36 @@ class Playlists(GObject.GObject):
                         (uri,))
             sql.commit()
 
+    def remove_uris(self, uris):
+        """
+            Remove tracks from playlists
+            @param uris as [str]
+        """
+        with SqlCursor(self) as sql:
+            sql.executemany("DELETE FROM tracks\
+                            WHERE uri=?",
+                            [(uri,) for uri in uris])
+            sql.commit()
+
+    def set_uris(self, uris):
+        """
+            Set new uris for moved tracks
+            @param uris as [(old uri as str, new uri as str)]
+            @thread safe
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("CREATE TEMP TABLE IF NOT EXISTS tmp_moved (\
+                                        old TEXT PRIMARY KEY,\
+                                        new TEXT NOT NULL)")
+            sql.execute("DELETE FROM tmp_moved")
+            sql.executemany("INSERT OR REPLACE INTO tmp_moved (old, new)\
+                             VALUES (?, ?)", uris)
+            sql.execute("UPDATE tracks\
+                         SET uri=(SELECT new FROM tmp_moved\
+                                  WHERE old=tracks.uri)\
+                         WHERE uri IN (SELECT old FROM tmp_moved)")
+            sql.commit()
+
     def get(self):
         """
             Return availables playlists
@@ -465,7 +503,7 @@ class Playlists(GObject.GObject):
             Return a new sqlite cursor
         """
         try:
-            sql = sqlite3.connect(self._DB_PATH, 600.0)
+            sql = SqlCursor.connect(self._DB_PATH)
             sql.execute('ATTACH DATABASE "%s" AS music' % Database.DB_PATH)
             sql.create_collation("LOCALIZED", LocalizedCollation())
             return sql
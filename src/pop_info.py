@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gtk, GLib
+from gi.repository import Gtk, GLib, Gio
 
 from gettext import gettext as _
 from threading import Thread
@@ -21,6 +21,7 @@ from lollypop.utils import get_network_available
 from lollypop.widgets_info import WikipediaContent, LastfmContent
 from lollypop.cache import InfoCache
 from lollypop.view_artist_albums import CurrentArtistAlbumsView
+from lollypop.lio import Lio
 
 
 class InfoPopover(Gtk.Popover):
@@ -66,6 +67,7 @@ class InfoPopover(Gtk.Popover):
         self.__current_track = Track()
         self.__timeout_id = None
         self.__signal_id = None
+        self.__lyrics_cancellable = None
 
         builder = Gtk.Builder()
         builder.add_from_resource("/org/gnome/Lollypop/ArtistInfo.ui")
@@ -241,17 +243,76 @@ class InfoPopover(Gtk.Popover):
         self.__jump_button.hide()
         if self.__current_track.id is None:
             self.__current_track = Lp().player.current_track
-        # First try to get lyrics from tags
-        from lollypop.tagreader import TagReader
-        reader = TagReader()
-        try:
-            info = reader.get_info(self.__current_track.uri)
-        except:
-            info = None
-        lyrics = ""
-        if info is not None:
-            tags = info.get_tags()
-            lyrics = reader.get_lyrics(tags)
+        # First try to get lyrics from tags, file may need to be read
+        if self.__lyrics_cancellable is not None:
+            self.__lyrics_cancellable.cancel()
+        self.__lyrics_cancellable = Lp().db_async.run(
+                                          self.__get_lyrics,
+                                          (self.__current_track,),
+                                          lambda lyrics: self.__set_lyrics(
+                                                               widget,
+                                                               lyrics),
+                                          widget)
+
+    def _on_map_duck(self, widget):
+        """
+            Load on map
+            @param widget as Gtk.Viewport
+        """
+        self._on_child_unmap(widget)
+        self.__jump_button.hide()
+        if self.__current_track.id is None:
+            self.__current_track = Lp().player.current_track
+        Lp().settings.set_value("infoswitch",
+                                GLib.Variant("s", "duck"))
+        if self.__artist_ids:
+            artists = []
+            for artist_id in self.__artist_ids:
+                artists.append(Lp().artists.get_name(artist_id))
+            search = ", ".join(artists)
+        else:
+            if self.__current_track.id == Type.RADIOS:
+                search = self.__current_track.name
+            else:
+                title = self.__current_track.name
+                artists = ", ".join(Lp().player.current_track.artists)
+                search = "%s+%s" % (artists, title)
+        url = "https://duckduckgo.com/?q=%s&kl=%s&kd=-1&k5=2&kp=1&k1=-1"\
+              % (search, Gtk.get_default_language().to_string())
+        # If we do not have a webview in children, create a new one
+        # Else load url
+        children = widget.get_children()
+        if not children or not isinstance(children[0], self.WebView):
+            # Destroy previous widgets
+            self._on_child_unmap(widget)
+            web = self.WebView(False, True)
+            web.show()
+            widget.add(web)
+            # Delayed load due to WebKit memory loading and Gtk animation
+            GLib.timeout_add(250, web.load, url, OpenLink.NEW)
+        elif url != children[0].url:
+            children[0].load(url, OpenLink.NEW)
+
+    def _on_child_unmap(self, widget):
+        """
+            Destroy child children
+            @param widget as Gtk.Widget
+        """
+        for child in widget.get_children():
+            if not isinstance(child, Gtk.Label):
+                child.stop()
+            child.destroy()
+
+#######################
+# PRIVATE             #
+#######################
+    def __set_lyrics(self, widget, lyrics):
+        """
+            Show lyrics, search them on web if empty
+            @param widget as Gtk.Viewport
+            @param lyrics as str
+        """
+        self.__lyrics_cancellable = None
         if lyrics or InfoPopover.WebView is None\
                 or not get_network_available():
             # Destroy previous widgets
@@ -305,58 +366,39 @@ class InfoPopover(Gtk.Popover):
             elif url != children[0].url:
                 children[0].load(url, OpenLink.NEW)
 
-    def _on_map_duck(self, widget):
+    def __get_lyrics(self, track):
         """
-            Load on map
-            @param widget as Gtk.Viewport
+            Get lyrics from db, read them from file if db is outdated
+            @param track as Track
+            @return lyrics as str
+            @thread safe
         """
-        self._on_child_unmap(widget)
-        self.__jump_button.hide()
-        if self.__current_track.id is None:
-            self.__current_track = Lp().player.current_track
-        Lp().settings.set_value("infoswitch",
-                                GLib.Variant("s", "duck"))
-        if self.__artist_ids:
-            artists = []
-            for artist_id in self.__artist_ids:
-                artists.append(Lp().artists.get_name(artist_id))
-            search = ", ".join(artists)
-        else:
-            if self.__current_track.id == Type.RADIOS:
-                search = self.__current_track.name
-            else:
-                title = self.__current_track.name
-                artists = ", ".join(Lp().player.current_track.artists)
-                search = "%s+%s" % (artists, title)
-        url = "https://duckduckgo.com/?q=%s&kl=%s&kd=-1&k5=2&kp=1&k1=-1"\
-              % (search, Gtk.get_default_language().to_string())
-        # If we do not have a webview in children, create a new one
-        # Else load url
-        children = widget.get_children()
-        if not children or not isinstance(children[0], self.WebView):
-            # Destroy previous widgets
-            self._on_child_unmap(widget)
-            web = self.WebView(False, True)
-            web.show()
-            widget.add(web)
-            # Delayed load due to WebKit memory loading and Gtk animation
-            GLib.timeout_add(250, web.load, url, OpenLink.NEW)
-        elif url != children[0].url:
-            children[0].load(url, OpenLink.NEW)
-
-    def _on_child_unmap(self, widget):
-        """
-            Destroy child children
-            @param widget as Gtk.Widget
-        """
-        for child in widget.get_children():
-            if not isinstance(child, Gtk.Label):
-                child.stop()
-            child.destroy()
+        mtime = None
+        try:
+            f = Lio.File.new_for_uri(track.uri)
+            info = f.query_info("time::modified",
+                                Gio.FileQueryInfoFlags.NONE,
+                                None)
+            mtime = info.get_attribute_uint64("time::modified")
+        except:
+            pass
+        if track.id is not None and track.id >= 0:
+            tags = Lp().tracks.get_tags(track.id)
+            if tags is not None and tags[2] == mtime:
+                return tags[0]
+        from lollypop.tagreader import TagReader
+        reader = TagReader()
+        try:
+            info = reader.get_info(track.uri)
+        except:
+            return ""
+        tags = info.get_tags()
+        lyrics = reader.get_lyrics(tags)
+        if track.id is not None and track.id >= 0 and mtime is not None:
+            Lp().tracks.set_tags(track.id, lyrics,
+                                 reader.get_comments(tags), mtime)
+        return lyrics
 
-#######################
-# PRIVATE             #
-#######################
     def __set_autoload(self, widget):
         """
             Mark as autoload
@@ -217,36 +217,56 @@ class SearchRow(Gtk.ListBoxRow):
         """
             Init row
         """
-        artists = []
-        if self.__item.is_track:
-            obj = Track(self.__item.id)
-            album_id = obj.album_id
-        else:
-            obj = Album(self.__item.id)
-            album_id = obj.id
-
+        surface = Lp().art.get_default_icon("emblem-music-symbolic",
+                                            ArtSize.MEDIUM,
+                                            self.get_scale_factor())
+        self.__cover.set_from_surface(surface)
+        del surface
         if self.__item.id is None:
             if self.__item.is_track:
                 self.__name.set_text("♫ " + self.__item.name)
             else:
                 self.__name.set_text(self.__item.name)
-            artists = self.__item.artists
-            surface = Lp().art.get_default_icon("emblem-music-symbolic",
-                                                ArtSize.MEDIUM,
-                                                self.get_scale_factor())
+            self.__artist.set_text(", ".join(self.__item.artists))
         else:
-            if self.__item.is_track:
-                self.__name.set_text("♫ " + Track(self.__item.id).name)
-            else:
-                self.__name.set_text(Album(self.__item.id).name)
-            for artist_id in self.__item.artist_ids:
-                artists.append(Lp().artists.get_name(artist_id))
-            surface = Lp().art.get_album_artwork(Album(album_id),
-                                                 ArtSize.MEDIUM,
-                                                 self.get_scale_factor())
+            Lp().db_async.run(self.__get_content, (self.__item,),
+                              self.__set_content, self)
+
+    def __get_content(self, item):
+        """
+            Get row content from db
+            @param item as SearchItem
+            @return (name as str, artists as [str], album as Album)
+            @thread safe
+        """
+        if item.is_track:
+            track = Track.load_many([item.id])[0]
+            name = "♫ " + track.name
+            album = track.album
+        else:
+            album = Album.load_many([item.id])[0]
+            name = album.name
+        artists = [Lp().artists.get_name(artist_id)
+                   for artist_id in item.artist_ids]
+        return (name, artists, album)
+
+    def __set_content(self, content):
+        """
+            Set row content
+            @param content as (name as str, artists as [str], album as Album)
+        """
+        (name, artists, album) = content
+        self.__name.set_text(name)
+        self.__item.artists = artists
+        self.__artist.set_text(", ".join(artists))
+        surface = Lp().art.get_album_artwork(album,
+                                             ArtSize.MEDIUM,
+                                             self.get_scale_factor())
         self.__cover.set_from_surface(surface)
         del surface
-        self.__artist.set_text(", ".join(artists))
+        # Score depends on content, sort again
+        self.__score = None
+        self.changed()
 
     def __on_saved(self, web, item_id, persistent):
         """
@@ -418,12 +438,10 @@ class SearchPopover(Gtk.Popover):
         # Network search score less
         if row.id is None:
             score = 0
-            artists = row.artists
         else:
             score = 1
-            artists = []
-            for artist_id in row.artist_ids:
-                artists.append(Lp().artists.get_name(artist_id))
+        # Artist names are loaded with row content
+        artists = row.artists
 
         for item in self.__current_search.split():
             try:
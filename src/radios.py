@@ -12,8 +12,6 @@
 
 from gi.repository import GObject, GLib, Gio, TotemPlParser
 
-import sqlite3
-
 from lollypop.sqlcursor import SqlCursor
 from lollypop.define import Type
 from lollypop.lio import Lio
@@ -284,7 +282,7 @@ class Radios(GObject.GObject):
             Return a new sqlite cursor
         """
         try:
-            return sqlite3.connect(self.DB_PATH, 600.0)
+            return SqlCursor.connect(self.DB_PATH)
         except:
             exit(-1)
 
@@ -0,0 +1,112 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from time import time
+
+
+class ScanStats:
+    """
+        Collection scan statistics: time spent in each phase,
+        files and bytes read by root
+    """
+    PHASES = ["walk", "stat", "tag read", "history lookup",
+              "db write", "commit", "album aggregation"]
+
+    def __init__(self, roots):
+        """
+            Init stats
+            @param roots as [str]
+        """
+        self.__start = time()
+        self.__elapsed = None
+        self.__times = dict.fromkeys(self.PHASES, 0.0)
+        # {root: [found files, read files, read bytes, read time]}
+        self.__roots = {}
+        for root in roots:
+            if not root.endswith("/"):
+                root += "/"
+            self.__roots[root] = [0, 0, 0, 0.0]
+
+    def add_time(self, phase, seconds):
+        """
+            Add time spent in phase
+            @param phase as str in ScanStats.PHASES
+            @param seconds as float
+        """
+        self.__times[phase] += seconds
+
+    def add_found(self, uris):
+        """
+            Count files found while walking
+            @param uris as [str]
+        """
+        for uri in uris:
+            root = self.__get_root(uri)
+            if root is not None:
+                self.__roots[root][0] += 1
+
+    def add_read(self, uri, read_bytes, seconds):
+        """
+            Count a file read by a tag reader
+            @param uri as str
+            @param read_bytes as int
+            @param seconds as float, time spent by reader
+        """
+        root = self.__get_root(uri)
+        if root is not None:
+            self.__roots[root][1] += 1
+            self.__roots[root][2] += read_bytes
+            self.__roots[root][3] += seconds
+
+    def finish(self):
+        """
+            Stop scan timer
+        """
+        self.__elapsed = time() - self.__start
+
+    def get_report(self):
+        """
+            Get a printable report
+            @return str
+        """
+        elapsed = self.__elapsed
+        if elapsed is None:
+            elapsed = time() - self.__start
+        lines = ["Scan: %.2fs" % elapsed]
+        for phase in self.PHASES:
+            lines.append("  %-18s %8.2fs" % (phase, self.__times[phase]))
+        for (root, (found, read, read_bytes, seconds)) in sorted(
+                                                     self.__roots.items()):
+            if seconds > 0:
+                rate = read / seconds
+                mb_rate = read_bytes / 1048576 / seconds
+            else:
+                rate = mb_rate = 0
+            lines.append("%s: %s files found, %s files read, %.1f MB read, "
+                         "%.1f files/s, %.1f MB/s per reader" % (
+                             root, found, read,
+                             read_bytes / 1048576, rate, mb_rate))
+        return "\n".join(lines)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_root(self, uri):
+        """
+            Get root for uri
+            @param uri as str
+            @return str/None
+        """
+        for root in self.__roots.keys():
+            if uri.startswith(root):
+                return root
+        return None
@@ -0,0 +1,128 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from threading import Lock
+from time import time, sleep
+
+from lollypop.define import Lp
+from lollypop.utils import get_mount
+
+
+class ScanThrottle:
+    """
+        Limit tag reading bandwidth of a low priority scan while player
+        plays from the same mount, reading is not limited otherwise
+    """
+    # Minimal delay between two files while player reads from same mount
+    __BACKOFF_DELAY = 0.2
+    # Player state is checked at this interval
+    __PLAYER_INTERVAL = 1
+
+    def __init__(self, rate):
+        """
+            Init throttle
+            @param rate as int, max bytes read by second while player reads
+                        from same mount, 0 for no limit
+        """
+        self.__rate = rate
+        self.__lock = Lock()
+        self.__stopped = False
+        # Next item may be read at this time
+        self.__next = 0
+        # Mount being read by player: (mount, check time)
+        self.__player = (None, 0)
+        self.__mounts = {}
+
+    def items(self, items):
+        """
+            Yield items when allowed to read them
+            @param items as [(uri as str, mtime as int)]
+            @return iterator of (uri as str, mtime as int)
+        """
+        for item in items:
+            self.__wait()
+            if self.__stopped:
+                return
+            yield item
+
+    def add(self, uri, read_bytes):
+        """
+            Account bytes read for uri
+            @param uri as str
+            @param read_bytes as int
+        """
+        (rate, delay) = self.__get_limits(uri)
+        with self.__lock:
+            self.__next = max(self.__next, time()) + delay
+            if rate > 0:
+                self.__next += read_bytes / rate
+
+    def stop(self):
+        """
+            Stop waiting, no more items are yielded
+        """
+        self.__stopped = True
+
+#######################
+# PRIVATE             #
+#######################
+    def __wait(self):
+        """
+            Wait until next item may be read
+        """
+        while not self.__stopped:
+            with self.__lock:
+                delay = self.__next - time()
+            if delay <= 0:
+                break
+            # Stay responsive to stop() and player changes
+            sleep(min(delay, 0.1))
+
+    def __get_limits(self, uri):
+        """
+            Get rate and delay to use after reading uri
+            @param uri as str
+            @return (rate as float, delay as float)
+        """
+        if self.__is_player_reading(uri):
+            return (self.__rate, self.__BACKOFF_DELAY)
+        return (0, 0)
+
+    def __is_player_reading(self, uri):
+        """
+            True if player is reading from uri mount
+            @param uri as str
+            @return bool
+        """
+        (player_mount, checked) = self.__player
+        if time() - checked > self.__PLAYER_INTERVAL:
+            player_mount = None
+            try:
+                if Lp().player is not None and Lp().player.is_playing():
+                    player_mount = self.__get_mount(
+                                            Lp().player.current_track.uri)
+            except Exception as e:
+                print("ScanThrottle::__is_player_reading():", e)
+            self.__player = (player_mount, time())
+        return player_mount is not None and\
+            player_mount == self.__get_mount(uri)
+
+    def __get_mount(self, uri):
+        """
+            Get mount for uri, cached by directory
+            @param uri as str
+            @return object/None (see utils.get_mount())
+        """
+        parent = uri.rsplit("/", 1)[0]
+        if parent not in self.__mounts.keys():
+            self.__mounts[parent] = get_mount(parent)
+        return self.__mounts[parent]
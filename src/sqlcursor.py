@@ -11,7 +11,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from threading import current_thread
+from threading import current_thread, Lock
+import sqlite3
 
 from lollypop.define import Lp
 
@@ -19,15 +20,100 @@ from lollypop.define import Lp
 class SqlCursor:
     """
         Context manager to get the SQL cursor
+        Connections are taken from a pool by database and given back
+        on exit, so they keep their prepared statements cache
+        Databases use WAL journal: readers do not wait for writer,
+        writers are serialized by SQLite
     """
+    # Idle connections by database class name
+    __pools = {}
+    __lock = Lock()
+    # Idle connections kept by database
+    __POOL_SIZE = 4
+    # Prepared statements cached by connection
+    __STATEMENTS = 256
+    # Filters on more values use a temporary table, see get_filter()
+    __FILTER_SIZE = 100
+
+    @staticmethod
+    def connect(path):
+        """
+            Open a connection usable by pool
+            @param path as str
+            @return sqlite3.Connection
+        """
+        # Connection is only used by one thread at a time
+        sql = sqlite3.connect(path, 600.0,
+                              check_same_thread=False,
+                              cached_statements=SqlCursor.__STATEMENTS)
+        sql.execute("PRAGMA journal_mode=WAL")
+        sql.execute("PRAGMA synchronous=NORMAL")
+        return sql
+
+    @staticmethod
+    def get_filter(sql, column, values):
+        """
+            Get a request matching column against values
+            Small sets are bound in an IN list, large sets are loaded
+            in an indexed temporary table
+            @param sql as sqlite3.Connection, request must use it
+            @param column as str, like "track_genres.genre_id"
+            @param values as [int]
+            @return (request as str, filters as tuple)
+        """
+        values = list(dict.fromkeys(values))
+        if not values:
+            return ("1=0", ())
+        if len(values) <= SqlCursor.__FILTER_SIZE:
+            return ("%s IN (%s)" % (column, ",".join("?" * len(values))),
+                    tuple(values))
+        table = "tmp_filter_%s" % column.replace(".", "_")
+        SqlCursor.set_temp_table(sql, table, "value INTEGER PRIMARY KEY",
+                                 values)
+        return ("%s IN (SELECT value FROM %s)" % (column, table), ())
+
+    @staticmethod
+    def set_temp_table(sql, table, column, values):
+        """
+            Fill a one column temporary table, create it if needed
+            Transaction opened to fill it is ended if not started by caller:
+            connection would keep an outdated snapshot of database
+            @param sql as sqlite3.Connection
+            @param table as str
+            @param column as str, column definition
+            @param values as iterable
+        """
+        in_transaction = sql.in_transaction
+        sql.execute("CREATE TEMP TABLE IF NOT EXISTS %s (%s)" %
+                    (table, column))
+        sql.execute("DELETE FROM %s" % table)
+        sql.executemany("INSERT OR IGNORE INTO %s VALUES (?)" % table,
+                        [(value,) for value in values])
+        # Only temporary table has been written
+        if not in_transaction:
+            sql.commit()
+
+    @staticmethod
+    def clear(obj):
+        """
+            Close idle connections for database
+            @param obj as database object
+        """
+        with SqlCursor.__lock:
+            pool = SqlCursor.__pools.pop(obj.__class__.__name__, [])
+        for sql in pool:
+            sql.close()
+
+    @staticmethod
     def add(obj):
         """
             Add cursor to thread list
             Raise an exception if cursor already exists
         """
         name = current_thread().getName() + obj.__class__.__name__
-        Lp().cursors[name] = obj.get_cursor()
+        Lp().cursors[name] = SqlCursor.__acquire(obj)
 
+    @staticmethod
     def remove(obj):
         """
             Remove cursor to thread list
@@ -50,14 +136,51 @@ class SqlCursor:
         name = current_thread().getName() + self._obj.__class__.__name__
         if name not in Lp().cursors:
             self._creator = True
-            Lp().cursors[name] = self._obj.get_cursor()
+            Lp().cursors[name] = SqlCursor.__acquire(self._obj)
         return Lp().cursors[name]
 
     def __exit__(self, type, value, traceback):
         """
-            If creator, close cursor and remove it
+            If creator, give cursor back to pool and remove it
         """
         if self._creator:
             name = current_thread().getName() + self._obj.__class__.__name__
-            Lp().cursors[name].close()
-            del Lp().cursors[name]
+            SqlCursor.__release(self._obj, Lp().cursors.pop(name))
+
+#######################
+# PRIVATE             #
+#######################
+    @staticmethod
+    def __acquire(obj):
+        """
+            Get an idle connection for database, open one if none
+            @param obj as database object
+            @return sqlite3.Connection
+        """
+        with SqlCursor.__lock:
+            pool = SqlCursor.__pools.get(obj.__class__.__name__, [])
+            if pool:
+                return pool.pop()
+        return obj.get_cursor()
+
+    @staticmethod
+    def __release(obj, sql):
+        """
+            Give connection back to pool, uncommitted changes are dropped
+            as when connection was closed
+            @param obj as database object
+            @param sql as sqlite3.Connection
+        """
+        try:
+            if sql.in_transaction:
+                sql.rollback()
+        except Exception as e:
+            print("SqlCursor::__release():", e)
+            sql.close()
+            return
+        with SqlCursor.__lock:
+            pool = SqlCursor.__pools.setdefault(obj.__class__.__name__, [])
+            if len(pool) < SqlCursor.__POOL_SIZE:
+                pool.append(sql)
+                return
+        sql.close()
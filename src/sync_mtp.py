@@ -273,15 +273,14 @@ class MtpSync:
                     track_ids += Lp().albums.get_track_ids(album_id)
             else:
                 track_ids = Lp().playlists.get_track_ids(playlist)
+            track_ids = [track_id for track_id in track_ids
+                         if track_id is not None]
             # Start copying
-            for track_id in track_ids:
-                if track_id is None:
-                    continue
+            for track in Track.load_many(track_ids):
                 if not self._syncing:
                     self._fraction = 1.0
                     self.__in_thread = False
                     return
-                track = Track(track_id)
                 if track.uri.startswith("https:"):
                     continue
                 debug("MtpSync::__copy_to_device(): %s" % track.uri)
@@ -408,12 +407,11 @@ class MtpSync:
                 track_ids += Lp().playlists.get_track_ids(playlist)
 
         # Get tracks uris
-        for track_id in track_ids:
+        for track in Track.load_many(track_ids):
             if not self._syncing:
                 self._fraction = 1.0
                 self.__in_thread = False
                 return
-            track = Track(track_id)
             if track.uri.startswith("https:"):
                 continue
             album_name = escape(track.album_name.lower())
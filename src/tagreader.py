@@ -18,6 +18,7 @@ from gettext import gettext as _
 
 from lollypop.define import Lp
 from lollypop.utils import format_artist_name, decode_all
+from lollypop.utils import get_fingerprint
 from lollypop.lio import Lio
 
 
@@ -50,6 +51,501 @@ class Discoverer:
         return info
 
 
+class HeaderReader:
+    """
+        Read tags from container headers, without a GStreamer pipeline
+        Handles FLAC, Ogg Vorbis/Opus, MP3 with ID3v2 and MP4 files
+        Fields are named like GStreamer tags
+    """
+    # Bigger metadata blocks (artwork) are skipped
+    __MAX_BLOCK = 1048576
+    # Max bytes read to get Ogg header packets
+    __MAX_OGG = 4194304
+    # Bytes read at end of Ogg files to find last granule position
+    __OGG_TAIL = 65536
+    # Bytes searched for first MPEG audio frame after ID3v2 tag
+    __MP3_SYNC = 65536
+    __VORBIS = {"TITLE": "title",
+                "ARTIST": "artist",
+                "COMPOSER": "composer",
+                "PERFORMER": "performer",
+                "ARTISTSORT": "artist-sortname",
+                "ALBUMARTISTSORT": "album-artist-sortname",
+                "ALBUMARTIST": "album-artist",
+                "ALBUM ARTIST": "album-artist",
+                "ALBUM": "album",
+                "GENRE": "genre",
+                "DISCNUMBER": "album-disc-number",
+                "TRACKNUMBER": "track-number",
+                "DATE": "date",
+                "LYRICS": "lyrics",
+                "UNSYNCEDLYRICS": "lyrics"}
+    __ID3 = {"TIT2": "title", "TT2": "title",
+             "TPE1": "artist", "TP1": "artist",
+             "TCOM": "composer", "TCM": "composer",
+             "TSOP": "artist-sortname", "TSP": "artist-sortname",
+             "TSO2": "album-artist-sortname",
+             "TPE2": "album-artist", "TP2": "album-artist",
+             "TALB": "album", "TAL": "album",
+             "TCON": "genre", "TCO": "genre",
+             "TPOS": "album-disc-number", "TPA": "album-disc-number",
+             "TRCK": "track-number", "TRK": "track-number",
+             "TDRC": "date", "TYER": "date", "TYE": "date",
+             "TDOR": "original-date",
+             "USLT": "lyrics", "ULT": "lyrics"}
+    __MP4 = {b"\xa9nam": "title",
+             b"\xa9ART": "artist",
+             b"\xa9wrt": "composer",
+             b"soar": "artist-sortname",
+             b"soaa": "album-artist-sortname",
+             b"aART": "album-artist",
+             b"\xa9alb": "album",
+             b"\xa9gen": "genre",
+             b"disk": "album-disc-number",
+             b"trkn": "track-number",
+             b"\xa9day": "date",
+             b"\xa9lyr": "lyrics"}
+    __MP3_BITRATES = {(3, 3): [0, 32, 64, 96, 128, 160, 192, 224,
+                               256, 288, 320, 352, 384, 416, 448],
+                      (3, 2): [0, 32, 48, 56, 64, 80, 96, 112,
+                               128, 160, 192, 224, 256, 320, 384],
+                      (3, 1): [0, 32, 40, 48, 56, 64, 80, 96,
+                               112, 128, 160, 192, 224, 256, 320],
+                      (2, 3): [0, 32, 48, 56, 64, 80, 96, 112,
+                               128, 144, 160, 176, 192, 224, 256],
+                      (2, 2): [0, 8, 16, 24, 32, 40, 48, 56,
+                               64, 80, 96, 112, 128, 144, 160],
+                      (2, 1): [0, 8, 16, 24, 32, 40, 48, 56,
+                               64, 80, 96, 112, 128, 144, 160]}
+    __MP3_RATES = {3: [44100, 48000, 32000],
+                   2: [22050, 24000, 16000],
+                   0: [11025, 12000, 8000]}
+
+    def read(self, path):
+        """
+            Read fields for file at path
+            @param path as str
+            @return {field as str: [value as str]} or None if unsupported
+            Durations are in seconds in "duration" field
+        """
+        with open(path, "rb") as f:
+            head = f.read(12)
+            if head[:4] == b"OggS":
+                return self.__read_ogg(f)
+            elif head[4:8] == b"ftyp":
+                return self.__read_mp4(f)
+            elif head[:4] == b"fLaC":
+                return self.__read_flac(f, 0)
+            elif head[:3] == b"ID3":
+                fields = {}
+                end = self.__read_id3(f, fields)
+                if end is None:
+                    return None
+                f.seek(end)
+                if f.read(4) == b"fLaC":
+                    return self.__read_flac(f, end)
+                duration = self.__get_mp3_duration(f, end)
+                if duration is None:
+                    return None
+                fields["duration"] = duration
+                return fields
+        return None
+
+#######################
+# PRIVATE             #
+#######################
+    def __add(self, fields, field, value):
+        """
+            Add value to field
+            @param fields as {str: [str]}
+            @param field as str
+            @param value as str
+        """
+        if field in fields:
+            fields[field].append(value)
+        else:
+            fields[field] = [value]
+
+    def __read_vorbis_comment(self, data, fields):
+        """
+            Read a vorbis comment block
+            @param data as bytes
+            @param fields as {str: [str]}
+        """
+        vendor_length = int.from_bytes(data[0:4], "little")
+        pos = 4 + vendor_length
+        count = int.from_bytes(data[pos:pos+4], "little")
+        pos += 4
+        for i in range(0, count):
+            length = int.from_bytes(data[pos:pos+4], "little")
+            pos += 4
+            comment = data[pos:pos+length].decode("utf-8", "replace")
+            pos += length
+            if "=" not in comment:
+                continue
+            (key, value) = comment.split("=", 1)
+            key = key.upper()
+            if key in self.__VORBIS.keys():
+                self.__add(fields, self.__VORBIS[key], value)
+            else:
+                self.__add(fields, "extended-comment", "%s=%s" %
+                           (key, value))
+
+    def __read_flac(self, f, start):
+        """
+            Read FLAC metadata blocks
+            @param f as file
+            @param start as int, "fLaC" position
+            @return fields as {str: [str]} or None
+        """
+        fields = {}
+        pos = start + 4
+        last = False
+        while not last:
+            f.seek(pos)
+            header = f.read(4)
+            if len(header) != 4:
+                return None
+            last = header[0] & 0x80
+            block_type = header[0] & 0x7f
+            length = int.from_bytes(header[1:4], "big")
+            pos += 4 + length
+            if length > self.__MAX_BLOCK:
+                continue
+            # STREAMINFO
+            if block_type == 0:
+                v = int.from_bytes(f.read(length)[10:18], "big")
+                rate = v >> 44
+                samples = v & 0xfffffffff
+                if rate:
+                    fields["duration"] = samples / rate
+            # VORBIS_COMMENT
+            elif block_type == 4:
+                self.__read_vorbis_comment(f.read(length), fields)
+        if "duration" not in fields.keys():
+            return None
+        return fields
+
+    def __read_ogg(self, f):
+        """
+            Read Ogg Vorbis/Opus headers
+            @param f as file
+            @return fields as {str: [str]} or None
+        """
+        packets = []
+        packet = b""
+        serial = None
+        pos = 0
+        while len(packets) < 2:
+            if pos > self.__MAX_OGG:
+                return None
+            f.seek(pos)
+            header = f.read(27)
+            if len(header) != 27 or header[:4] != b"OggS":
+                return None
+            segments = f.read(header[26])
+            length = sum(segments)
+            pos += 27 + header[26] + length
+            if serial is None:
+                serial = header[14:18]
+            elif header[14:18] != serial:
+                continue
+            data = f.read(length)
+            offset = 0
+            for segment in segments:
+                packet += data[offset:offset+segment]
+                offset += segment
+                if segment < 255:
+                    packets.append(packet)
+                    packet = b""
+        (ident, comment) = packets[0:2]
+        fields = {}
+        if ident[:7] == b"\x01vorbis" and comment[:7] == b"\x03vorbis":
+            rate = int.from_bytes(ident[12:16], "little")
+            pre_skip = 0
+            self.__read_vorbis_comment(comment[7:], fields)
+        elif ident[:8] == b"OpusHead" and comment[:8] == b"OpusTags":
+            rate = 48000
+            pre_skip = int.from_bytes(ident[10:12], "little")
+            self.__read_vorbis_comment(comment[8:], fields)
+        else:
+            return None
+        # Duration from last page granule position
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(max(0, size - self.__OGG_TAIL))
+        tail = f.read()
+        index = tail.rfind(b"OggS")
+        while index != -1:
+            page = tail[index:index+27]
+            granule = int.from_bytes(page[6:14], "little", signed=True)
+            if len(page) == 27 and page[14:18] == serial and granule >= 0:
+                fields["duration"] = max(0, granule - pre_skip) / rate
+                return fields
+            index = tail.rfind(b"OggS", 0, index)
+        return None
+
+    def __syncsafe(self, data):
+        """
+            Decode an ID3v2 syncsafe integer
+            @param data as bytes
+            @return int
+        """
+        value = 0
+        for byte in data:
+            value = (value << 7) | (byte & 0x7f)
+        return value
+
+    def __decode_id3_text(self, data):
+        """
+            Decode ID3v2 text frame content
+            @param data as bytes
+            @return [str]
+        """
+        encoding = data[0]
+        data = data[1:]
+        if encoding in [1, 2]:
+            # Split on UTF-16 null chars
+            values = []
+            start = 0
+            for i in range(0, len(data) - 1, 2):
+                if data[i:i+2] == b"\x00\x00":
+                    values.append(data[start:i])
+                    start = i + 2
+            values.append(data[start:])
+            codec = "utf-16" if encoding == 1 else "utf-16-be"
+        else:
+            values = data.split(b"\x00")
+            codec = "latin-1" if encoding == 0 else "utf-8"
+        return [value.decode(codec, "replace") for value in values if value]
+
+    def __read_id3(self, f, fields):
+        """
+            Read ID3v2 tag at file start
+            @param f as file
+            @param fields as {str: [str]}
+            @return tag end as int or None if unsupported
+        """
+        f.seek(0)
+        header = f.read(10)
+        major = header[3]
+        flags = header[5]
+        end = 10 + self.__syncsafe(header[6:10])
+        if flags & 0x10:
+            end += 10
+        # Whole tag unsynchronisation (ID3v2.2/2.3)
+        if major not in [2, 3, 4] or (major < 4 and flags & 0x80):
+            return None
+        pos = 10
+        if flags & 0x40 and major == 3:
+            pos += 4 + int.from_bytes(f.read(4), "big")
+        elif flags & 0x40 and major == 4:
+            pos += self.__syncsafe(f.read(4))
+        (id_size, header_size) = (3, 6) if major == 2 else (4, 10)
+        while pos + header_size < end:
+            f.seek(pos)
+            frame = f.read(header_size)
+            if frame[0] == 0:
+                break
+            frame_id = frame[:id_size].decode("latin-1")
+            if major == 2:
+                size = int.from_bytes(frame[3:6], "big")
+                frame_flags = 0
+            elif major == 3:
+                size = int.from_bytes(frame[4:8], "big")
+                # Compression, encryption
+                frame_flags = 0x0c if frame[9] & 0xc0 else 0
+            else:
+                size = self.__syncsafe(frame[4:8])
+                frame_flags = frame[9]
+            pos += header_size + size
+            if frame_id not in self.__ID3.keys() and\
+                    frame_id not in ["TXXX", "TXX"]:
+                continue
+            # Compressed or encrypted frames are not handled
+            if size > self.__MAX_BLOCK or frame_flags & 0x0c:
+                return None
+            data = f.read(size)
+            if frame_flags & 0x02:
+                data = data.replace(b"\xff\x00", b"\xff")
+            if frame_flags & 0x01:
+                data = data[4:]
+            if not data:
+                continue
+            # Skip language, keep content descriptor and text
+            if frame_id in ["USLT", "ULT"]:
+                data = data[0:1] + data[4:]
+            values = self.__decode_id3_text(data)
+            if frame_id in ["TXXX", "TXX"]:
+                if len(values) > 1:
+                    self.__add(fields, "extended-comment",
+                               "%s=%s" % (values[0], values[1]))
+                continue
+            field = self.__ID3[frame_id]
+            if field == "lyrics":
+                values = values[-1:]
+            for value in values:
+                # Genre references to ID3v1 table are not handled
+                if field == "genre" and match(r"^\([0-9]+\)|^[0-9]+$", value):
+                    return None
+                self.__add(fields, field, value)
+        return end
+
+    def __get_mp3_duration(self, f, start):
+        """
+            Get MP3 duration from first frame (Xing/Info/VBRI or CBR)
+            @param f as file
+            @param start as int, audio start
+            @return duration in seconds as float or None
+        """
+        f.seek(start)
+        data = f.read(self.__MP3_SYNC)
+        index = data.find(b"\xff")
+        while index != -1 and index + 4 <= len(data):
+            b1 = data[index+1]
+            b2 = data[index+2]
+            b3 = data[index+3]
+            version = (b1 >> 3) & 3
+            layer = (b1 >> 1) & 3
+            bitrate_index = b2 >> 4
+            rate_index = (b2 >> 2) & 3
+            if b1 & 0xe0 == 0xe0 and version != 1 and layer != 0 and\
+                    bitrate_index not in [0, 15] and rate_index != 3:
+                break
+            index = data.find(b"\xff", index + 1)
+        else:
+            return None
+        frame = data[index:]
+        key = (3 if version == 3 else 2, layer)
+        bitrate = self.__MP3_BITRATES[key][bitrate_index] * 1000
+        rate = self.__MP3_RATES[version][rate_index]
+        if layer == 3:
+            samples = 384
+        elif layer == 1 and version != 3:
+            samples = 576
+        else:
+            samples = 1152
+        mono = b3 >> 6 == 3
+        if version == 3:
+            offset = 4 + (17 if mono else 32)
+        else:
+            offset = 4 + (9 if mono else 17)
+        if frame[offset:offset+4] in [b"Xing", b"Info"]:
+            flags = int.from_bytes(frame[offset+4:offset+8], "big")
+            if flags & 1:
+                frames = int.from_bytes(frame[offset+8:offset+12], "big")
+                return frames * samples / rate
+        if frame[36:40] == b"VBRI":
+            frames = int.from_bytes(frame[50:54], "big")
+            return frames * samples / rate
+        # Constant bitrate
+        f.seek(-128, 2)
+        size = f.tell() + 128
+        if f.read(3) == b"TAG":
+            size -= 128
+        return (size - start - index) * 8 / bitrate
+
+    def __mp4_atoms(self, f, start, end):
+        """
+            Iterate over MP4 atoms
+            @param f as file
+            @param start as int
+            @param end as int
+            @return iterator of (type as bytes, data start as int,
+                                 data end as int)
+        """
+        pos = start
+        while pos + 8 <= end:
+            f.seek(pos)
+            header = f.read(8)
+            if len(header) != 8:
+                return
+            size = int.from_bytes(header[:4], "big")
+            header_size = 8
+            if size == 1:
+                size = int.from_bytes(f.read(8), "big")
+                header_size = 16
+            elif size == 0:
+                size = end - pos
+            if size < header_size:
+                return
+            yield (header[4:8], pos + header_size, pos + size)
+            pos += size
+
+    def __read_mp4(self, f):
+        """
+            Read MP4 moov atom
+            @param f as file
+            @return fields as {str: [str]} or None
+        """
+        f.seek(0, 2)
+        size = f.tell()
+        fields = {}
+        for (atom, start, end) in self.__mp4_atoms(f, 0, size):
+            if atom != b"moov":
+                continue
+            for (atom, start, end) in self.__mp4_atoms(f, start, end):
+                if atom == b"mvhd":
+                    f.seek(start)
+                    data = f.read(32)
+                    if data[0] == 1:
+                        timescale = int.from_bytes(data[20:24], "big")
+                        duration = int.from_bytes(data[24:32], "big")
+                    else:
+                        timescale = int.from_bytes(data[12:16], "big")
+                        duration = int.from_bytes(data[16:20], "big")
+                    if timescale:
+                        fields["duration"] = duration / timescale
+                elif atom == b"udta":
+                    for (atom, start, end) in self.__mp4_atoms(f, start, end):
+                        if atom != b"meta":
+                            continue
+                        # meta is a full atom, except in QuickTime files
+                        f.seek(start)
+                        if f.read(8)[4:8] != b"hdlr":
+                            start += 4
+                        for (atom, start, end) in self.__mp4_atoms(f,
+                                                                   start,
+                                                                   end):
+                            if atom == b"ilst" and\
+                                    not self.__read_ilst(f, start,
+                                                         end, fields):
+                                return None
+            break
+        if "duration" not in fields.keys():
+            return None
+        return fields
+
+    def __read_ilst(self, f, start, end, fields):
+        """
+            Read MP4 ilst atom
+            @param f as file
+            @param start as int
+            @param end as int
+            @param fields as {str: [str]}
+            @return False if unsupported
+        """
+        for (item, start, end) in self.__mp4_atoms(f, start, end):
+            # Genre references to ID3v1 table are not handled
+            if item == b"gnre":
+                return False
+            if item not in self.__MP4.keys():
+                continue
+            field = self.__MP4[item]
+            for (atom, start, end) in self.__mp4_atoms(f, start, end):
+                if atom != b"data" or end - start > self.__MAX_BLOCK:
+                    continue
+                f.seek(start)
+                data = f.read(end - start)
+                value = data[8:]
+                if item in [b"trkn", b"disk"]:
+                    value = str(int.from_bytes(value[2:4], "big"))
+                else:
+                    value = value.decode("utf-8", "replace")
+                self.__add(fields, field, value)
+        return True
+
+
 class TagReader(Discoverer):
     """
         Scanner tag reader
@@ -60,6 +556,38 @@ class TagReader(Discoverer):
             Init tag reader
         """
         Discoverer.__init__(self)
+        self.__header_reader = HeaderReader()
+
+    def read_tags(self, uri):
+        """
+            Read all tags needed by collection scanner for uri
+            Result only contains python types, so it can be sent
+            to another process
+            Container headers are parsed directly when possible,
+            discoverer is used for other files
+            @param uri as str
+            @return tags as {str: object}
+            @Exception GLib.Error
+        """
+        f = Lio.File.new_for_uri(uri)
+        path = f.get_path()
+        tags = None
+        fingerprint = None
+        if path is not None:
+            try:
+                fingerprint = get_fingerprint(path)
+            except Exception as e:
+                print("TagReader::read_tags():", e)
+            try:
+                fields = self.__header_reader.read(path)
+            except:  # Broken headers, let GStreamer handle them
+                fields = None
+            if fields is not None:
+                tags = self.__get_header_tags(f.get_basename(), fields)
+        if tags is None:
+            tags = self.__get_discoverer_tags(uri, f.get_basename())
+        tags["fingerprint"] = fingerprint
+        return tags
 
     def get_title(self, tags, filepath):
         """
@@ -244,15 +772,7 @@ class TagReader(Discoverer):
             return 0
         (exists, tracknumber) = tags.get_uint_index("track-number", 0)
         if not exists:
-            # Guess from filename
-            m = match("^([0-9]*)[ ]*-", filename)
-            if m:
-                try:
-                    tracknumber = int(m.group(1))
-                except:
-                    tracknumber = 0
-            else:
-                tracknumber = 0
+            tracknumber = self.__guess_tracknumber(filename)
         return tracknumber
 
     def get_year(self, tags):
@@ -320,6 +840,21 @@ class TagReader(Discoverer):
             year = get_ogg()
         return year
 
+    def get_comments(self, tags):
+        """
+            Return extended comments, lyrics excepted
+            @param tags as Gst.TagList
+            @return comments as str, one KEY=value by line
+        """
+        comments = []
+        if tags is None:
+            return ""
+        for i in range(tags.get_tag_size("extended-comment")):
+            (exists, read) = tags.get_string_index("extended-comment", i)
+            if exists and not read.startswith("LYRICS="):
+                comments.append(read)
+        return "\n".join(comments)
+
     def get_lyrics(self, tags):
         """
             Return lyrics for tags
@@ -531,3 +1066,119 @@ class TagReader(Discoverer):
             Lp().tracks.add_artist(track_id, artist_id)
         for genre_id in genre_ids:
             Lp().tracks.add_genre(track_id, genre_id, mtime)
+
+#######################
+# PRIVATE             #
+#######################
+    def __guess_tracknumber(self, filename):
+        """
+            Guess track number from filename
+            @param filename as str
+            @return track number as int
+        """
+        m = match("^([0-9]*)[ ]*-", filename)
+        if m:
+            try:
+                return int(m.group(1))
+            except:
+                pass
+        return 0
+
+    def __get_discoverer_tags(self, uri, name):
+        """
+            Same as read_tags() but with discoverer
+            @param uri as str
+            @param name as str
+            @return tags as {str: object}
+        """
+        info = self.get_info(uri)
+        tags = info.get_tags()
+        year = self.get_original_year(tags)
+        if year is None:
+            year = self.get_year(tags)
+        return {"name": name,
+                "title": self.get_title(tags, name),
+                "artists": self.get_artists(tags),
+                "composers": self.get_composers(tags),
+                "performers": self.get_performers(tags),
+                "a_sortnames": self.get_artist_sortnames(tags),
+                "aa_sortnames": self.get_album_artist_sortnames(tags),
+                "album_artists": self.get_album_artist(tags),
+                "album_name": self.get_album_name(tags),
+                "genres": self.get_genres(tags),
+                "discnumber": self.get_discnumber(tags),
+                "discname": self.get_discname(tags),
+                "tracknumber": self.get_tracknumber(tags, name),
+                "year": year,
+                "duration": int(info.get_duration()/1000000000),
+                "lyrics": self.get_lyrics(tags),
+                "comments": self.get_comments(tags)}
+
+    def __get_header_tags(self, name, fields):
+        """
+            Same as read_tags() but for HeaderReader fields
+            @param name as str
+            @param fields as {str: [str]}
+            @return tags as {str: object}
+        """
+        def get_values(field):
+            # We need to check tag is not just spaces
+            return [value for value in fields.get(field, [])
+                    if value.strip(" ")]
+
+        def get_first(field):
+            values = fields.get(field, [])
+            if values and values[0].strip(" "):
+                return values[0]
+            return None
+
+        def get_number(field):
+            m = match("^ *([0-9]+)", get_first(field) or "")
+            if m:
+                return int(m.group(1))
+            return None
+
+        def get_year(field):
+            m = match("^([0-9]{4})", get_first(field) or "")
+            if m:
+                return int(m.group(1))
+            return None
+
+        def get_comment(key):
+            for comment in fields.get("extended-comment", []):
+                if comment.startswith(key + "="):
+                    return comment[len(key) + 1:]
+            return None
+
+        genres = get_values("genre")
+        discname = get_comment("DISCSUBTITLE")
+        discnumber = get_number("album-disc-number")
+        tracknumber = get_number("track-number")
+        if tracknumber is None:
+            tracknumber = self.__guess_tracknumber(name)
+        year = get_year("original-date")
+        if year is None:
+            original_date = get_comment("ORIGINALDATE")
+            if original_date is not None and\
+                    match("^[0-9]{4}", original_date):
+                year = int(original_date[:4])
+            else:
+                year = get_year("date")
+        return {"name": name,
+                "title": get_first("title") or name,
+                "artists": "; ".join(get_values("artist")),
+                "composers": "; ".join(get_values("composer")),
+                "performers": "; ".join(get_values("performer")),
+                "a_sortnames": "; ".join(get_values("artist-sortname")),
+                "aa_sortnames": "; ".join(
+                                        get_values("album-artist-sortname")),
+                "album_artists": "; ".join(get_values("album-artist")),
+                "album_name": get_first("album") or _("Unknown"),
+                "genres": "; ".join(genres) if genres else _("Unknown"),
+                "discnumber": discnumber or 0,
+                "discname": discname or "",
+                "tracknumber": tracknumber,
+                "year": year,
+                "duration": int(fields["duration"]),
+                "lyrics": get_first("lyrics") or "",
+                "comments": "\n".join(fields.get("extended-comment", []))}
@@ -0,0 +1,202 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import gi
+gi.require_version("Gst", "1.0")
+gi.require_version("GstPbutils", "1.0")
+from gi.repository import Gst
+
+import gettext
+import multiprocessing
+from os import cpu_count, nice
+from queue import Queue
+from threading import Thread, Semaphore, Lock
+from time import time
+
+from lollypop.tagreader import TagReader
+from lollypop.utils import get_read_bytes
+
+
+# Tag reader of current worker process
+_reader = None
+
+
+def _init_worker(localedir, low_priority):
+    """
+        Init worker process
+        @param localedir as str
+        @param low_priority as bool
+    """
+    global _reader
+    if low_priority:
+        nice(19)
+    gettext.bindtextdomain("lollypop", localedir)
+    gettext.textdomain("lollypop")
+    Gst.init(None)
+    _reader = TagReader()
+
+
+def read_tags(reader, item):
+    """
+        Read tags with reader
+        @param reader as TagReader
+        @param item as (uri as str, mtime as int)
+        @return (uri as str, mtime as int, tags as {} or None,
+                 error as str or None, read bytes as int, seconds as float)
+    """
+    (uri, mtime) = item
+    read_bytes = get_read_bytes()
+    start = time()
+    try:
+        tags = reader.read_tags(uri)
+        error = None
+    except Exception as e:
+        tags = None
+        error = getattr(e, "message", str(e))
+    return (uri, mtime, tags, error,
+            get_read_bytes() - read_bytes, time() - start)
+
+
+def _read_tags(item):
+    """
+        Read tags in worker process
+        @param item as (uri as str, mtime as int)
+        @return see read_tags()
+    """
+    return read_tags(_reader, item)
+
+
+class TagReaderPool:
+    """
+        Read tags with a pool of worker processes,
+        each one running its own discoverer
+        Items are read by groups, each group with its own concurrency
+        limit, so a slow mount does not hold up others
+    """
+    # Seconds before an item is failed: a crashed worker is replaced
+    # by pool but its item is lost, so no callback will ever run
+    __TIMEOUT = 30
+
+    @staticmethod
+    def get_jobs(jobs):
+        """
+            Return jobs count to use
+            @param jobs as int, 0 for one job per cpu
+            @return int
+        """
+        if jobs <= 0:
+            jobs = cpu_count() or 1
+        return jobs
+
+    def __init__(self, jobs, low_priority=False):
+        """
+            Init pool
+            @param jobs as int
+            @param low_priority as bool, run workers with lowest priority
+        """
+        # Do not fork: GLib/GStreamer threads are running in parent
+        context = multiprocessing.get_context("spawn")
+        self.__stopped = False
+        self.__pool = context.Pool(jobs,
+                                   initializer=_init_worker,
+                                   initargs=(
+                                         gettext.bindtextdomain("lollypop"),
+                                         low_priority))
+
+    def read(self, groups):
+        """
+            Read tags for items, results are unordered
+            @param groups as [(items as iterable of (uri as str, mtime as int),
+                               limit as int)], limit is max items of group
+                               being read at once
+            @return iterator of results (see read_tags())
+        """
+        results = Queue()
+        for (items, limit) in groups:
+            thread = Thread(target=self.__feed,
+                            args=(items, limit, results))
+            thread.daemon = True
+            thread.start()
+        done = 0
+        while done < len(groups):
+            result = results.get()
+            if result is None:
+                done += 1
+            else:
+                yield result
+
+    def stop(self):
+        """
+            Stop workers, pending items are dropped
+        """
+        self.__stopped = True
+        self.__pool.terminate()
+        self.__pool.join()
+
+#######################
+# PRIVATE             #
+#######################
+    def __feed(self, items, limit, results):
+        """
+            Send items to workers, at most limit at once
+            @param items as iterable of (uri as str, mtime as int)
+            @param limit as int
+            @param results as Queue, None is put when group is done
+        """
+        semaphore = Semaphore(limit)
+        # Items being read by id, as (item, start time)
+        pending = {}
+        lock = Lock()
+
+        def on_result(item_id, result):
+            with lock:
+                if pending.pop(item_id, None) is None:
+                    return
+            results.put(result)
+            semaphore.release()
+
+        def acquire():
+            while not semaphore.acquire(timeout=0.1):
+                if self.__stopped:
+                    return False
+                with lock:
+                    timeouts = [(item_id, item)
+                                for (item_id, (item, start)) in
+                                pending.items()
+                                if time() - start > self.__TIMEOUT]
+                for (item_id, item) in timeouts:
+                    on_result(item_id, (item[0], item[1], None,
+                                        "Timeout reading tags", 0, 0))
+            return True
+
+        try:
+            item_id = 0
+            for item in items:
+                if not acquire() or self.__stopped:
+                    return
+                item_id += 1
+                with lock:
+                    pending[item_id] = (item, time())
+                self.__pool.apply_async(
+                    _read_tags, (item,),
+                    callback=lambda r, i=item_id: on_result(i, r),
+                    error_callback=lambda e, i=item_id, item=item: on_result(
+                                    i, (item[0], item[1], None, str(e), 0, 0)))
+            # Wait for pending items
+            for i in range(limit):
+                if not acquire():
+                    return
+        except Exception as e:  # Pool stopped or items failing
+            print("TagReaderPool::__feed():", e)
+        finally:
+            # Reader waits for it, whatever happened
+            results.put(None)
@@ -14,7 +14,10 @@ from gi.repository import Gio, GLib
 
 from gettext import gettext as _
 from threading import Thread
+from re import findall
 import unicodedata
+import hashlib
+import os
 
 from lollypop.define import Lp, Type, ENCODING
 from lollypop.objects import Track
@@ -53,6 +56,19 @@ def noaccents(string):
         return u"".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
 
+def get_search_query(string):
+    """
+        Get a full text search query matching names with words
+        starting like string words
+        @param string as str
+        @return str/None
+    """
+    words = findall(r"\w+", string)
+    if not words:
+        return None
+    return " ".join(['"%s"*' % word for word in words])
+
+
 def escape(str, ignore=["_", "-", " ", "."]):
     """
         Escape string
@@ -134,6 +150,38 @@ def is_pls(f):
     return False
 
 
+def get_fingerprint(path):
+    """
+        Return a cheap fingerprint for file, used to detect moved files:
+        size, mtime and a hash of first and last 64KB
+        @param path as str
+        @return str
+    """
+    size = 65536
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        md5 = hashlib.md5(f.read(size))
+        if stat.st_size > size:
+            f.seek(max(size, stat.st_size - size))
+            md5.update(f.read(size))
+    return "%s:%s:%s" % (stat.st_size, int(stat.st_mtime), md5.hexdigest())
+
+
+def get_read_bytes():
+    """
+        Return bytes read by current thread, 0 if unknown
+        @return int
+    """
+    try:
+        with open("/proc/thread-self/io", "r") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except:
+        pass
+    return 0
+
+
 def format_artist_name(name):
     """
         Return formated artist name
@@ -185,6 +233,39 @@ def is_readonly(uri):
     return not info.get_attribute_boolean("access::can-write")
 
 
+def get_mount(uri):
+    """
+        Get an id for uri mount: a device for local files,
+        scheme and host for others
+        @param uri as str
+        @return object/None
+    """
+    if uri.startswith("file://"):
+        try:
+            return os.stat(GLib.filename_from_uri(uri)[0]).st_dev
+        except:
+            return None
+    elif "://" in uri:
+        return "/".join(uri.split("/", 3)[:3])
+    return None
+
+
+def is_remote(uri):
+    """
+        True if uri is on a network filesystem
+        @param uri as str
+        @return bool
+    """
+    if not uri.startswith("file://"):
+        return True
+    try:
+        f = Lio.File.new_for_uri(uri)
+        info = f.query_filesystem_info("filesystem::remote", None)
+        return info.get_attribute_boolean("filesystem::remote")
+    except:
+        return False
+
+
 def is_loved(track_id):
     """
         Check if object is in loved playlist
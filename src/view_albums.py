@@ -19,6 +19,7 @@ from lollypop.widgets_album_simple import AlbumSimpleWidget
 from lollypop.pop_album import AlbumPopover
 from lollypop.view_artist_albums import ArtistAlbumsView
 from lollypop.define import ArtSize
+from lollypop.objects import Album
 
 
 class AlbumsView(LazyLoadingView):
@@ -58,9 +59,10 @@ class AlbumsView(LazyLoadingView):
     def populate(self, albums):
         """
             Populate albums
-            @param is compilation as bool
+            @param album ids as [int]
         """
-        GLib.idle_add(self.__add_albums, albums)
+        GLib.idle_add(self.__add_albums,
+                      Album.load_many(albums, self.__genre_ids))
 
 #######################
 # PROTECTED           #
@@ -82,14 +84,13 @@ class AlbumsView(LazyLoadingView):
         """
             Add albums to the view
             Start lazy loading
-            @param [album ids as int]
+            @param albums as [Album]
         """
         if self._stop:
             self._stop = False
             return
         if albums:
             widget = AlbumSimpleWidget(albums.pop(0),
-                                       self.__genre_ids,
                                        self.__artist_ids)
             widget.connect("overlayed", self._on_overlayed)
             self._box.insert(widget, -1)
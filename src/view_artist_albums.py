@@ -17,7 +17,7 @@ from gettext import gettext as _
 from lollypop.view import LazyLoadingView, View
 from lollypop.view_container import ViewContainer
 from lollypop.define import Lp, Type, ArtSize
-from lollypop.objects import Track
+from lollypop.objects import Album, Track
 from lollypop.widgets_album_detailed import AlbumDetailedWidget
 
 
@@ -70,7 +70,7 @@ class ArtistAlbumsView(LazyLoadingView):
         if albums:
             if len(albums) != 1:
                 self.__spinner.start()
-            self.__add_albums(albums)
+            self.__add_albums(Album.load_many(albums, self._genre_ids))
         else:
             label = Gtk.Label.new()
             string = GLib.markup_escape_text(_("Network access disabled"))
@@ -171,12 +171,10 @@ class ArtistAlbumsView(LazyLoadingView):
         """
             Pop an album and add it to the view,
             repeat operation until album list is empty
-            @param [album ids as int]
+            @param albums as [Album]
         """
         if albums and not self._stop:
-            album_id = albums.pop(0)
-            widget = AlbumDetailedWidget(album_id,
-                                         self._genre_ids,
+            widget = AlbumDetailedWidget(albums.pop(0),
                                          self._artist_ids,
                                          self.__art_size)
             widget.set_filter_func(self._filter_func)
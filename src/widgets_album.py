@@ -16,7 +16,6 @@ from gettext import gettext as _
 
 from lollypop.define import Lp, ArtSize
 from lollypop.define import Shuffle, Loading
-from lollypop.objects import Album
 from lollypop.pop_artwork import CoversPopover
 
 
@@ -313,12 +312,15 @@ class AlbumWidget(BaseWidget):
         Album widget
     """
 
-    def __init__(self, album_id, genre_ids, artist_ids, art_size):
+    def __init__(self, album, artist_ids, art_size):
         """
             Init Album widget
+            @param album as Album
+            @param artist ids as [int]
+            @param art size as ArtSize
         """
         BaseWidget.__init__(self)
-        self._album = Album(album_id, genre_ids)
+        self._album = album
         self._filter_ids = artist_ids
         self._art_size = art_size
         self.connect("destroy", self.__on_destroy)
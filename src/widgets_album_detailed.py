@@ -34,17 +34,16 @@ class AlbumDetailedWidget(Gtk.Bin, AlbumWidget):
         "overlayed": (GObject.SignalFlags.RUN_FIRST, None, (bool,))
     }
 
-    def __init__(self, album_id, genre_ids, artist_ids, art_size):
+    def __init__(self, album, artist_ids, art_size):
         """
             Init detailed album widget
-            @param album id as int
-            @param genre ids as [int]
+            @param album as Album
             @param artist ids as [int]
             @param lazy as LazyLoadingView
             @param art size as ArtSize
         """
         Gtk.Bin.__init__(self)
-        AlbumWidget.__init__(self, album_id, genre_ids, artist_ids, art_size)
+        AlbumWidget.__init__(self, album, artist_ids, art_size)
         self._rounded_class = "rounded-icon-small"
         self._album.set_artists(artist_ids)
         self.__width = None
@@ -443,7 +442,7 @@ class AlbumDetailedWidget(Gtk.Bin, AlbumWidget):
     def __add_tracks(self, tracks, widget, disc_number, i):
         """
             Add tracks for to tracks widget
-            @param tracks as [int]
+            @param tracks as [Track]
             @param widget as TracksWidget
             @param disc number as int
             @param i as int
@@ -467,7 +466,7 @@ class AlbumDetailedWidget(Gtk.Bin, AlbumWidget):
         else:
             track_number = track.number
 
-        row = TrackRow(track.id, track_number)
+        row = TrackRow(track, track_number)
         row.show()
         widget[disc_number].add(row)
         GLib.idle_add(self.__add_tracks, tracks, widget, disc_number, i + 1)
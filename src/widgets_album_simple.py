@@ -28,19 +28,17 @@ class AlbumSimpleWidget(Gtk.FlowBoxChild, AlbumWidget):
         "overlayed": (GObject.SignalFlags.RUN_FIRST, None, (bool,))
     }
 
-    def __init__(self, album_id, genre_ids, artist_ids):
+    def __init__(self, album, artist_ids):
         """
             Init simple album widget
-            @param album id as int
-            @param genre ids as [int]
+            @param album as Album
             @param artist_ids as [int]
         """
         # We do not use Gtk.Builder for speed reasons
         Gtk.FlowBoxChild.__init__(self)
         self.set_size_request(ArtSize.BIG, ArtSize.BIG)
         self.get_style_context().add_class("loading")
-        AlbumWidget.__init__(self, album_id, genre_ids,
-                             artist_ids, ArtSize.BIG)
+        AlbumWidget.__init__(self, album, artist_ids, ArtSize.BIG)
 
     def populate(self):
         """
@@ -141,7 +141,7 @@ class PlaylistsWidget(Gtk.Grid):
         self.__width = None
         self.__tracks_left = list(tracks)
         GLib.idle_add(self.__add_tracks,
-                      tracks,
+                      Track.load_many(tracks),
                       self.__tracks_widget_left,
                       pos)
 
@@ -161,7 +161,7 @@ class PlaylistsWidget(Gtk.Grid):
             # We reset width here to allow size allocation code to run
             self.__width = None
             GLib.idle_add(self.__add_tracks,
-                          tracks,
+                          Track.load_many(tracks),
                           self.__tracks_widget_right,
                           pos)
 
@@ -236,7 +236,7 @@ class PlaylistsWidget(Gtk.Grid):
     def __add_tracks(self, tracks, widget, pos, previous_album_id=None):
         """
             Add tracks to list
-            @param tracks id as array of [int]
+            @param tracks as [Track]
             @param widget TracksWidget
             @param track position as int
             @param pos as int
@@ -255,8 +255,8 @@ class PlaylistsWidget(Gtk.Grid):
             self.__locked_widget_right = False
             return
 
-        track = Track(tracks.pop(0))
-        row = PlaylistRow(track.id, pos,
+        track = tracks.pop(0)
+        row = PlaylistRow(track, pos,
                           track.album.id != previous_album_id)
         row.connect("track-moved", self.__on_track_moved)
         row.show()
@@ -376,7 +376,7 @@ class PlaylistsWidget(Gtk.Grid):
                          GLib.markup_escape_text(", ".join(src_track.artists)),
                          name)
             self.__tracks_left.insert(index, src_track.id)
-        row = PlaylistRow(src_track.id,
+        row = PlaylistRow(src_track,
                           index,
                           index == 0 or
                           src_track.album.id != prev_track.album.id)
@@ -25,24 +25,26 @@ class Row(Gtk.ListBoxRow):
     """
         A row
     """
-    def __init__(self, rowid, num):
+    def __init__(self, track, num):
         """
             Init row widgets
-            @param rowid as int
+            @param track as Track
             @param num as int
             @param show loved as bool
         """
         # We do not use Gtk.Builder for speed reasons
         Gtk.ListBoxRow.__init__(self)
         self._artists_label = None
-        self._track = Track(rowid)
+        self._track = track
         self.__number = num
         self.__preview_timeout_id = None
         self.__context_timeout_id = None
         self.__context = None
         self._indicator = IndicatorWidget(self._track.id)
         self.set_indicator(Lp().player.current_track.id == self._track.id,
-                           utils.is_loved(self._track.id))
+                           False)
+        Lp().db_async.run(utils.is_loved, (self._track.id,),
+                          self.__on_loved, self)
         self._row_widget = Gtk.EventBox()
         self._row_widget.connect("button-press-event", self.__on_button_press)
         self._row_widget.connect("enter-notify-event", self.__on_enter_notify)
@@ -180,6 +182,14 @@ class Row(Gtk.ListBoxRow):
         self.set_indicator(True, False)
         self.__preview_timeout_id = None
 
+    def __on_loved(self, loved):
+        """
+            Update indicator
+            @param loved as bool
+        """
+        self.set_indicator(Lp().player.current_track.id == self._track.id,
+                           loved)
+
     def __on_map(self, widget):
         """
             Fix for Gtk < 3.18,
@@ -344,14 +354,14 @@ class PlaylistRow(Row):
         "track-moved": (GObject.SignalFlags.RUN_FIRST, None, (int, int, bool))
     }
 
-    def __init__(self, rowid, num, show_headers):
+    def __init__(self, track, num, show_headers):
         """
             Init row widget
-            @param rowid as int
+            @param track as Track
             @param num as int
             @param show headers as bool
         """
-        Row.__init__(self, rowid, num)
+        Row.__init__(self, track, num)
         self.__parent_filter = False
         self.__show_headers = show_headers
         self._indicator.set_margin_start(5)
@@ -403,8 +413,6 @@ class PlaylistRow(Row):
         self._duration_label.set_property("valign", Gtk.Align.END)
         self._indicator.set_property("valign", Gtk.Align.END)
         self._grid.attach(self.__header, 1, 0, 4, 1)
-        self.set_indicator(Lp().player.current_track.id == self._track.id,
-                           utils.is_loved(self._track.id))
         self.show_headers(self.__show_headers)
         self.drag_source_set(Gdk.ModifierType.BUTTON1_MASK, [],
                              Gdk.DragAction.MOVE)
@@ -565,13 +573,13 @@ class TrackRow(Row):
             height = menu_height
         return height
 
-    def __init__(self, rowid, num):
+    def __init__(self, track, num):
         """
             Init row widget and show it
-            @param rowid as int
+            @param track as Track
             @param num as int
         """
-        Row.__init__(self, rowid, num)
+        Row.__init__(self, track, num)
         self.__parent_filter = False
         self._grid.insert_column(0)
         self._grid.attach(self._indicator, 0, 0, 1, 1)
@@ -488,7 +488,9 @@ class Window(Gtk.ApplicationWindow, Container):
             Run scanner on realize
             @param widget as Gtk.Widget
         """
-        if Lp().settings.get_value("auto-update") or Lp().tracks.is_empty():
+        if Lp().settings.get_value("auto-update") or\
+                Lp().tracks.is_empty() or\
+                Lp().scanner.is_interrupted():
             # Delayed, make python segfault on sys.exit() otherwise
             # No idea why, maybe scanner using Gstpbutils before Gstreamer
             # initialisation is finished...
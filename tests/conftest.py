@@ -0,0 +1,23 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import tempfile
+
+# Sources are installed as lollypop package, import them the same way.
+# sys.path is also used by tag reader worker processes
+__SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     os.pardir, "src")
+__PATH = tempfile.mkdtemp(prefix="lollypop-tests-")
+os.symlink(os.path.abspath(__SRC), os.path.join(__PATH, "lollypop"))
+sys.path.insert(0, __PATH)
@@ -0,0 +1,200 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import types
+
+import pytest
+
+pytest.importorskip("gi")
+import lollypop.database
+import lollypop.database_albums
+import lollypop.database_artists
+import lollypop.database_genres
+import lollypop.database_tracks
+import lollypop.objects
+import lollypop.sqlcursor
+from lollypop.database import Database
+from lollypop.database_albums import AlbumsDatabase
+from lollypop.database_artists import ArtistsDatabase
+from lollypop.database_genres import GenresDatabase
+from lollypop.database_tracks import TracksDatabase
+from lollypop.define import Type
+from lollypop.sqlcursor import SqlCursor
+
+
+class Value:
+    def __init__(self, value):
+        self.value = value
+
+    def get_int32(self):
+        return self.value
+
+
+class Art:
+    def __init__(self):
+        self.cleaned = []
+
+    def get_album_cache_name(self, album):
+        return "_".join(album.artists) + "_" + album.name + "_" + album.year
+
+    def clean_store(self, name):
+        self.cleaned.append(name)
+
+
+class Playlists:
+    def __init__(self):
+        self.removed = []
+
+    def remove_uris(self, uris):
+        self.removed += uris
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """
+        Application with an empty collection database
+    """
+    app = types.SimpleNamespace()
+    app.cursors = {}
+    app.settings = types.SimpleNamespace(get_value=lambda key: Value(100))
+    for module in [lollypop.sqlcursor, lollypop.objects, lollypop.database,
+                   lollypop.database_albums, lollypop.database_artists,
+                   lollypop.database_genres, lollypop.database_tracks]:
+        monkeypatch.setattr(module, "Lp", lambda: app)
+    # Do not run Database.__init__(), it creates user db
+    app.db = Database.__new__(Database)
+    app.db.DB_PATH = str(tmp_path / "lollypop.db")
+    app.albums = AlbumsDatabase()
+    app.artists = ArtistsDatabase()
+    app.genres = GenresDatabase()
+    app.tracks = TracksDatabase()
+    app.art = Art()
+    app.playlists = Playlists()
+    with SqlCursor(app.db) as sql:
+        for (name, value) in vars(Database).items():
+            if name.startswith("_Database__create"):
+                sql.execute(value)
+        sql.commit()
+    yield app
+    SqlCursor.clear(app.db)
+
+
+def add_album(sql, album_id, name, artist_ids, chart=False):
+    sql.execute("INSERT INTO albums (rowid, name, no_album_artist, year, uri,\
+                 popularity, rate, loved, synced, chart)\
+                 VALUES (?, ?, 0, 2001, '', 0, 0, 0, 0, ?)",
+                (album_id, name, chart))
+    for artist_id in artist_ids:
+        sql.execute("INSERT INTO album_artists (album_id, artist_id)\
+                     VALUES (?, ?)", (album_id, artist_id))
+
+
+def add_track(sql, track_id, album_id, artist_ids, genre_ids):
+    sql.execute("INSERT INTO tracks (rowid, name, uri, album_id, popularity,\
+                 rate, ltime) VALUES (?, '', ?, ?, 0, 0, 0)",
+                (track_id, "file:///%s" % track_id, album_id))
+    for artist_id in artist_ids:
+        sql.execute("INSERT INTO track_artists (track_id, artist_id)\
+                     VALUES (?, ?)", (track_id, artist_id))
+    for genre_id in genre_ids:
+        sql.execute("INSERT INTO track_genres (track_id, mtime, genre_id)\
+                     VALUES (?, 0, ?)", (track_id, genre_id))
+        sql.execute("INSERT INTO album_genres (album_id, mtime, genre_id)\
+                     SELECT ?, 0, ? WHERE NOT EXISTS (\
+                        SELECT 1 FROM album_genres\
+                        WHERE album_id=? AND genre_id=?)",
+                    (album_id, genre_id, album_id, genre_id))
+
+
+def get_ids(app, table, column="rowid"):
+    with SqlCursor(app.db) as sql:
+        result = sql.execute("SELECT %s FROM %s ORDER BY %s" %
+                             (column, table, column))
+        return [row[0] for row in result]
+
+
+@pytest.fixture
+def collection(app):
+    """
+        Two albums:
+        - X by A, track 1 (A, rock), track 2 (A and C, jazz)
+        - Y by B, track 3 (B, jazz)
+    """
+    with SqlCursor(app.db) as sql:
+        for (genre_id, name) in [(1, "rock"), (2, "jazz")]:
+            sql.execute("INSERT INTO genres (rowid, name) VALUES (?, ?)",
+                        (genre_id, name))
+        for (artist_id, name) in [(1, "A"), (2, "B"), (3, "C")]:
+            sql.execute("INSERT INTO artists (rowid, name, sortname)\
+                         VALUES (?, ?, ?)", (artist_id, name, name))
+        add_album(sql, 1, "X", [1])
+        add_track(sql, 1, 1, [1], [1])
+        add_track(sql, 2, 1, [1, 3], [2])
+        add_album(sql, 2, "Y", [2])
+        add_track(sql, 3, 2, [2], [2])
+        sql.commit()
+    return app
+
+
+def test_del_no_tracks(collection):
+    assert collection.db.del_tracks([]) == []
+    assert get_ids(collection, "tracks") == [1, 2, 3]
+
+
+def test_del_tracks(collection):
+    app = collection
+    # Cached values must be dropped
+    assert app.albums.get_name(2) == "Y"
+    assert app.artists.get_name(3) == "C"
+    art_files = app.db.del_tracks([2, 3, 3])
+    assert art_files == ["B_Y_2001"]
+    assert app.art.cleaned == ["B_Y_2001"]
+    assert sorted(app.playlists.removed) == ["file:///2", "file:///3"]
+    assert get_ids(app, "tracks") == [1]
+    assert get_ids(app, "track_artists", "track_id") == [1]
+    assert get_ids(app, "track_genres", "track_id") == [1]
+    assert get_ids(app, "albums") == [1]
+    assert get_ids(app, "album_artists", "album_id") == [1]
+    assert get_ids(app, "album_genres", "genre_id") == [1]
+    assert get_ids(app, "artists") == [1]
+    assert get_ids(app, "genres") == [1]
+    assert app.albums.get_name(2) != "Y"
+    assert app.artists.get_name(3) != "C"
+    with SqlCursor(app.db) as sql:
+        assert not sql.in_transaction
+
+
+def test_del_album_tracks(collection):
+    app = collection
+    assert app.db.del_tracks([1, 2]) == ["A_X_2001"]
+    assert get_ids(app, "albums") == [2]
+    assert get_ids(app, "artists") == [2]
+    assert get_ids(app, "genres") == [2]
+
+
+def test_del_chart_track(app):
+    with SqlCursor(app.db) as sql:
+        sql.execute("INSERT INTO genres (rowid, name) VALUES (1, 'rock')")
+        sql.execute("INSERT INTO genres (rowid, name) VALUES (?, 'charts')",
+                    (Type.CHARTS,))
+        sql.execute("INSERT INTO artists (rowid, name, sortname)\
+                     VALUES (1, 'A', 'A')")
+        add_album(sql, 1, "X", [1], True)
+        add_track(sql, 1, 1, [1], [1])
+        add_track(sql, 2, 1, [1], [Type.CHARTS])
+        sql.commit()
+    assert app.db.del_tracks([2]) == []
+    with SqlCursor(app.db) as sql:
+        result = sql.execute("SELECT chart FROM albums WHERE rowid=1")
+        assert result.fetchone()[0] == 0
+    assert get_ids(app, "album_genres", "genre_id") == [1]
+    assert get_ids(app, "genres") == [1]
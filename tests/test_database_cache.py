@@ -0,0 +1,109 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from lollypop.database_cache import DatabaseCache
+
+
+class Getter:
+    """
+        Count db reads
+    """
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+
+    def get_name(self, object_id):
+        self.calls.append(object_id)
+        return self.values.get(object_id, None)
+
+
+def test_hits():
+    cache = DatabaseCache(10)
+    getter = Getter({1: "a"})
+    assert cache.get(1, getter.get_name) == "a"
+    assert cache.get(1, getter.get_name) == "a"
+    assert getter.calls == [1]
+    assert cache.get_stats() == (1, 1, 1)
+
+
+def test_none_not_cached():
+    cache = DatabaseCache(10)
+    getter = Getter({})
+    assert cache.get(1, getter.get_name, "default") == "default"
+    assert cache.get(1, getter.get_name) is None
+    assert getter.calls == [1, 1]
+
+
+def test_lists_copied():
+    cache = DatabaseCache(10)
+    getter = Getter({1: [1, 2]})
+    cache.get(1, getter.get_name).append(3)
+    cache.get(1, getter.get_name).append(4)
+    assert cache.get(1, getter.get_name) == [1, 2]
+    assert getter.calls == [1]
+
+
+def test_lru_eviction():
+    cache = DatabaseCache(2)
+    getter = Getter({1: "a", 2: "b", 3: "c"})
+    cache.get(1, getter.get_name)
+    cache.get(2, getter.get_name)
+    # 1 is now most recently used, 2 is dropped
+    cache.get(1, getter.get_name)
+    cache.get(3, getter.get_name)
+    assert getter.calls == [1, 2, 3]
+    cache.get(1, getter.get_name)
+    cache.get(3, getter.get_name)
+    assert getter.calls == [1, 2, 3]
+    cache.get(2, getter.get_name)
+    assert getter.calls == [1, 2, 3, 2]
+    assert cache.get_stats()[2] == 2
+
+
+def test_disabled():
+    cache = DatabaseCache(0)
+    getter = Getter({1: "a"})
+    cache.get(1, getter.get_name)
+    cache.get(1, getter.get_name)
+    assert getter.calls == [1, 1]
+
+
+def test_invalidate():
+    cache = DatabaseCache(10)
+    getter = Getter({1: "a", 2: "b"})
+    cache.get(1, getter.get_name)
+    cache.get(2, getter.get_name)
+    getter.values[1] = "c"
+    cache.invalidate(1)
+    assert cache.get(1, getter.get_name) == "c"
+    assert cache.get(2, getter.get_name) == "b"
+    cache.clear()
+    assert cache.get(2, getter.get_name) == "b"
+    assert getter.calls == [1, 2, 1, 2]
+
+
+def test_invalidate_while_reading():
+    """
+        A value read before an invalidation must not be cached
+    """
+    cache = DatabaseCache(10)
+    getter = Getter({1: "old"})
+
+    def get_name(object_id):
+        value = getter.get_name(object_id)
+        # Another thread updates db and invalidates while reading
+        getter.values[object_id] = "new"
+        cache.invalidate(object_id)
+        return value
+    assert cache.get(1, get_name) == "old"
+    assert cache.get(1, getter.get_name) == "new"
+    assert getter.calls == [1, 1]
@@ -0,0 +1,139 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+pytest.importorskip("gi")
+from lollypop.database_popularity import PopularityStats
+
+
+class Table:
+    """
+        Popularity by rowid, loaded like db
+    """
+    def __init__(self, popularities):
+        self.popularities = popularities
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        top = sorted(self.popularities.items(),
+                     key=lambda x: x[1], reverse=True)
+        return dict(top[:100])
+
+    def update(self, stats, rowid, popularity):
+        self.popularities[rowid] = popularity
+        stats.update(rowid, popularity)
+
+    def remove(self, stats, rowid):
+        del self.popularities[rowid]
+        stats.remove(rowid)
+
+    def get_average(self):
+        top = self.load()
+        self.loads -= 1
+        return max(sum(top.values()) / len(top), 5)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """
+        Table with 200 items, popularity from 0 to 199
+    """
+    table = Table({rowid: rowid for rowid in range(200)})
+    monkeypatch.setattr(PopularityStats, "_PopularityStats__load",
+                        lambda stats: table.load())
+    return table
+
+
+def test_min_average(monkeypatch):
+    table = Table({1: 1, 2: 2})
+    monkeypatch.setattr(PopularityStats, "_PopularityStats__load",
+                        lambda stats: table.load())
+    stats = PopularityStats("tracks")
+    assert stats.get_average() == 5
+    table.update(stats, 3, 9)
+    assert stats.get_average() == 5
+    table.update(stats, 4, 100)
+    assert stats.get_average() == 112 / 4
+    assert table.loads == 1
+
+
+def test_incremental_update(table):
+    stats = PopularityStats("tracks")
+    assert stats.get_average() == table.get_average()
+    assert table.loads == 1
+    # Less popular than top items
+    table.update(stats, 10, 50)
+    # Enters top items
+    table.update(stats, 20, 500)
+    # Top item more popular
+    table.update(stats, 150, 300)
+    # New item
+    table.update(stats, 1000, 400)
+    assert stats.get_average() == table.get_average()
+    assert table.loads == 1
+
+
+def test_update_less_popular(table):
+    stats = PopularityStats("tracks")
+    stats.get_average()
+    # Top item less popular, another item may replace it
+    table.update(stats, 199, 0)
+    assert stats.get_average() == table.get_average()
+    assert table.loads == 2
+
+
+def test_update_not_loaded(table):
+    stats = PopularityStats("tracks")
+    table.update(stats, 10, 500)
+    assert stats.get_average() == table.get_average()
+    assert table.loads == 1
+
+
+def test_remove(table):
+    stats = PopularityStats("tracks")
+    stats.get_average()
+    # Not a top item
+    table.remove(stats, 10)
+    assert stats.get_average() == table.get_average()
+    assert table.loads == 1
+    # Top item
+    table.remove(stats, 199)
+    assert stats.get_average() == table.get_average()
+    assert table.loads == 2
+
+
+def test_reset(table):
+    stats = PopularityStats("tracks")
+    stats.get_average()
+    table.popularities = {1: 1000}
+    stats.reset()
+    assert stats.get_average() == 1000
+    assert table.loads == 2
+
+
+def test_update_while_loading(table):
+    """
+        Values loaded before an update must not be kept
+    """
+    stats = PopularityStats("tracks")
+    load = table.load
+
+    def update_while_loading():
+        top = load()
+        table.update(stats, 10, 1000)
+        return top
+    table.load = update_while_loading
+    stats.get_average()
+    table.load = load
+    assert stats.get_average() == table.get_average()
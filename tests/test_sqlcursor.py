@@ -0,0 +1,82 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+pytest.importorskip("gi")
+from lollypop.sqlcursor import SqlCursor
+
+
+@pytest.fixture
+def connections(tmp_path):
+    """
+        Two connections on a WAL database with 1000 items
+    """
+    path = str(tmp_path / "test.db")
+    reader = SqlCursor.connect(path)
+    writer = SqlCursor.connect(path)
+    writer.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+    writer.executemany("INSERT INTO items (id) VALUES (?)",
+                       [(i,) for i in range(1000)])
+    writer.commit()
+    yield (reader, writer)
+    reader.close()
+    writer.close()
+
+
+def get_ids(sql, values):
+    """
+        Get items ids matching values with a filter
+    """
+    (request, filters) = SqlCursor.get_filter(sql, "items.id", values)
+    result = sql.execute("SELECT id FROM items WHERE " + request, filters)
+    return sorted([row[0] for row in result])
+
+
+def test_filter_empty(connections):
+    (reader, writer) = connections
+    assert SqlCursor.get_filter(reader, "items.id", []) == ("1=0", ())
+    assert get_ids(reader, []) == []
+
+
+def test_filter_in_list(connections):
+    (reader, writer) = connections
+    values = [5, 3, 5, 2000, 1]
+    (request, filters) = SqlCursor.get_filter(reader, "items.id", values)
+    assert request == "items.id IN (?,?,?,?)"
+    assert filters == (5, 3, 2000, 1)
+    assert get_ids(reader, values) == [1, 3, 5]
+    assert not reader.in_transaction
+
+
+def test_filter_temp_table(connections):
+    (reader, writer) = connections
+    values = list(range(500, 1500)) + [500]
+    (request, filters) = SqlCursor.get_filter(reader, "items.id", values)
+    assert "SELECT value FROM tmp_filter_items_id" in request
+    assert filters == ()
+    assert get_ids(reader, values) == list(range(500, 1000))
+    # Connection must see later commits from other connections
+    assert not reader.in_transaction
+    writer.execute("INSERT INTO items (id) VALUES (1200)")
+    writer.commit()
+    assert get_ids(reader, values) == list(range(500, 1000)) + [1200]
+
+
+def test_filter_temp_table_in_transaction(connections):
+    (reader, writer) = connections
+    writer.execute("DELETE FROM items WHERE id=600")
+    get_ids(writer, range(500, 700))
+    # Caller transaction is not committed by filter
+    assert writer.in_transaction
+    writer.rollback()
+    assert 600 in get_ids(writer, range(500, 700))
@@ -0,0 +1,364 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+pytest.importorskip("gi")
+from lollypop.tagreader import HeaderReader, TagReader
+
+
+def vorbis_comment(comments):
+    """
+        Build a vorbis comment block
+        @param comments as [str]
+        @return bytes
+    """
+    vendor = b"test"
+    data = len(vendor).to_bytes(4, "little") + vendor
+    data += len(comments).to_bytes(4, "little")
+    for comment in comments:
+        comment = comment.encode("utf-8")
+        data += len(comment).to_bytes(4, "little") + comment
+    return data
+
+
+def flac(comments, rate=44100, samples=441000):
+    """
+        Build FLAC metadata blocks, without audio frames
+        @param comments as [str]
+        @param rate as int
+        @param samples as int
+        @return bytes
+    """
+    info = (rate << 44) | (1 << 41) | (15 << 36) | samples
+    streaminfo = bytes(10) + info.to_bytes(8, "big") + bytes(16)
+    block = vorbis_comment(comments)
+    return b"fLaC" +\
+        bytes([0]) + len(streaminfo).to_bytes(3, "big") + streaminfo +\
+        bytes([0x84]) + len(block).to_bytes(3, "big") + block
+
+
+def ogg_page(packet, serial, granule, sequence):
+    """
+        Build an Ogg page containing packet
+        @param packet as bytes
+        @param serial as int
+        @param granule as int
+        @param sequence as int
+        @return bytes
+    """
+    segments = [255] * (len(packet) // 255) + [len(packet) % 255]
+    return b"OggS" + bytes(2) + granule.to_bytes(8, "little") +\
+        serial.to_bytes(4, "little") + sequence.to_bytes(4, "little") +\
+        bytes(4) + bytes([len(segments)]) + bytes(segments) + packet
+
+
+def ogg(ident, comment, granule):
+    """
+        Build an Ogg stream with header packets and a last audio page
+        @param ident as bytes
+        @param comment as bytes
+        @param granule as int, last page granule position
+        @return bytes
+    """
+    # Another logical stream, must be ignored
+    other = ogg_page(b"\x80theora", 2, 0, 0)
+    return ogg_page(ident, 1, 0, 0) + other +\
+        ogg_page(comment, 1, 0, 1) +\
+        ogg_page(b"\x00" * 300, 1, granule, 2)
+
+
+def vorbis(comments, rate=44100, seconds=10):
+    """
+        Build an Ogg Vorbis stream
+        @param comments as [str]
+        @param rate as int
+        @param seconds as int
+        @return bytes
+    """
+    ident = b"\x01vorbis" + bytes(4) + bytes([2]) +\
+        rate.to_bytes(4, "little") + bytes(13)
+    comment = b"\x03vorbis" + vorbis_comment(comments) + b"\x01"
+    return ogg(ident, comment, rate * seconds)
+
+
+def opus(comments, pre_skip=312, seconds=10):
+    """
+        Build an Ogg Opus stream
+        @param comments as [str]
+        @param pre_skip as int
+        @param seconds as int
+        @return bytes
+    """
+    ident = b"OpusHead" + bytes([1, 2]) + pre_skip.to_bytes(2, "little") +\
+        (48000).to_bytes(4, "little") + bytes(3)
+    comment = b"OpusTags" + vorbis_comment(comments)
+    return ogg(ident, comment, 48000 * seconds + pre_skip)
+
+
+def syncsafe(value):
+    """
+        Encode an ID3v2 syncsafe integer
+        @param value as int
+        @return bytes
+    """
+    return bytes([(value >> shift) & 0x7f for shift in [21, 14, 7, 0]])
+
+
+def id3(frames, major=3):
+    """
+        Build an ID3v2 tag
+        @param frames as [(frame id as str, data as bytes)]
+        @param major as int, 3 or 4
+        @return bytes
+    """
+    data = b""
+    for (frame_id, frame) in frames:
+        if major == 4:
+            size = syncsafe(len(frame))
+        else:
+            size = len(frame).to_bytes(4, "big")
+        data += frame_id.encode("latin-1") + size + bytes(2) + frame
+    # Padding
+    data += bytes(20)
+    return b"ID3" + bytes([major, 0, 0]) + syncsafe(len(data)) + data
+
+
+def text(value, encoding=3):
+    """
+        Build ID3v2 text frame content
+        @param value as str
+        @param encoding as int, 1 for UTF-16, 3 for UTF-8
+        @return bytes
+    """
+    if encoding == 1:
+        return bytes([1]) + value.encode("utf-16")
+    return bytes([3]) + value.encode("utf-8")
+
+
+def mpeg_frames(frames=None, size=4180):
+    """
+        Build MPEG-1 Layer III 128kb/s 44.1kHz stereo audio
+        @param frames as int, frames count in Xing header, None for CBR
+        @param size as int, audio size
+        @return bytes
+    """
+    header = b"\xff\xfb\x90\x00" + bytes(32)
+    if frames is not None:
+        header += b"Xing" + (1).to_bytes(4, "big") +\
+            frames.to_bytes(4, "big")
+    return header + bytes(size - len(header))
+
+
+def atom(name, data):
+    """
+        Build an MP4 atom
+        @param name as bytes
+        @param data as bytes
+        @return bytes
+    """
+    return (len(data) + 8).to_bytes(4, "big") + name + data
+
+
+def mp4(items, timescale=1000, duration=10000):
+    """
+        Build an MP4 file header
+        @param items as [(name as bytes, value as bytes)]
+        @param timescale as int
+        @param duration as int
+        @return bytes
+    """
+    mvhd = atom(b"mvhd", bytes(12) + timescale.to_bytes(4, "big") +
+                duration.to_bytes(4, "big") + bytes(80))
+    ilst = b""
+    for (name, value) in items:
+        ilst += atom(name, atom(b"data", bytes(8) + value))
+    hdlr = atom(b"hdlr", bytes(8) + b"mdirappl" + bytes(9))
+    meta = atom(b"meta", bytes(4) + hdlr + atom(b"ilst", ilst))
+    moov = atom(b"moov", mvhd + atom(b"udta", meta))
+    return atom(b"ftyp", b"M4A " + bytes(4)) + moov + atom(b"mdat", bytes(64))
+
+
+@pytest.fixture
+def read(tmp_path):
+    """
+        Read fields for file content with HeaderReader
+    """
+    def read(data, name="test"):
+        path = tmp_path / name
+        path.write_bytes(data)
+        return HeaderReader().read(str(path))
+    return read
+
+
+def test_flac(read):
+    fields = read(flac(["TITLE=Title", "artist=A", "ARTIST=B",
+                        "ALBUMARTIST=Album artist", "ALBUM=Album",
+                        "GENRE=Rock", "TRACKNUMBER=3", "DISCNUMBER=1",
+                        "DATE=2001-05-03", "DISCSUBTITLE=Live"],
+                       rate=44100, samples=441000))
+    assert fields["duration"] == 10
+    assert fields["title"] == ["Title"]
+    assert fields["artist"] == ["A", "B"]
+    assert fields["album-artist"] == ["Album artist"]
+    assert fields["album"] == ["Album"]
+    assert fields["genre"] == ["Rock"]
+    assert fields["track-number"] == ["3"]
+    assert fields["album-disc-number"] == ["1"]
+    assert fields["date"] == ["2001-05-03"]
+    assert fields["extended-comment"] == ["DISCSUBTITLE=Live"]
+
+
+def test_ogg_vorbis(read):
+    fields = read(vorbis(["TITLE=Title", "ALBUM=Album"], seconds=12))
+    assert fields["duration"] == 12
+    assert fields["title"] == ["Title"]
+    assert fields["album"] == ["Album"]
+
+
+def test_ogg_opus(read):
+    fields = read(opus(["ARTIST=A", "LYRICS=Some lyrics"], seconds=7))
+    assert fields["duration"] == 7
+    assert fields["artist"] == ["A"]
+    assert fields["lyrics"] == ["Some lyrics"]
+
+
+def test_id3v23_xing(read):
+    fields = read(id3([("TIT2", text("Title", 1)),
+                       ("TPE1", text("A", 1)),
+                       ("TRCK", text("4/12")),
+                       ("TXXX", text("DISCSUBTITLE\x00Live")),
+                       ("APIC", bytes(100))]) +
+                  mpeg_frames(frames=383))
+    assert fields["title"] == ["Title"]
+    assert fields["artist"] == ["A"]
+    assert fields["track-number"] == ["4/12"]
+    assert fields["extended-comment"] == ["DISCSUBTITLE=Live"]
+    assert "APIC" not in fields.keys()
+    assert fields["duration"] == pytest.approx(383 * 1152 / 44100)
+
+
+def test_id3v24_cbr(read):
+    fields = read(id3([("TIT2", text("Title")),
+                       ("TPE1", text("A\x00B")),
+                       ("TDRC", text("1999"))], major=4) +
+                  mpeg_frames(size=160000))
+    assert fields["title"] == ["Title"]
+    assert fields["artist"] == ["A", "B"]
+    assert fields["date"] == ["1999"]
+    # 128kb/s
+    assert fields["duration"] == pytest.approx(10)
+
+
+def test_id3_flac(read):
+    fields = read(id3([("TIT2", text("Id3 title"))]) +
+                  flac(["TITLE=Title"], samples=88200))
+    assert fields["duration"] == 2
+    assert fields["title"] == ["Title"]
+
+
+def test_mp4(read):
+    fields = read(mp4([(b"\xa9nam", "Title".encode("utf-8")),
+                       (b"\xa9ART", "A".encode("utf-8")),
+                       (b"trkn", bytes([0, 0, 0, 5, 0, 10, 0, 0])),
+                       (b"\xa9day", b"2003")],
+                      timescale=44100, duration=44100 * 9))
+    assert fields["duration"] == 9
+    assert fields["title"] == ["Title"]
+    assert fields["artist"] == ["A"]
+    assert fields["track-number"] == ["5"]
+    assert fields["date"] == ["2003"]
+
+
+def test_unsupported(read):
+    # ID3v1 genre references, compressed tags, other containers,
+    # broken files: discoverer must be used
+    assert read(id3([("TCON", text("(17)"))]) + mpeg_frames(frames=10)) is\
+        None
+    assert read(mp4([(b"gnre", bytes([0, 17]))])) is None
+    assert read(b"RIFF" + bytes(100)) is None
+    assert read(flac(["TITLE=Title"])[:20]) is None
+    assert read(vorbis(["TITLE=Title"])[:60]) is None
+    assert read(id3([("TIT2", text("Title"))]) + bytes(1000)) is None
+
+
+def test_discoverer_fallback(tmp_path, monkeypatch):
+    from gi.repository import Gst
+    Gst.init(None)
+    reader = TagReader()
+    called = []
+
+    def get_discoverer_tags(uri, name):
+        called.append(name)
+        return {"name": name}
+    monkeypatch.setattr(reader, "_TagReader__get_discoverer_tags",
+                        get_discoverer_tags)
+    path = tmp_path / "test.wav"
+    path.write_bytes(b"RIFF" + bytes(100))
+    tags = reader.read_tags(path.as_uri())
+    assert called == ["test.wav"]
+    assert tags["fingerprint"] is not None
+    path = tmp_path / "test.flac"
+    path.write_bytes(flac(["TITLE=Title"]))
+    tags = reader.read_tags(path.as_uri())
+    assert called == ["test.wav"]
+    assert tags["title"] == "Title"
+
+
+def test_header_tags_match_discoverer_rules(tmp_path):
+    """
+        Header tags must follow TagReader.get_*() rules for same values
+    """
+    from gi.repository import Gst, GObject
+    Gst.init(None)
+    reader = TagReader()
+    name = "05 - test.flac"
+    fields = {"title": [" "],
+              "artist": ["A", " ", "B"],
+              "composer": ["C"],
+              "performer": ["P"],
+              "artist-sortname": ["A, The"],
+              "album-artist-sortname": ["AA, The"],
+              "album-artist": ["AA"],
+              "genre": ["Rock", "Pop"],
+              "album-disc-number": ["2"],
+              "date": ["2001-05-03"],
+              "extended-comment": ["DISCSUBTITLE=Live"],
+              "duration": 10.5}
+    tags = Gst.TagList.new_empty()
+    for (field, values) in fields.items():
+        if field == "duration":
+            continue
+        for value in values:
+            if field == "album-disc-number":
+                (field, value) = (field, int(value))
+            elif field == "date":
+                (field, value) = ("datetime",
+                                  Gst.DateTime.new_from_iso8601_string(value))
+            tags.add_value(Gst.TagMergeMode.APPEND, field,
+                           GObject.Value(Gst.tag_get_type(field), value))
+    header_tags = reader._TagReader__get_header_tags(name, fields)
+    assert header_tags["title"] == reader.get_title(tags, name)
+    assert header_tags["artists"] == reader.get_artists(tags)
+    assert header_tags["composers"] == reader.get_composers(tags)
+    assert header_tags["performers"] == reader.get_performers(tags)
+    assert header_tags["a_sortnames"] == reader.get_artist_sortnames(tags)
+    assert header_tags["aa_sortnames"] ==\
+        reader.get_album_artist_sortnames(tags)
+    assert header_tags["album_artists"] == reader.get_album_artist(tags)
+    assert header_tags["album_name"] == reader.get_album_name(tags)
+    assert header_tags["genres"] == reader.get_genres(tags)
+    assert header_tags["discname"] == reader.get_discname(tags)
+    assert header_tags["discnumber"] == reader.get_discnumber(tags)
+    assert header_tags["tracknumber"] == reader.get_tracknumber(tags, name)
+    assert header_tags["year"] == reader.get_year(tags)
+    assert header_tags["duration"] == 10
@@ -0,0 +1,34 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+pytest.importorskip("gi")
+tagreader_pool = pytest.importorskip("lollypop.tagreader_pool")
+
+
+def test_low_priority_pool():
+    """
+        Low priority pool must start its workers and read items:
+        init arguments are pickled for spawned processes
+    """
+    pool = tagreader_pool.TagReaderPool(2, True)
+    try:
+        items = [("file:///nonexistent/%s.mp3" % i, 0) for i in range(3)]
+        results = list(pool.read([(items, 2)]))
+    finally:
+        pool.stop()
+    assert sorted([result[0] for result in results]) ==\
+        sorted([uri for (uri, mtime) in items])
+    for result in results:
+        assert result[2] is None
+        assert result[3] is not None
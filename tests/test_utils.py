@@ -0,0 +1,67 @@
+# Copyright (c) 2014-2017 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("gi")
+from lollypop.utils import get_search_query
+
+
+@pytest.fixture
+def names():
+    """
+        Full text search table on names, like Database search tables
+    """
+    sql = sqlite3.connect(":memory:")
+    try:
+        sql.execute("CREATE VIRTUAL TABLE names USING fts5(name,\
+                     tokenize='unicode61 remove_diacritics 1')")
+    except sqlite3.OperationalError:
+        pytest.skip("SQLite without FTS5")
+    sql.executemany("INSERT INTO names (rowid, name) VALUES (?, ?)",
+                    [(1, "Beyoncé"), (2, "The Beatles"), (3, "Beat It"),
+                     (4, "AC/DC"), (5, "Les Négresses Vertes")])
+    yield lambda string: [row[0] for row in sql.execute(
+                          "SELECT rowid FROM names WHERE names MATCH ?\
+                           ORDER BY rowid", (get_search_query(string),))]
+    sql.close()
+
+
+def test_query():
+    assert get_search_query("the beat") == '"the"* "beat"*'
+    assert get_search_query("  AC/DC ") == '"AC"* "DC"*'
+    assert get_search_query("l'été") == '"l"* "été"*'
+
+
+def test_query_no_words():
+    assert get_search_query("") is None
+    assert get_search_query(" -/\"* ") is None
+
+
+def test_query_operators():
+    """
+        FTS syntax in user input must be searched as words
+    """
+    assert get_search_query('NOT "x* OR (y') == '"NOT"* "x"* "OR"* "y"*'
+
+
+def test_match(names):
+    assert names("beat") == [2, 3]
+    assert names("the bea") == [2]
+    assert names("beyonce") == [1]
+    assert names("AC DC") == [4]
+    assert names("ac/dc") == [4]
+    assert names("négresses VERT") == [5]
+    assert names("les OR beat") == []
+    assert names("it NOT") == []